@@ -0,0 +1,70 @@
+"""Add indexes for order listing, order items and the active catalog
+
+Revision ID: 3c9e1f7a2b4d
+Revises: aa61f59db3f9
+Create Date: 2026-10-19 09:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f7a2b4d'
+down_revision = 'aa61f59db3f9'
+branch_labels = None
+depends_on = None
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    # On Postgres the indexes are built CONCURRENTLY so the tables stay
+    # writable; that requires running outside the migration transaction.
+    concurrently = _is_postgres()
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_user_id_created_at',
+            'orders',
+            ['user_id', sa.text('created_at DESC')],
+            unique=False,
+            postgresql_concurrently=concurrently,
+        )
+        op.create_index(
+            op.f('ix_order_items_order_id'),
+            'order_items',
+            ['order_id'],
+            unique=False,
+            postgresql_concurrently=concurrently,
+        )
+        op.create_index(
+            op.f('ix_order_items_product_id'),
+            'order_items',
+            ['product_id'],
+            unique=False,
+            postgresql_concurrently=concurrently,
+        )
+        op.create_index(
+            'ix_products_active_id',
+            'products',
+            ['id'],
+            unique=False,
+            postgresql_where=sa.text('is_active'),
+            sqlite_where=sa.text('is_active = 1'),
+            postgresql_concurrently=concurrently,
+        )
+
+
+def downgrade() -> None:
+    concurrently = _is_postgres()
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_products_active_id', table_name='products',
+                      postgresql_concurrently=concurrently)
+        op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items',
+                      postgresql_concurrently=concurrently)
+        op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items',
+                      postgresql_concurrently=concurrently)
+        op.drop_index('ix_orders_user_id_created_at', table_name='orders',
+                      postgresql_concurrently=concurrently)
@@ -0,0 +1,48 @@
+"""Add indexes for filtering orders by status and created_at
+
+Revision ID: b51f0c6d9e27
+Revises: 7d2a5b8e4f10
+Create Date: 2026-10-19 10:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b51f0c6d9e27'
+down_revision = '7d2a5b8e4f10'
+branch_labels = None
+depends_on = None
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    concurrently = _is_postgres()
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_status_created_at',
+            'orders',
+            ['status', sa.text('created_at DESC')],
+            unique=False,
+            postgresql_concurrently=concurrently,
+        )
+        op.create_index(
+            'ix_orders_created_at',
+            'orders',
+            [sa.text('created_at DESC')],
+            unique=False,
+            postgresql_concurrently=concurrently,
+        )
+
+
+def downgrade() -> None:
+    concurrently = _is_postgres()
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_created_at', table_name='orders',
+                      postgresql_concurrently=concurrently)
+        op.drop_index('ix_orders_status_created_at', table_name='orders',
+                      postgresql_concurrently=concurrently)
@@ -0,0 +1,169 @@
+"""Partition orders and order_items by month on created_at
+
+Revision ID: e83a4c1f5d62
+Revises: b51f0c6d9e27
+Create Date: 2026-10-19 10:30:00.000000+00:00
+
+Postgres only; other databases keep the plain tables. The existing rows are
+copied into range-partitioned tables with one partition per month from the
+oldest order through three months ahead, plus a default partition.
+``app.db.partitions.maintain_partitions`` keeps creating upcoming months.
+
+Partition keys must be part of every unique constraint, so the primary keys
+become ``(id, created_at)`` and order_items gains a ``created_at`` column
+(copied from its order). For the same reason ``order_items.order_id`` can no
+longer reference ``orders.id`` and that foreign key is dropped; both rows are
+written in one transaction by ``create_order``.
+"""
+from datetime import date, datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83a4c1f5d62'
+down_revision = 'b51f0c6d9e27'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _months(first: date, last: date):
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        yield month, following
+        month = following
+
+
+def _create_partitions(parent: str, table: str, first: date, last: date) -> None:
+    for month, following in _months(first, last):
+        op.execute(
+            f"CREATE TABLE {table}_y{month.year:04d}m{month.month:02d} PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {parent} DEFAULT")
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_orders_id', 'orders', ['id'], unique=False)
+    op.create_index('ix_orders_user_id_created_at', 'orders',
+                    ['user_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_orders_status_created_at', 'orders',
+                    ['status', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_orders_created_at', 'orders', [sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_order_items_id', 'order_items', ['id'], unique=False)
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'], unique=False)
+    op.create_index('ix_order_items_product_id', 'order_items', ['product_id'], unique=False)
+
+
+def upgrade() -> None:
+    if not _is_postgres():
+        return
+
+    op.execute("LOCK TABLE orders, order_items IN ACCESS EXCLUSIVE MODE")
+    oldest = op.get_bind().execute(sa.text("SELECT min(created_at) FROM orders")).scalar()
+    today = datetime.now(timezone.utc).date()
+    first = oldest.date() if oldest is not None else today
+    last = date(today.year + (today.month + MONTHS_AHEAD - 1) // 12,
+                (today.month + MONTHS_AHEAD - 1) % 12 + 1, 1)
+
+    op.execute("""
+        CREATE TABLE orders_partitioned (
+            id integer NOT NULL DEFAULT nextval('orders_id_seq'),
+            user_id integer NOT NULL CONSTRAINT orders_user_id_fkey REFERENCES users (id),
+            total_amount double precision NOT NULL,
+            status orderstatus,
+            created_at timestamp with time zone NOT NULL DEFAULT now(),
+            updated_at timestamp with time zone
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("""
+        CREATE TABLE order_items_partitioned (
+            id integer NOT NULL DEFAULT nextval('order_items_id_seq'),
+            order_id integer NOT NULL,
+            product_id integer NOT NULL CONSTRAINT order_items_product_id_fkey REFERENCES products (id),
+            quantity integer NOT NULL,
+            price_at_purchase double precision NOT NULL,
+            created_at timestamp with time zone NOT NULL DEFAULT now()
+        ) PARTITION BY RANGE (created_at)
+    """)
+    _create_partitions('orders_partitioned', 'orders', first, last)
+    _create_partitions('order_items_partitioned', 'order_items', first, last)
+
+    # Load before building keys and indexes; now() is fixed for the transaction
+    op.execute("""
+        INSERT INTO orders_partitioned (id, user_id, total_amount, status, created_at, updated_at)
+        SELECT id, user_id, total_amount, status, COALESCE(created_at, now()), updated_at
+        FROM orders
+    """)
+    op.execute("""
+        INSERT INTO order_items_partitioned (id, order_id, product_id, quantity, price_at_purchase, created_at)
+        SELECT oi.id, oi.order_id, oi.product_id, oi.quantity, oi.price_at_purchase,
+               COALESCE(o.created_at, now())
+        FROM order_items oi JOIN orders o ON o.id = oi.order_id
+    """)
+
+    # Keep the id sequences alive while their owning columns are dropped
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY NONE")
+    op.drop_table('order_items')
+    op.drop_table('orders')
+    op.rename_table('orders_partitioned', 'orders')
+    op.rename_table('order_items_partitioned', 'order_items')
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY order_items.id")
+
+    op.create_primary_key('orders_pkey', 'orders', ['id', 'created_at'])
+    op.create_primary_key('order_items_pkey', 'order_items', ['id', 'created_at'])
+    _create_indexes()
+
+
+def downgrade() -> None:
+    if not _is_postgres():
+        return
+
+    op.execute("LOCK TABLE orders, order_items IN ACCESS EXCLUSIVE MODE")
+    op.execute("""
+        CREATE TABLE orders_plain (
+            id integer NOT NULL DEFAULT nextval('orders_id_seq'),
+            user_id integer NOT NULL,
+            total_amount double precision NOT NULL,
+            status orderstatus,
+            created_at timestamp with time zone DEFAULT now(),
+            updated_at timestamp with time zone
+        )
+    """)
+    op.execute("""
+        CREATE TABLE order_items_plain (
+            id integer NOT NULL DEFAULT nextval('order_items_id_seq'),
+            order_id integer NOT NULL,
+            product_id integer NOT NULL,
+            quantity integer NOT NULL,
+            price_at_purchase double precision NOT NULL
+        )
+    """)
+    op.execute("INSERT INTO orders_plain SELECT id, user_id, total_amount, status, created_at, updated_at FROM orders")
+    op.execute("INSERT INTO order_items_plain SELECT id, order_id, product_id, quantity, price_at_purchase FROM order_items")
+
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY NONE")
+    # Dropping the parents drops every attached partition with them
+    op.drop_table('order_items')
+    op.drop_table('orders')
+    op.rename_table('orders_plain', 'orders')
+    op.rename_table('order_items_plain', 'order_items')
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY order_items.id")
+
+    op.create_primary_key('orders_pkey', 'orders', ['id'])
+    op.create_primary_key('order_items_pkey', 'order_items', ['id'])
+    op.create_foreign_key('orders_user_id_fkey', 'orders', 'users', ['user_id'], ['id'])
+    op.create_foreign_key('order_items_order_id_fkey', 'order_items', 'orders', ['order_id'], ['id'])
+    op.create_foreign_key('order_items_product_id_fkey', 'order_items', 'products', ['product_id'], ['id'])
+    _create_indexes()
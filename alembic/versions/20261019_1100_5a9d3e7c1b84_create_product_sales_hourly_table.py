@@ -0,0 +1,30 @@
+"""Create product_sales_hourly table
+
+Revision ID: 5a9d3e7c1b84
+Revises: e83a4c1f5d62
+Create Date: 2026-10-19 11:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9d3e7c1b84'
+down_revision = 'e83a4c1f5d62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('product_sales_hourly',
+    sa.Column('bucket_hour', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket_hour', 'product_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('product_sales_hourly')
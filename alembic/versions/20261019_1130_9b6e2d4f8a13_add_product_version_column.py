@@ -0,0 +1,25 @@
+"""Add products.version for optimistic concurrency
+
+Revision ID: 9b6e2d4f8a13
+Revises: 5a9d3e7c1b84
+Create Date: 2026-10-19 11:30:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b6e2d4f8a13'
+down_revision = '5a9d3e7c1b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The server default fills existing rows without rewriting them one by one
+    op.add_column('products', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'version')
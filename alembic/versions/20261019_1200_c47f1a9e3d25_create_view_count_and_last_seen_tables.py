@@ -0,0 +1,34 @@
+"""Create product_view_counts and user_last_seen tables
+
+Revision ID: c47f1a9e3d25
+Revises: 9b6e2d4f8a13
+Create Date: 2026-10-19 12:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47f1a9e3d25'
+down_revision = '9b6e2d4f8a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('product_view_counts',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('views', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table('user_last_seen',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_seen_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_last_seen')
+    op.drop_table('product_view_counts')
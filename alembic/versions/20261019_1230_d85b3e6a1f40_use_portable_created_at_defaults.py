@@ -0,0 +1,54 @@
+"""Use CURRENT_TIMESTAMP for created_at server defaults
+
+Revision ID: d85b3e6a1f40
+Revises: c47f1a9e3d25
+Create Date: 2026-10-19 12:30:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd85b3e6a1f40'
+down_revision = 'c47f1a9e3d25'
+branch_labels = None
+depends_on = None
+
+# Earlier migrations wrote now(), which SQLite accepts in CREATE TABLE but
+# fails to evaluate on every insert. CURRENT_TIMESTAMP means the same on
+# PostgreSQL and works on SQLite.
+TABLES = ('products', 'users', 'orders', 'outbox_events')
+ORDER_INDEXES = {
+    'ix_orders_user_id_created_at': ('user_id', 'created_at DESC'),
+    'ix_orders_status_created_at': ('status', 'created_at DESC'),
+    'ix_orders_created_at': ('created_at DESC',),
+}
+
+
+def _set_default(default) -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        # SQLite cannot alter a column default in place; rebuild the tables
+        for table in TABLES:
+            with op.batch_alter_table(table, recreate='always') as batch_op:
+                batch_op.alter_column(
+                    'created_at',
+                    existing_type=sa.DateTime(timezone=True),
+                    existing_nullable=True,
+                    server_default=default,
+                )
+        # Reflection drops DESC from the rebuilt indexes
+        for name, columns in ORDER_INDEXES.items():
+            op.drop_index(name, table_name='orders')
+            op.create_index(name, 'orders', [sa.text(column) for column in columns], unique=False)
+        return
+    for table in TABLES:
+        op.alter_column(table, 'created_at', server_default=default)
+
+
+def upgrade() -> None:
+    _set_default(sa.text('CURRENT_TIMESTAMP'))
+
+
+def downgrade() -> None:
+    _set_default(sa.text('now()'))
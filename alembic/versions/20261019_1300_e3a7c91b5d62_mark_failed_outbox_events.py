@@ -0,0 +1,39 @@
+"""Mark outbox events that ran out of delivery attempts
+
+Revision ID: e3a7c91b5d62
+Revises: d85b3e6a1f40
+Create Date: 2026-10-19 13:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c91b5d62'
+down_revision = 'd85b3e6a1f40'
+branch_labels = None
+depends_on = None
+
+
+def _create_pending_index(where: str) -> None:
+    op.create_index(
+        'ix_outbox_events_pending',
+        'outbox_events',
+        ['available_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text(where),
+        sqlite_where=sa.text(where),
+    )
+
+
+def upgrade() -> None:
+    op.add_column('outbox_events', sa.Column('failed_at', sa.DateTime(timezone=True), nullable=True))
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    _create_pending_index('dispatched_at IS NULL AND failed_at IS NULL')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    _create_pending_index('dispatched_at IS NULL')
+    op.drop_column('outbox_events', 'failed_at')
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Query, Request
+from app.core.dependencies import get_current_admin_user
+from app.core.jobs import get_job_runner
+from app.core.singleflight import get_single_flight
+from app.db.slow_queries import get_slow_query_log
+from app.models.user import User
+from app.services.write_behind import buffers
+
+router = APIRouter()
+
+@router.get("/jobs")
+def get_job_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Background job queue depth, counters and latency (Admin only)."""
+    return get_job_runner().metrics()
+
+@router.get("/single-flight")
+def get_single_flight_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Coalesced read counters for this worker (Admin only)."""
+    return get_single_flight().metrics()
+
+@router.get("/admission")
+def get_admission_metrics(request: Request, current_user: User = Depends(get_current_admin_user)):
+    """Adaptive concurrency limits and shed requests per route class, for this worker (Admin only)."""
+    controller = request.app.state.admission
+    return controller.metrics() if controller is not None else {}
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Recent statements over the slow-query threshold, newest first, for this worker (Admin only)."""
+    log = get_slow_query_log()
+    return {**log.metrics(), "queries": log.entries(limit)}
+
+@router.get("/write-behind")
+def get_write_behind_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Pending counters and flush latency of this worker's write-behind buffers (Admin only)."""
+    return {buffer.name: buffer.metrics() for buffer in buffers()}
@@ -1,45 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import text
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import Float, Integer, String, text
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.db.base import get_db
-from app.core.dependencies import get_current_user
-from app.models.order import Order, OrderItem
+from app.db.optimistic import retry_stale
+from app.core.config import get_settings
+from app.core.dependencies import get_current_admin_user, get_current_user, get_loaders
+from app.core.fieldsets import ExpandSelector, FieldSelector
+from app.crud.loaders import RequestLoaders
+from app.models.order import Order, OrderItem, OrderStatus
 from app.models.product import Product
 from app.models.user import User
-from app.schemas.order import OrderCreate, OrderResponse, OrderSummary
+from app.schemas.order import (
+    OrderBatchStatusUpdate,
+    OrderCreate,
+    OrderResponse,
+    OrderStatusTransitionResult,
+    OrderStatusUpdate,
+    OrderSummary,
+)
 
 router = APIRouter()
 
+order_fields = FieldSelector(OrderResponse.model_fields)
+order_expand = ExpandSelector(("product", "user"))
 
-from app.crud.order import create_order as crud_create_order
+
+from app.crud.order import create_order as crud_create_order, get_orders as crud_get_orders
+from app.crud.order import count_orders, expand_orders, get_order_projection, get_orders_projection
+from app.crud.order import transition_orders
 
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 def create_order(
     order_data: OrderCreate,
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
     current_user: User = Depends(get_current_user)
 ):
-    """Create a new order."""
-    return crud_create_order(db, order_data, current_user.id)
+    """Create a new order. Stock decrements that race another order are retried on fresh rows."""
+    return retry_stale(db, lambda: crud_create_order(db, order_data, current_user.id, loaders))
+
+
+def _expansion_fields(fields: Optional[List[str]], expand: Optional[List[str]]) -> List[str]:
+    """Columns to load so that the requested expansions have their keys."""
+    query_fields = list(fields or OrderResponse.model_fields)
+    if expand and "user" in expand and "user_id" not in query_fields:
+        query_fields.append("user_id")
+    # Products are embedded in the items, which carry them even when not requested
+    if expand and "product" in expand and "items" not in query_fields:
+        query_fields.append("items")
+    return query_fields
 
 
 @router.get("/", response_model=List[OrderResponse])
 def list_orders(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    order_status: Optional[OrderStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = Query(None, description="Inclusive lower bound on created_at"),
+    created_to: Optional[datetime] = Query(None, description="Exclusive upper bound on created_at"),
+    user_id: Optional[int] = Query(None, description="Filter by user (admin only)"),
+    exact_count: bool = Query(False, description="Always count matches exactly"),
+    fields: Optional[List[str]] = Depends(order_fields),
+    expand: Optional[List[str]] = Depends(order_expand),
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all orders for the current user."""
-    query = db.query(Order).filter(Order.user_id == current_user.id)
-    
+    """
+    Get all orders for the current user, newest first.
+    The X-Total-Count header holds the number of matches; for large result
+    sets it is a planner estimate (X-Total-Count-Estimated: true) unless
+    exact_count is set. ``expand=product,user`` embeds item products and
+    the customer.
+    """
     # If admin, show all orders
-    if current_user.is_admin:
-        query = db.query(Order)
+    if not current_user.is_admin:
+        if user_id is not None and user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to view other users' orders"
+            )
+        user_id = current_user.id
     
-    orders = query.offset(skip).limit(limit).all()
-    return orders
+    filters = {
+        "user_id": user_id,
+        "status": order_status,
+        "created_from": created_from,
+        "created_to": created_to,
+    }
+    total, estimated = count_orders(
+        db,
+        exact=exact_count,
+        exact_threshold=get_settings().ORDER_COUNT_EXACT_THRESHOLD,
+        **filters
+    )
+    headers = {
+        "X-Total-Count": str(total),
+        "X-Total-Count-Estimated": "true" if estimated else "false",
+    }
+    
+    if fields or expand:
+        query_fields = _expansion_fields(fields, expand)
+        rows = get_orders_projection(db, query_fields, skip=skip, limit=limit, **filters)
+        if expand:
+            expand_orders(rows, expand, loaders)
+        return JSONResponse(jsonable_encoder(rows), headers=headers)
+    response.headers.update(headers)
+    return crud_get_orders(db, skip=skip, limit=limit, **filters)
 
 
 @router.get("/summary", response_model=List[OrderSummary])
@@ -48,8 +120,13 @@ def get_order_summary(
     current_user: User = Depends(get_current_user)
 ):
     """Get order summary using raw SQL (performance optimization)."""
-    # This demonstrates using raw SQL for complex queries
-    raw_query = text("""
+    # This demonstrates using raw SQL for complex queries.
+    # The user filter is only added for non-admins so the planner can use
+    # ix_orders_user_id_created_at instead of scanning every order.
+    # Only standard SQL, with result types declared so that SQLite's text
+    # timestamps and enum names come back as on PostgreSQL.
+    user_filter = "" if current_user.is_admin else "WHERE o.user_id = :user_id"
+    raw_query = text(f"""
         SELECT 
             o.id as order_id,
             u.email as user_email,
@@ -60,16 +137,21 @@ def get_order_summary(
         FROM orders o
         JOIN users u ON o.user_id = u.id
         LEFT JOIN order_items oi ON o.id = oi.order_id
-        WHERE (:is_admin = true OR o.user_id = :user_id)
+        {user_filter}
         GROUP BY o.id, u.email, o.total_amount, o.status, o.created_at
         ORDER BY o.created_at DESC
-    """)
-    
-    result = db.execute(
-        raw_query,
-        {"is_admin": current_user.is_admin, "user_id": current_user.id}
+    """).columns(
+        order_id=Integer,
+        user_email=String,
+        total_amount=Float,
+        item_count=Integer,
+        status=Order.__table__.c.status.type,
+        created_at=Order.__table__.c.created_at.type,
     )
     
+    params = {} if current_user.is_admin else {"user_id": current_user.id}
+    result = db.execute(raw_query, params)
+    
     summaries = []
     for row in result:
         summaries.append(OrderSummary(
@@ -77,21 +159,75 @@ def get_order_summary(
             user_email=row.user_email,
             total_amount=row.total_amount,
             item_count=row.item_count,
-            status=row.status,
+            status=row.status.value,
             created_at=row.created_at
         ))
     
     return summaries
 
 
+@router.post("/status", response_model=OrderStatusTransitionResult)
+def update_order_statuses(
+    payload: OrderBatchStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Move a batch of orders to a new status in one statement (Admin only).
+    Orders that do not exist or cannot move to that status are returned
+    in failed_ids; cancelled orders are restocked.
+    """
+    updated_ids, failed_ids = transition_orders(db, payload.order_ids, payload.status)
+    return OrderStatusTransitionResult(
+        status=payload.status, updated_ids=updated_ids, failed_ids=failed_ids
+    )
+
+
+@router.post("/{order_id}/status", response_model=OrderResponse)
+def update_order_status(
+    order_id: int,
+    payload: OrderStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Move one order to a new status. Customers may only cancel their own orders."""
+    if not current_user.is_admin and payload.status != OrderStatus.CANCELLED:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough privileges"
+        )
+    owner_id = None if current_user.is_admin else current_user.id
+    updated_ids, _ = transition_orders(db, [order_id], payload.status, user_id=owner_id)
+    
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if not order or (owner_id is not None and order.user_id != owner_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+    if not updated_ids:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cannot move order from {order.status.value} to {payload.status.value}"
+        )
+    return order
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
 def get_order(
     order_id: int,
+    fields: Optional[List[str]] = Depends(order_fields),
+    expand: Optional[List[str]] = Depends(order_expand),
     db: Session = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders),
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific order by ID."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    projected = bool(fields or expand)
+    if projected:
+        order = get_order_projection(db, order_id, _expansion_fields(fields, expand))
+    else:
+        order = db.query(Order).filter(Order.id == order_id).first()
     
     if not order:
         raise HTTPException(
@@ -100,10 +236,17 @@ def get_order(
         )
     
     # Check if user owns the order or is admin
-    if order.user_id != current_user.id and not current_user.is_admin:
+    owner_id = order["user_id"] if projected else order.user_id
+    if owner_id != current_user.id and not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view this order"
         )
     
+    if projected:
+        if fields and "user_id" not in fields and not (expand and "user" in expand):
+            del order["user_id"]
+        if expand:
+            expand_orders([order], expand, loaders)
+        return JSONResponse(jsonable_encoder(order))
     return order
@@ -1,14 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.db.base import get_db
-from app.core.dependencies import get_current_admin_user, get_current_user
+from app.db.optimistic import retry_stale
+from app.core.dependencies import get_current_admin_user, get_current_user, get_token_user_id
+from app.core.fieldsets import FieldSelector
 from app.models.user import User
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
+from app.schemas.product import (
+    ProductBulkUpdate,
+    ProductBulkUpdateResult,
+    ProductCreate,
+    ProductResponse,
+    ProductUpdate,
+)
 from app.crud import product as crud_product
+from app.services.broadcast import BroadcastHub, Subscription, TooManySubscribers, get_broadcast_hub
+from app.services.catalog_snapshot import get_catalog_snapshot
+from app.services.facets import get_facet_index
+from app.services.leaderboard import ALL_CATEGORIES, get_leaderboard
+from app.services.recommendations import get_related_index
+from app.services.write_behind import record_product_view
 
 router = APIRouter()
 
+product_fields = FieldSelector(ProductResponse.model_fields)
+
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 def create_product(
     product_data: ProductCreate,
@@ -22,36 +40,229 @@ def create_product(
 def list_products(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    fields: Optional[List[str]] = Depends(product_fields),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all products with pagination. Use ``fields`` to load and return a subset of columns."""
+    if fields:
+        rows = crud_product.get_products_projection(db, fields, skip=skip, limit=limit)
+        return JSONResponse(jsonable_encoder(rows))
+    return crud_product.read_products(db, skip=skip, limit=limit)
+
+@router.get("/facets")
+def get_product_facets(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Active product count and price range per category, from an in-memory index."""
+    index = get_facet_index()
+    if not index.built:
+        index.rebuild_from(db)
+    return Response(content=index.payload(), media_type="application/json")
+
+def _etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """If-None-Match compares weakly; If-Match needs ``weak=False``."""
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    if weak:
+        candidates = [value.removeprefix("W/") for value in candidates]
+    return "*" in candidates or etag in candidates
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    """Whether Accept-Encoding allows gzip; ``gzip;q=0`` refuses it, ``*`` stands in for it."""
+    qualities = {}
+    for part in (header or "").split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    quality = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return quality > 0
+
+def product_etag(version: int) -> str:
+    return f'"{version}"'
+
+@router.get("/snapshot")
+def get_catalog_snapshot_file(
+    request: Request,
+    category: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all products with pagination."""
-    return crud_product.get_products(db, skip=skip, limit=limit)
+    """
+    Every active product, or one category's, served from a precompressed
+    file on disk with a strong ETag. The database is only read to build
+    the first snapshot.
+    """
+    snapshot = get_catalog_snapshot()
+    compressed = _accepts_gzip(request.headers.get("accept-encoding"))
+    file = snapshot.lookup(category, compressed)
+    if file is None:
+        snapshot.rebuild(db)
+        file = snapshot.lookup(category, compressed)
+    headers = {"ETag": file.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), file.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    return FileResponse(file.path, media_type="application/json", headers=headers, stat_result=file.stat)
+
+@router.get("/best-sellers")
+def get_best_sellers(
+    window: str = Query("day", pattern="^(day|week)$"),
+    category: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Most units sold in the last day or week, overall or within one category."""
+    leaderboard = get_leaderboard()
+    if not leaderboard.loaded:
+        leaderboard.reload(db)
+    return {
+        "window": window,
+        "category": category,
+        "products": leaderboard.top(window, category if category is not None else ALL_CATEGORIES, limit),
+    }
+
+class EventStreamResponse(StreamingResponse):
+    """
+    Server-sent events for one hub subscription. The subscription is taken
+    before the response is returned (so a full hub can still answer 503)
+    and released however the response ends, even if its body is never
+    iterated because the client left before the first byte.
+    """
+
+    def __init__(self, hub: BroadcastHub, subscription: Subscription):
+        super().__init__(
+            hub.stream(subscription),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        self.hub = hub
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            self.hub.unsubscribe(self.subscription)
+
+@router.get("/stream")
+async def stream_product_updates(
+    ids: Optional[str] = Query(None, description="Comma-separated product ids"),
+    categories: Optional[str] = Query(None, description="Comma-separated categories"),
+    # Checked from the JWT alone: a stream would otherwise pin a pooled
+    # connection, or reopen one, for hours. A deactivated account keeps an
+    # open stream, or opens new ones, until its token expires.
+    user_id: int = Depends(get_token_user_id)
+):
+    """Server-sent events with live price and stock changes for the given products or categories."""
+    try:
+        product_ids = [int(value) for value in ids.split(",") if value.strip()] if ids else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    category_names = [value.strip() for value in categories.split(",") if value.strip()] if categories else []
+    if not product_ids and not category_names:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one product id or category")
+    
+    hub = get_broadcast_hub()
+    try:
+        subscription = hub.subscribe(product_ids, category_names)
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many live update streams", headers={"Retry-After": "5"})
+    return EventStreamResponse(hub, subscription)
+
+@router.patch("/bulk", response_model=ProductBulkUpdateResult)
+def bulk_update_products(
+    payload: ProductBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Update price, stock and/or active flag of many products at once (Admin only)."""
+    updated, missing_ids = crud_product.bulk_update_products(db, payload.items)
+    return ProductBulkUpdateResult(updated=updated, missing_ids=missing_ids)
 
 @router.get("/{product_id}", response_model=ProductResponse)
 def get_product(
     product_id: int,
+    response: Response,
+    fields: Optional[List[str]] = Depends(product_fields),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get a specific product by ID."""
-    db_product = crud_product.get_product(db, product_id)
-    if not db_product:
+    """
+    Get a specific product by ID. The ETag is its version, for ``If-Match``
+    on updates. Views are counted in memory and written in batches.
+    """
+    if fields:
+        row = crud_product.get_product_projection(db, product_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Product not found")
+        record_product_view(product_id)
+        headers = {"ETag": product_etag(row["version"])} if "version" in row else None
+        return JSONResponse(jsonable_encoder(row), headers=headers)
+    product = crud_product.read_product(db, product_id)
+    if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return db_product
+    record_product_view(product_id)
+    response.headers["ETag"] = product_etag(product["version"])
+    return product
+
+@router.get("/{product_id}/related")
+def get_related_products(
+    product_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """Products most often bought together with this one, from the precomputed index."""
+    index = get_related_index()
+    related = index.related(product_id, limit) if index is not None else []
+    return {
+        "product_id": product_id,
+        "related": [{"product_id": other, "orders": count} for other, count in related],
+    }
 
 @router.put("/{product_id}", response_model=ProductResponse)
 def update_product(
     product_id: int,
     product_data: ProductUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """Update a product (Admin only)."""
-    db_product = crud_product.get_product(db, product_id)
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return crud_product.update_product(db, db_product, product_data)
+    """
+    Update a product (Admin only). With ``If-Match: "<version>"`` the update
+    only applies to that version of the product; otherwise 412 is returned
+    and the client should re-read it. Without the header, an update that
+    races another writer is retried on the current row.
+    """
+    def apply():
+        db_product = crud_product.get_product(db, product_id)
+        if not db_product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if if_match is not None and not _etag_matches(if_match, product_etag(db_product.version), weak=False):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Product was modified since it was read",
+                headers={"ETag": product_etag(db_product.version)},
+            )
+        return crud_product.update_product(db, db_product, product_data)
+
+    # A retry re-reads the product, so a lost race with If-Match ends in 412
+    product = retry_stale(db, apply)
+    response.headers["ETag"] = product_etag(product.version)
+    return product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product(
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, products, orders
+from app.api.v1 import auth, products, orders, admin
 
 api_router = APIRouter()
 
@@ -7,3 +7,4 @@ api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 api_router.include_router(products.router, prefix="/products", tags=["Products"])
 api_router.include_router(orders.router, prefix="/orders", tags=["Orders"])
+api_router.include_router(admin.router, prefix="/admin", tags=["Admin"])
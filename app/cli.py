@@ -0,0 +1,123 @@
+"""
+Operational commands.
+
+    python -m app.cli ensure-partitions --months-ahead 3
+    python -m app.cli archive-orders --before 2026-01 --output-dir /archive [--format parquet] [--drop]
+    python -m app.cli build-recommendations [--full]
+"""
+import argparse
+import logging
+import sys
+from datetime import date
+from typing import List, Optional
+
+
+def _month(value: str) -> date:
+    try:
+        year, month = value.split("-")[:2]
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {value!r}")
+
+
+def ensure_partitions_command(args: argparse.Namespace) -> int:
+    from app.db.partitions import maintain_partitions
+
+    names = maintain_partitions(months_ahead=args.months_ahead)
+    if not names:
+        print("Orders are not partitioned on this database; nothing to do")
+    for name in names:
+        print(name)
+    return 0
+
+
+def archive_orders_command(args: argparse.Namespace) -> int:
+    from app.db.base import get_engine
+    from app.services.order_archive import archive_partitions
+
+    archived = archive_partitions(
+        get_engine(),
+        before=args.before,
+        output_dir=args.output_dir,
+        fmt=args.format,
+        batch_size=args.batch_size,
+        drop=args.drop,
+        dry_run=args.dry_run,
+    )
+    if not archived:
+        print(f"No partitions end before {args.before.isoformat()}")
+    for partition in archived:
+        if args.dry_run:
+            print(f"would archive {partition.table}")
+        else:
+            print(f"{partition.table}: {partition.rows} rows -> {partition.path}")
+    return 0
+
+
+def build_recommendations_command(args: argparse.Namespace) -> int:
+    from app.core.config import get_settings
+    from app.db.base import get_engine
+    from app.services.recommendations import build_recommendations
+
+    settings = get_settings()
+    stats = build_recommendations(
+        get_engine(),
+        settings.RECOMMENDATIONS_DIR,
+        top_k=settings.RECOMMENDATIONS_TOP_K,
+        max_basket_size=settings.RECOMMENDATIONS_MAX_BASKET_SIZE,
+        settle_seconds=settings.RECOMMENDATIONS_SETTLE_SECONDS,
+        chunk_size=args.chunk_size,
+        full=args.full,
+    )
+    print(f"{stats['orders']} orders folded in, {stats['products']} products indexed "
+          f"(through order {stats['last_order_id']})")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure = commands.add_parser("ensure-partitions", help="Create upcoming monthly order partitions")
+    ensure.add_argument("--months-ahead", type=int, default=None)
+    ensure.set_defaults(handler=ensure_partitions_command)
+
+    archive = commands.add_parser(
+        "archive-orders", help="Export and detach order partitions older than a month"
+    )
+    archive.add_argument("--before", type=_month, required=True,
+                         help="First month to keep (YYYY-MM); older partitions are archived")
+    archive.add_argument("--output-dir", required=True)
+    archive.add_argument("--format", choices=("ndjson", "parquet"), default="ndjson")
+    archive.add_argument("--batch-size", type=int, default=5000)
+    archive.add_argument("--drop", action="store_true",
+                         help="Drop partitions after detaching them")
+    archive.add_argument("--dry-run", action="store_true")
+    archive.set_defaults(handler=archive_orders_command)
+
+    recommend = commands.add_parser(
+        "build-recommendations", help="Refresh frequently-bought-together recommendations"
+    )
+    recommend.add_argument("--full", action="store_true",
+                           help="Recompute from every order instead of only new ones")
+    recommend.add_argument("--chunk-size", type=int, default=50_000)
+    recommend.set_defaults(handler=build_recommendations_command)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    args = build_parser().parse_args(argv)
+    if getattr(args, "months_ahead", 0) is None:
+        from app.core.config import get_settings
+
+        args.months_ahead = get_settings().ORDER_PARTITION_MONTHS_AHEAD
+    try:
+        return args.handler(args)
+    except RuntimeError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Sampled, structured access logging.
+
+``AccessLogMiddleware`` measures each request and decides whether to keep
+it: slow and failed requests always are, the rest are kept at the sampling
+rate of the first matching rule. Kept entries are only appended to a
+bounded queue; a background ``AccessLogWriter`` thread drains it in batches
+and writes one JSON object per line, so the request path never formats
+JSON or waits on I/O. When the queue is full, entries are dropped and
+counted. (The stdlib ``logging`` call path alone costs more than the rest of
+the middleware, so entries bypass it.)
+
+The JWT is only decoded, to find the user id, for entries that are kept.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, IO, List, Optional
+from app.core.rate_limit import route_matches
+from app.core.security import decode_access_token
+from app.db import query_stats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SampleRule:
+    """Keep ``rate`` of one method and path's requests (a trailing ``*`` matches a prefix)."""
+    method: str
+    path: str
+    rate: float
+
+    def matches(self, method: str, path: str) -> bool:
+        return route_matches(self.method, self.path, method, path)
+
+
+def parse_sample_rules(config: Dict[str, float]) -> List[SampleRule]:
+    """Build rules from ``{"GET /health": 0.0, "GET /api/v1/products*": 0.1, ...}``."""
+    rules = []
+    for route, rate in config.items():
+        method, _, path = route.strip().partition(" ")
+        rules.append(SampleRule(method.upper(), path.strip(), float(rate)))
+    return rules
+
+
+class Sampler:
+    """Decides which finished requests are logged."""
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        rules: Optional[List[SampleRule]] = None,
+        slow_ms: float = 500.0,
+        keep_status: int = 500,
+        random_source=random.random,
+    ):
+        self.rate = rate
+        self.rules = rules or []
+        self.slow_ms = slow_ms
+        self.keep_status = keep_status
+        self._random = random_source
+
+    def keep(self, method: str, path: str, status: int, duration_ms: float) -> bool:
+        if status >= self.keep_status or duration_ms >= self.slow_ms:
+            return True
+        rate = self.rate
+        for rule in self.rules:
+            if rule.matches(method, path):
+                rate = rule.rate
+                break
+        return rate >= 1.0 or (rate > 0.0 and self._random() < rate)
+
+
+class AccessLogWriter:
+    """Background thread writing queued access entries as JSON lines, in batches."""
+
+    def __init__(self, stream: Optional[IO[str]] = None, queue_size: int = 10000, batch_size: int = 256):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @classmethod
+    def open(cls, path: Optional[str], **kwargs) -> "AccessLogWriter":
+        stream = open(path, "a", buffering=1 << 16, encoding="utf-8") if path else None
+        return cls(stream, **kwargs)
+
+    def submit(self, entry: dict) -> None:
+        """Queue an entry without blocking; drops it when the writer has fallen behind."""
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write out everything still queued and stop the thread."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _batch(self) -> List[dict]:
+        try:
+            entries = [self.queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        while len(entries) < self.batch_size:
+            try:
+                entries.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+    def _run(self) -> None:
+        while True:
+            entries = self._batch()
+            if entries:
+                self._write(entries)
+            elif self._stopping.is_set():
+                return
+
+    def _write(self, entries: List[dict]) -> None:
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(lines)
+            stream.flush()
+        except Exception:
+            # A broken log target must not take the writer down
+            logger.exception("Could not write access log entries")
+            return
+        self.written += len(entries)
+
+
+def _user_id(scope) -> Optional[int]:
+    for name, value in scope.get("headers") or []:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                payload = decode_access_token(token)
+                if payload and payload.get("sub") is not None:
+                    return int(payload["sub"])
+    return None
+
+
+def route_template(scope) -> Optional[str]:
+    """The matched path template, e.g. ``/api/v1/products/{product_id}``."""
+    # FastAPI keeps routes of included routers unprefixed and records the
+    # full template on the effective route context
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    return getattr(scope.get("route"), "path", None)
+
+
+def _request_id(scope) -> str:
+    for name, value in scope.get("headers") or []:
+        if name == b"x-request-id" and 0 < len(value) <= 128:
+            return value.decode("latin-1")
+    return uuid.uuid4().hex
+
+
+class AccessLogMiddleware:
+    """ASGI middleware timing requests and logging the sampled ones."""
+
+    def __init__(self, app, writer: AccessLogWriter, sampler: Sampler):
+        self.app = app
+        self.writer = writer
+        self.sampler = sampler
+        query_stats.install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = _request_id(scope)
+        response_status = 500
+
+        async def send_with_request_id(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        with query_stats.track(scope) as stats:
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                method, path = scope["method"], scope["path"]
+                if self.sampler.keep(method, path, response_status, duration_ms):
+                    self.writer.submit({
+                        "ts": round(time.time(), 3),
+                        "request_id": request_id,
+                        "user_id": _user_id(scope),
+                        "method": method,
+                        "path": path,
+                        "route": route_template(scope),
+                        "status": response_status,
+                        "duration_ms": round(duration_ms, 2),
+                        "db_ms": round(stats.seconds * 1000, 2),
+                        "db_queries": stats.count,
+                    })
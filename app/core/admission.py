@@ -0,0 +1,218 @@
+"""
+Adaptive admission control.
+
+Requests are sorted into route classes (checkout, auth, catalog reads),
+each with its own limit on concurrent in-flight requests. A request over
+the limit waits in its class's queue; if no slot frees up within the
+class's wait budget, it is rejected with 503 and ``Retry-After`` instead
+of piling onto a slow database.
+
+Limits adapt AIMD-style to observed latency. Every request that finishes
+within its class's latency target raises the limit by ``1/limit`` (about
+one slot per round of requests). A request that runs over the target, or
+fails with a 5xx, cuts the limit multiplicatively, at most once per
+cooldown. The cut also applies to every class of lower priority, and lower
+priority classes cut deeper: when checkout slows down, browsing gives up
+its share of the database first.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+from app.core.rate_limit import route_matches
+
+EXEMPT = "exempt"
+
+
+@dataclass
+class RouteClass:
+    """Admission settings of one class; ``priority`` 0 is the most important."""
+    name: str
+    priority: int
+    initial_limit: float
+    min_limit: float
+    max_limit: float
+    latency_target_ms: float
+    queue_budget_ms: float
+    decrease_factor: float
+    max_queue: int = 100
+
+
+DEFAULT_CLASSES = [
+    RouteClass("checkout", 0, initial_limit=10, min_limit=4, max_limit=30,
+               latency_target_ms=1000, queue_budget_ms=3000, decrease_factor=0.9),
+    RouteClass("auth", 1, initial_limit=8, min_limit=2, max_limit=20,
+               latency_target_ms=1000, queue_budget_ms=1000, decrease_factor=0.8),
+    RouteClass("catalog", 2, initial_limit=20, min_limit=2, max_limit=30,
+               latency_target_ms=250, queue_budget_ms=250, decrease_factor=0.5),
+]
+
+
+def parse_routes(config: Dict[str, str]) -> List[Tuple[str, str, str]]:
+    """Build ``(method, path, class)`` rules from ``{"POST /api/v1/orders*": "checkout", ...}``."""
+    rules = []
+    for route, name in config.items():
+        method, _, path = route.strip().partition(" ")
+        rules.append((method.upper(), path.strip(), name))
+    return rules
+
+
+class AdmissionRejected(Exception):
+    """The request waited longer than its class's budget, or the queue was full."""
+
+
+class _Limiter:
+    def __init__(self, route_class: RouteClass, cooldown: float):
+        self.route_class = route_class
+        self.limit = float(route_class.initial_limit)
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = float("-inf")
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "decreases": 0}
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < max(1, int(self.limit))
+
+    async def acquire(self) -> None:
+        if self._has_slot() and not self.waiters:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return
+        if len(self.waiters) >= self.route_class.max_queue:
+            self.counters["rejected"] += 1
+            raise AdmissionRejected(self.route_class.name)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait({waiter}, timeout=self.route_class.queue_budget_ms / 1000)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the request went away
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+                self.waiters.remove(waiter)
+        if waiter.cancelled():
+            self.counters["rejected"] += 1
+            raise AdmissionRejected(self.route_class.name)
+        # release() handed its slot over to this waiter
+        self.counters["admitted"] += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self.waiters and self._has_slot():
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def increase(self) -> None:
+        self.limit = min(self.route_class.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def decrease(self, now: float) -> None:
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.route_class.min_limit, self.limit * self.route_class.decrease_factor)
+        self.counters["decreases"] += 1
+
+    def metrics(self) -> dict:
+        return {
+            "priority": self.route_class.priority,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self.waiters),
+            **self.counters,
+        }
+
+
+class AdmissionController:
+    """Per-class adaptive concurrency limits; used from the event loop only."""
+
+    def __init__(self, classes: List[RouteClass], routes: List[Tuple[str, str, str]], cooldown: float = 1.0):
+        self.limiters = {route_class.name: _Limiter(route_class, cooldown) for route_class in classes}
+        self.routes = routes
+
+    def classify(self, method: str, path: str) -> Optional[_Limiter]:
+        for rule_method, rule_path, name in self.routes:
+            if route_matches(rule_method, rule_path, method, path):
+                return self.limiters.get(name)  # None for EXEMPT
+        return None
+
+    def record(self, limiter: _Limiter, latency_ms: float, failed: bool) -> None:
+        """Adjust limits after a request of ``limiter``'s class finished."""
+        if not failed and latency_ms <= limiter.route_class.latency_target_ms:
+            limiter.increase()
+            return
+        now = time.monotonic()
+        for other in self.limiters.values():
+            if other.route_class.priority >= limiter.route_class.priority:
+                other.decrease(now)
+
+    def metrics(self) -> Dict[str, dict]:
+        return {name: limiter.metrics() for name, limiter in self.limiters.items()}
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting, queueing or shedding requests by route class."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def _reject(self, limiter: _Limiter, send) -> None:
+        body = json.dumps({"detail": "Server is busy, please retry"}).encode()
+        retry_after = max(1, math.ceil(limiter.route_class.queue_budget_ms / 1000))
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"retry-after", str(retry_after).encode()),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limiter = self.controller.classify(scope["method"], scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected:
+            await self._reject(limiter, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            limiter.release()
+            self.controller.record(limiter, latency_ms, failed=status >= 500)
@@ -1,5 +1,6 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -16,12 +17,133 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "ecommerce_db"
     DATABASE_URL: str = "postgresql://postgres:postgres@db:5432/ecommerce_db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+
+    # SQLite (single-node installs with DATABASE_URL=sqlite:////path/to/shop.db)
+    SQLITE_SINGLE_WRITER: bool = True  # All writes of a worker share one connection
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL stays consistent; "FULL" also survives power loss
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     
     # JWT Configuration
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Read Coalescing (concurrent identical product reads share one query)
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = 5.0
+    
+    # Optimistic Concurrency (retries of updates that lost a race on Product.version)
+    OPTIMISTIC_RETRY_ATTEMPTS: int = 3
+    OPTIMISTIC_RETRY_BACKOFF_SECONDS: float = 0.01  # Doubled per attempt, with jitter
+
+    # Category Facets
+    FACET_REBUILD_INTERVAL_SECONDS: float = 300.0
+    
+    # Catalog Snapshot (precompressed JSON files on local disk)
+    CATALOG_SNAPSHOT_DIR: str = "/tmp/ecommerce_catalog"
+    CATALOG_SNAPSHOT_DEBOUNCE_SECONDS: float = 2.0
+    CATALOG_SNAPSHOT_MAX_AGE_SECONDS: float = 300.0
+    CATALOG_SNAPSHOT_KEEP_VERSIONS: int = 3
+    
+    # Recommendations (built by ``python -m app.cli build-recommendations``)
+    RECOMMENDATIONS_DIR: str = "/tmp/ecommerce_recommendations"
+    RECOMMENDATIONS_TOP_K: int = 20
+    RECOMMENDATIONS_MAX_BASKET_SIZE: int = 100
+    RECOMMENDATIONS_SETTLE_SECONDS: float = 300.0
+    RECOMMENDATIONS_RELOAD_INTERVAL_SECONDS: float = 300.0
+    
+    # Best-Seller Leaderboards
+    LEADERBOARD_SYNC_INTERVAL_SECONDS: float = 30.0
+
+    # Write-Behind Counters (product views, user last-seen; a crash loses one interval at most)
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: float = 5.0
+    WRITE_BEHIND_MAX_KEYS: int = 100000  # Per buffer; views of further keys are dropped until a flush
+    WRITE_BEHIND_BATCH_SIZE: int = 1000  # Rows per upsert statement
+
+    # Order Listing
+    ORDER_COUNT_EXACT_THRESHOLD: int = 1000  # Larger totals use the planner estimate
+    
+    # Order Partitioning (PostgreSQL only, see app/db/partitions.py)
+    ORDER_PARTITION_MONTHS_AHEAD: int = 3
+    ORDER_PARTITION_CHECK_INTERVAL_SECONDS: float = 21600.0
+    
+    # Rate Limiting ("METHOD /path" or "METHOD /prefix*" -> "requests/period")
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: Dict[str, str] = {
+        "POST /api/v1/auth/login": "10/minute",
+        "POST /api/v1/auth/register": "5/minute",
+        "GET /api/v1/products*": "300/minute",
+    }
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" or "sqlite" (shared by local workers)
+    RATE_LIMIT_SQLITE_PATH: str = "/tmp/ecommerce_rate_limits.db"
+    RATE_LIMIT_IDLE_SECONDS: float = 600.0
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+    
+    # Admission Control (adaptive concurrency per route class, see app/core/admission.py)
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_ROUTES: Dict[str, str] = {  # First match wins; same syntax as RATE_LIMITS
+        "GET /api/v1/products/stream": "exempt",  # Long-lived streams
+        "POST /api/v1/orders*": "checkout",
+        "POST /api/v1/auth/*": "auth",
+        "GET /api/v1/products*": "catalog",
+    }
+    ADMISSION_DECREASE_COOLDOWN_SECONDS: float = 1.0
+    
+    # Access Logging (JSON lines written by a background thread)
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_PATH: Optional[str] = None  # Standard output when unset
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SAMPLE_RATES: Dict[str, float] = {  # Same route syntax as RATE_LIMITS
+        "GET /health": 0.0,
+    }
+    ACCESS_LOG_SLOW_MS: float = 500.0  # Slower requests are always logged
+    ACCESS_LOG_KEEP_STATUS: int = 500  # So are responses with this status or above
+    ACCESS_LOG_QUEUE_SIZE: int = 10000
+    ACCESS_LOG_BATCH_SIZE: int = 256
+    
+    # Slow-Query Log (GET /api/v1/admin/slow-queries)
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_LOG_SIZE: int = 500
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.05  # EXPLAIN ANALYZE runs the query again
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: float = 300.0  # Per normalized statement
+    
+    # N+1 Query Detection (development and tests)
+    NPLUSONE_DETECTION: str = "off"  # "off", "warn" or "raise"
+    NPLUSONE_THRESHOLD: int = 5  # Times one statement shape may run per request
+    
+    # Live Product Updates (server-sent events)
+    SSE_MAX_SUBSCRIBERS: int = 1000
+    SSE_MAX_PENDING_UPDATES: int = 500
+    SSE_COALESCE_MS: int = 250
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Production Server (see gunicorn.conf.py)
+    SERVER_BIND: str = "0.0.0.0:8000"
+    SERVER_WORKERS: Optional[int] = None  # Defaults to the CPU count
+    SERVER_TIMEOUT_SECONDS: int = 30
+    WARMUP_DB_CONNECTIONS: int = 2
+    
+    # Background Jobs
+    JOB_WORKERS: int = 4
+    JOB_QUEUE_SIZE: int = 1000
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 0.5
+    JOB_DRAIN_TIMEOUT_SECONDS: float = 10.0
+    
+    # Outbox Dispatcher
+    OUTBOX_DISPATCHER_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_BACKOFF_SECONDS: float = 2.0
+    OUTBOX_LEASE_SECONDS: float = 60.0  # Claimed events are redelivered if not settled by then
+    OUTBOX_FILE_SINK_PATH: Optional[str] = None
+    OUTBOX_HTTP_SINK_URL: Optional[str] = None
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
@@ -29,4 +151,14 @@ class Settings(BaseSettings):
     )
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """Build the settings on first use instead of at import time."""
+    return Settings()
+
+
+def __getattr__(name: str):
+    # ``from app.core.config import settings`` keeps working, lazily
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
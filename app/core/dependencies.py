@@ -5,7 +5,9 @@ from jose import JWTError
 from sqlalchemy.orm import Session
 from app.db.base import get_db
 from app.core.security import decode_access_token
+from app.crud.loaders import RequestLoaders
 from app.models.user import User
+from app.services.write_behind import record_user_seen
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -36,9 +38,35 @@ def get_current_user(
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
+    # Buffered; written to user_last_seen by the write-behind flush
+    record_user_seen(user.id)
     return user
 
 
+def get_token_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """
+    Authenticate from the JWT alone, without a database session, for
+    long-lived streams that must not hold a pooled connection. Nothing
+    checks the user row, so a deactivated or deleted account is accepted
+    until its token expires; everything else uses ``get_current_user``.
+    """
+    payload = decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user_id = int(payload["sub"])
+    record_user_seen(user_id)
+    return user_id
+
+
+def get_loaders(db: Session = Depends(get_db)) -> RequestLoaders:
+    """Batching loaders for this request, sharing its database session."""
+    return RequestLoaders(db)
+
+
 def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
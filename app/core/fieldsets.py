@@ -0,0 +1,59 @@
+"""
+Sparse fieldsets.
+
+``?fields=id,name,price`` narrows both the SQL projection and the JSON
+payload of list and detail endpoints. ``id`` is always returned.
+``?expand=product`` embeds related resources the same endpoints can load
+in batches.
+"""
+from typing import Iterable, List, Optional
+from fastapi import HTTPException, Query, status
+
+
+def parse_fields(
+    fields: Optional[str],
+    allowed: Iterable[str],
+    always: Iterable[str] = ("id",)
+) -> Optional[List[str]]:
+    """Validate a comma-separated field list. Returns None when not given."""
+    if fields is None:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    # Keep the requested order, without duplicates
+    return list(dict.fromkeys([*always, *requested]))
+
+
+class FieldSelector:
+    """Dependency parsing the ``fields`` query parameter for one resource."""
+
+    def __init__(self, allowed: Iterable[str]):
+        self.allowed = list(allowed)
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(
+            None, description="Comma-separated list of fields to return"
+        )
+    ) -> Optional[List[str]]:
+        return parse_fields(fields, self.allowed)
+
+
+class ExpandSelector:
+    """Dependency parsing the ``expand`` query parameter for one resource."""
+
+    def __init__(self, allowed: Iterable[str]):
+        self.allowed = list(allowed)
+
+    def __call__(
+        self,
+        expand: Optional[str] = Query(
+            None, description="Comma-separated related resources to embed"
+        )
+    ) -> Optional[List[str]]:
+        return parse_fields(expand, self.allowed, always=())
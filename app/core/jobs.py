@@ -0,0 +1,261 @@
+"""
+In-process background job runner.
+
+Request handlers call ``enqueue()`` to hand slow side effects (aggregate
+recomputation, cache invalidation fan-out, notifications) to a pool of
+asyncio workers started with the application lifespan. Synchronous jobs
+run in the default thread pool so they never block the event loop.
+"""
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Deque, List, Optional
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the runner already holds its maximum number of jobs."""
+
+
+@dataclass
+class RetryPolicy:
+    """How often and how quickly a failing job is retried."""
+    max_attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        return min(self.backoff * (2 ** (attempt - 1)), self.max_backoff)
+
+
+@dataclass
+class Job:
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    name: str
+    enqueued_at: float
+    attempts: int = 0
+
+
+class JobRunner:
+    """Bounded asyncio work queue served by a fixed number of workers."""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        queue_size: int = 1000,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry = retry or RetryPolicy()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._schedules: List[asyncio.Task] = []
+        self._accepting = False
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._latencies: Deque[float] = deque(maxlen=1024)
+        self._waits: Deque[float] = deque(maxlen=1024)
+        self._counters = {
+            "enqueued": 0, "completed": 0, "failed": 0, "retried": 0, "rejected": 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    async def start(self) -> None:
+        """Spawn the workers on the running event loop."""
+        if self._accepting:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._accepting = True
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting work, drain what is queued, then stop the workers."""
+        if not self._tasks:
+            return
+        for task in self._schedules:
+            task.cancel()
+        await asyncio.gather(*self._schedules, return_exceptions=True)
+        self._schedules = []
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Job runner drain timed out with %d jobs pending", self._pending)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """
+        Schedule ``func(*args, **kwargs)`` and return immediately.
+        Safe to call from the event loop or from threadpool request handlers.
+        When the runner is not started (CLI tools, scripts) the job runs inline.
+        """
+        if not self._accepting:
+            func(*args, **kwargs)
+            return
+
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self._counters["rejected"] += 1
+                raise JobQueueFull(f"Job queue is full ({self.queue_size} jobs)")
+            self._pending += 1
+            self._counters["enqueued"] += 1
+
+        job = Job(
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            name=getattr(func, "__qualname__", repr(func)),
+            enqueued_at=time.perf_counter(),
+        )
+        self._loop.call_soon_threadsafe(self._put, job)
+
+    def every(self, interval: float, func: Callable[..., Any], *args: Any, run_now: bool = True) -> None:
+        """
+        Enqueue ``func(*args)`` every ``interval`` seconds until the runner
+        stops. A tick is skipped while the previous run is still pending, so
+        a slow job never piles up behind itself. Call from the event loop.
+        """
+        self._schedules.append(asyncio.create_task(
+            self._repeat(interval, func, args, run_now),
+            name=f"job-schedule-{getattr(func, '__qualname__', func)}",
+        ))
+
+    async def _repeat(self, interval: float, func: Callable[..., Any], args: tuple, run_now: bool) -> None:
+        in_flight = threading.Event()
+
+        def run() -> None:
+            try:
+                func(*args)
+            finally:
+                in_flight.clear()
+
+        run.__qualname__ = getattr(func, "__qualname__", repr(func))
+        if not run_now:
+            await asyncio.sleep(interval)
+        while True:
+            if not in_flight.is_set():
+                in_flight.set()
+                try:
+                    self.enqueue(run)
+                except JobQueueFull:
+                    in_flight.clear()
+                    logger.warning("Skipping scheduled job %s: queue is full", run.__qualname__)
+            await asyncio.sleep(interval)
+
+    def _put(self, job: Job) -> None:
+        self._idle.clear()
+        self._queue.put_nowait(job)
+
+    def _finish(self) -> None:
+        with self._lock:
+            self._pending -= 1
+            idle = self._pending == 0
+        if idle:
+            self._idle.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            started = time.perf_counter()
+            if job.attempts == 0:
+                self._waits.append(started - job.enqueued_at)
+            job.attempts += 1
+            try:
+                if inspect.iscoroutinefunction(job.func):
+                    await job.func(*job.args, **job.kwargs)
+                else:
+                    await asyncio.to_thread(job.func, *job.args, **job.kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if job.attempts < self.retry.max_attempts:
+                    self._counters["retried"] += 1
+                    delay = self.retry.delay(job.attempts)
+                    logger.warning("Job %s failed, retrying in %.2fs", job.name, delay)
+                    self._loop.call_later(delay, self._queue.put_nowait, job)
+                else:
+                    self._counters["failed"] += 1
+                    logger.exception("Job %s failed after %d attempts", job.name, job.attempts)
+                    self._finish()
+            else:
+                self._counters["completed"] += 1
+                self._latencies.append(time.perf_counter() - started)
+                self._finish()
+            finally:
+                self._queue.task_done()
+
+    def metrics(self) -> dict:
+        """Queue depth, counters and latency percentiles in milliseconds."""
+        return {
+            "running": self._accepting,
+            "workers": self.workers,
+            "queue_capacity": self.queue_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "pending": self._pending,
+            **self._counters,
+            "latency_ms": _summarize(self._latencies),
+            "wait_ms": _summarize(self._waits),
+        }
+
+
+def _summarize(samples: Deque[float]) -> dict:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def percentile(q: float) -> float:
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 3)
+
+    return {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)}
+
+
+@lru_cache
+def get_job_runner() -> JobRunner:
+    """The application's job runner, configured from settings on first use."""
+    settings = get_settings()
+    return JobRunner(
+        workers=settings.JOB_WORKERS,
+        queue_size=settings.JOB_QUEUE_SIZE,
+        retry=RetryPolicy(
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            backoff=settings.JOB_RETRY_BACKOFF_SECONDS,
+        ),
+    )
+
+
+def enqueue(func: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+    """
+    Schedule a fire-and-forget job on the application runner.
+    Returns False, dropping the job, when the queue is full so that a
+    backlog of side effects never fails the request that produced them.
+    """
+    try:
+        get_job_runner().enqueue(func, *args, **kwargs)
+    except JobQueueFull:
+        logger.warning("Dropping job %s: queue is full", getattr(func, "__qualname__", func))
+        return False
+    return True
@@ -0,0 +1,361 @@
+"""
+Token-bucket rate limiting.
+
+``RateLimitMiddleware`` is a plain ASGI middleware so a rejected request
+costs a dictionary lookup and never reaches routing, the database or
+bcrypt. Callers are identified by the user id in their JWT (verified
+statelessly) or, for anonymous requests, by client IP. Every limited
+response carries ``RateLimit-Limit``, ``RateLimit-Remaining`` and
+``RateLimit-Reset`` headers; rejections also carry ``Retry-After``.
+
+Stores that do I/O (``blocking = True``) are called from a worker thread so
+lock waits never stall the event loop, and a store that cannot answer in
+time lets the request through rather than failing it.
+"""
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Protocol, Tuple
+import anyio
+from app.core.security import decode_access_token
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """``requests`` per ``period`` seconds, with bursts up to ``requests``."""
+    requests: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """Parse strings such as ``"10/minute"`` or ``"100/30"`` (seconds)."""
+        count, _, period = value.partition("/")
+        period = period.strip()
+        seconds = PERIODS.get(period.rstrip("s")) or float(period)
+        return cls(requests=int(count), period=seconds)
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float
+
+
+class StoreUnavailable(Exception):
+    """The store could not answer, e.g. its lock was held past the busy timeout."""
+
+
+class RateLimitStore(Protocol):
+    """Backend holding bucket state; ``hit`` must be atomic per key."""
+
+    blocking: bool
+
+    def hit(self, key: str, limit: RateLimit, now: Optional[float] = None) -> RateLimitResult:
+        ...
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+def _take(tokens: float, updated: float, limit: RateLimit, now: float) -> Tuple[bool, float]:
+    """Refill a bucket up to ``now`` and try to take one token."""
+    tokens = min(float(limit.requests), tokens + (now - updated) * limit.rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+def _full_at(tokens: float, limit: RateLimit, now: float) -> float:
+    """When a bucket left alone from ``now`` is full again, and can be forgotten."""
+    return now + (limit.requests - tokens) / limit.rate
+
+
+def _result(allowed: bool, tokens: float, limit: RateLimit) -> RateLimitResult:
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit.requests,
+        remaining=int(tokens),
+        reset_after=(limit.requests - tokens) / limit.rate,
+        retry_after=0.0 if allowed else (1 - tokens) / limit.rate,
+    )
+
+
+class MemoryTokenBucketStore:
+    """
+    Per-process buckets in an LRU-ordered dict.
+    Each hit is O(1); buckets untouched for ``idle_seconds`` are evicted
+    from the cold end as new keys arrive, once they have refilled (a
+    ``1000/day`` bucket may take longer than that). ``max_keys`` caps
+    memory under a flood of distinct clients.
+    """
+
+    blocking = False
+
+    def __init__(self, idle_seconds: float = 600.0, max_keys: int = 100_000):
+        self.idle_seconds = idle_seconds
+        self.max_keys = max_keys
+        # key -> [tokens, updated, full_at]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def hit(self, key: str, limit: RateLimit, now: Optional[float] = None) -> RateLimitResult:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._evict(now)
+                bucket = [float(limit.requests), now, now]
+                self._buckets[key] = bucket
+            else:
+                self._buckets.move_to_end(key)
+            allowed, bucket[0] = _take(bucket[0], bucket[1], limit, now)
+            bucket[1] = now
+            bucket[2] = _full_at(bucket[0], limit, now)
+            return _result(allowed, bucket[0], limit)
+
+    def _evict(self, now: float) -> int:
+        buckets = self._buckets
+        evicted = 0
+        for _ in range(len(buckets)):
+            key, (_, updated, full_at) = next(iter(buckets.items()))
+            if len(buckets) < self.max_keys:
+                if now - updated < self.idle_seconds:
+                    break
+                if now < full_at:
+                    # Idle but still refilling; look at it again later
+                    buckets.move_to_end(key)
+                    continue
+            buckets.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop idle buckets even when no new keys arrive."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._evict(now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteTokenBucketStore:
+    """
+    Buckets shared by all workers on a host through a local SQLite file.
+    A stand-in for a networked store such as Redis: each hit is one short
+    ``BEGIN IMMEDIATE`` transaction, which serializes updates across processes.
+    Idle buckets are deleted by a scheduled ``evict_idle`` once they have refilled.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, idle_seconds: float = 600.0, busy_timeout: float = 5.0):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, "
+                "full_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(buckets)")}
+            if "full_at" not in columns:
+                # Files written before buckets recorded when they refill
+                conn.execute("ALTER TABLE buckets ADD COLUMN full_at REAL NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, limit: RateLimit, now: Optional[float] = None) -> RateLimitResult:
+        # Wall-clock time: monotonic clocks are not comparable across processes
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (float(limit.requests), now)
+            allowed, tokens = _take(tokens, updated, limit, now)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                "full_at = excluded.full_at",
+                (key, tokens, now, _full_at(tokens, limit, now)),
+            )
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise StoreUnavailable(str(exc)) from exc
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return _result(allowed, tokens, limit)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        cursor = self._connect().execute(
+            "DELETE FROM buckets WHERE updated < ? AND full_at <= ?", (now - self.idle_seconds, now)
+        )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM buckets")
+
+
+def route_matches(rule_method: str, rule_path: str, method: str, path: str) -> bool:
+    """Match a request against a ``METHOD /path`` rule (``*`` method, trailing ``*`` prefix)."""
+    if rule_method != "*" and rule_method != method:
+        return False
+    if rule_path.endswith("*"):
+        return path.startswith(rule_path[:-1])
+    return path == rule_path
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """A limit applied to one method and path (a trailing ``*`` matches a prefix)."""
+    method: str
+    path: str
+    limit: RateLimit
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+    def matches(self, method: str, path: str) -> bool:
+        return route_matches(self.method, self.path, method, path)
+
+
+def parse_rules(config: Dict[str, str]) -> List[RateLimitRule]:
+    """Build rules from ``{"POST /api/v1/auth/login": "5/minute", ...}``."""
+    rules = []
+    for route, value in config.items():
+        method, _, path = route.strip().partition(" ")
+        rules.append(RateLimitRule(method.upper(), path.strip(), RateLimit.parse(value)))
+    return rules
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing per-route token buckets."""
+
+    def __init__(
+        self,
+        app,
+        store: RateLimitStore,
+        rules: List[RateLimitRule],
+        trust_forwarded_for: bool = False,
+    ):
+        self.app = app
+        self.store = store
+        self.rules = rules
+        self.trust_forwarded_for = trust_forwarded_for
+
+    def _match(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return None
+
+    def _identity(self, scope) -> str:
+        headers = dict(scope.get("headers") or [])
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            payload = decode_access_token(token)
+            if payload and payload.get("sub") is not None:
+                return f"user:{payload['sub']}"
+        if self.trust_forwarded_for and b"x-forwarded-for" in headers:
+            return "ip:" + headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._match(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{rule.name}|{self._identity(scope)}"
+        try:
+            if self.store.blocking:
+                result = await anyio.to_thread.run_sync(self.store.hit, key, rule.limit)
+            else:
+                result = self.store.hit(key, rule.limit)
+        except StoreUnavailable:
+            # Fail open: an unavailable limiter must not take the API down with it
+            logger.warning("Rate limit store unavailable; allowing %s %s", scope["method"], scope["path"])
+            await self.app(scope, receive, send)
+            return
+        headers = [
+            (b"ratelimit-limit", str(result.limit).encode()),
+            (b"ratelimit-remaining", str(result.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(result.reset_after)).encode()),
+        ]
+
+        if not result.allowed:
+            body = json.dumps({"detail": "Too many requests"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", str(math.ceil(result.retry_after)).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def build_store(backend: str, sqlite_path: str, idle_seconds: float) -> RateLimitStore:
+    """Create the store selected in settings."""
+    if backend == "sqlite":
+        return SQLiteTokenBucketStore(sqlite_path, idle_seconds=idle_seconds)
+    if backend == "memory":
+        return MemoryTokenBucketStore(idle_seconds=idle_seconds)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
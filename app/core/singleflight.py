@@ -0,0 +1,110 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+When many requests in one worker ask for the same key at the same moment,
+the first caller (the leader) runs the query and every other caller waits
+for and shares its result, or its exception. Nothing is cached: once the
+leader finishes, the next caller for that key starts a fresh query. Shared
+results must be treated as read-only, so callers coalesce plain data (dicts)
+rather than ORM objects bound to the leader's session.
+"""
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from app.core.config import get_settings
+
+
+class SingleFlightTimeout(Exception):
+    """Raised to a waiter whose leader did not finish within the timeout."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "started", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started = time.monotonic()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-process registry of in-flight calls keyed by ``(namespace, key)``."""
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+        self._calls: Dict[Tuple[str, Hashable], _Call] = {}
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "shared": 0, "errors": 0, "timeouts": 0}
+
+    def do(
+        self,
+        namespace: str,
+        key: Hashable,
+        func: Callable[[], Any],
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Return ``func()``, sharing one execution among concurrent callers.
+        Waiters give up with ``SingleFlightTimeout`` after ``timeout``
+        seconds; a call that has run longer than that no longer accepts new
+        waiters, so one stuck query cannot hold a key hostage.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        flight_key = (namespace, key)
+        with self._lock:
+            call = self._calls.get(flight_key)
+            if call is not None and time.monotonic() - call.started < timeout:
+                call.waiters += 1
+                self._counters["shared"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[flight_key] = call
+                self._counters["calls"] += 1
+                leader = True
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as exc:
+                call.error = exc
+                self._counters["errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    if self._calls.get(flight_key) is call:
+                        del self._calls[flight_key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(timeout):
+            self._counters["timeouts"] += 1
+            raise SingleFlightTimeout(f"{namespace} {key!r} did not complete within {timeout}s")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def forget(self, namespace: str, key: Hashable = None) -> None:
+        """
+        Stop new callers from joining in-flight calls for one key, or for a
+        whole namespace when ``key`` is None. Writers call this after commit
+        so reads that started before the write are not handed out afterwards.
+        """
+        with self._lock:
+            if key is not None:
+                self._calls.pop((namespace, key), None)
+                return
+            for flight_key in [k for k in self._calls if k[0] == namespace]:
+                del self._calls[flight_key]
+
+    def metrics(self) -> dict:
+        return {"in_flight": len(self._calls), "timeout_seconds": self.timeout, **self._counters}
+
+
+@lru_cache
+def get_single_flight() -> SingleFlight:
+    """This worker's coalescer, configured from settings on first use."""
+    return SingleFlight(timeout=get_settings().SINGLE_FLIGHT_TIMEOUT_SECONDS)
@@ -0,0 +1,78 @@
+"""
+Per-worker warm-up.
+
+Runs once in every server worker before it starts accepting requests so
+that the first real requests don't pay for opening database connections,
+loading the bcrypt backend or generating the OpenAPI schema.
+"""
+import logging
+import os
+import resource
+import time
+from typing import Optional
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.core.config import get_settings
+from app.core.security import create_access_token, decode_access_token, get_pwd_context
+from app.db.base import get_engine
+
+logger = logging.getLogger(__name__)
+
+
+def prime_db_pool(engine: Engine, connections: int) -> None:
+    """Open ``connections`` pooled connections and return them to the pool."""
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+def prime_auth() -> None:
+    """Load the bcrypt backend and JWT signing path."""
+    get_pwd_context().handler("bcrypt").get_backend()
+    decode_access_token(create_access_token({"sub": "0"}))
+
+
+def memory_usage_mb() -> dict:
+    """Current and peak resident set size of this process."""
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    current_kb = None
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    current_kb = int(line.split()[1])
+                    break
+    except OSError:
+        pass
+    return {
+        "rss_mb": round(current_kb / 1024, 1) if current_kb is not None else None,
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def warm_up(app: FastAPI, engine: Optional[Engine] = None) -> dict:
+    """Prime the DB pool, auth caches and OpenAPI schema. Returns timings in ms."""
+    timings = {}
+
+    started = time.perf_counter()
+    prime_db_pool(engine or get_engine(), get_settings().WARMUP_DB_CONNECTIONS)
+    timings["db_pool_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    prime_auth()
+    timings["auth_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    app.openapi()
+    timings["openapi_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    report = {"pid": os.getpid(), **timings, **memory_usage_mb()}
+    logger.info("Worker warm-up complete: %s", report)
+    return report
@@ -0,0 +1,65 @@
+"""
+Request-scoped batching loaders.
+
+A loader collects the ids a request needs and resolves them with one
+``WHERE id IN (...)`` query per entity type, memoizing every result
+(including misses) for the rest of the request. Get one per request with
+the ``get_loaders`` dependency so nothing is shared between sessions.
+"""
+from typing import Dict, Generic, Iterable, List, Optional, Set, Type, TypeVar
+from sqlalchemy.orm import Session
+from app.models.product import Product
+from app.models.user import User
+
+ModelT = TypeVar("ModelT")
+
+# Keeps IN lists well under every backend's bound-parameter limit
+MAX_BATCH_SIZE = 500
+
+
+class EntityLoader(Generic[ModelT]):
+    """Batches and memoizes primary-key lookups of one model."""
+
+    def __init__(self, db: Session, model: Type[ModelT]):
+        self.db = db
+        self.model = model
+        self.queries = 0
+        self._cache: Dict[int, Optional[ModelT]] = {}
+        self._queued: Set[int] = set()
+
+    def prime(self, ids: Iterable[int]) -> None:
+        """Queue ids to be fetched together with the next load."""
+        self._queued.update(i for i in ids if i not in self._cache)
+
+    def dispatch(self) -> None:
+        """Resolve every queued id."""
+        queued = sorted(self._queued - self._cache.keys())
+        self._queued.clear()
+        for start in range(0, len(queued), MAX_BATCH_SIZE):
+            chunk = queued[start:start + MAX_BATCH_SIZE]
+            self.queries += 1
+            rows = self.db.query(self.model).filter(self.model.id.in_(chunk)).all()
+            self._cache.update({i: None for i in chunk})
+            self._cache.update({row.id: row for row in rows})
+
+    def load(self, id: int) -> Optional[ModelT]:
+        if id not in self._cache:
+            self._queued.add(id)
+            self.dispatch()
+        return self._cache[id]
+
+    def load_many(self, ids: Iterable[int]) -> List[Optional[ModelT]]:
+        """Results in the order of ``ids``; None for ids that do not exist."""
+        ids = list(ids)
+        self.prime(ids)
+        if self._queued:
+            self.dispatch()
+        return [self._cache[i] for i in ids]
+
+
+class RequestLoaders:
+    """The loaders available to one request."""
+
+    def __init__(self, db: Session):
+        self.products: EntityLoader[Product] = EntityLoader(db, Product)
+        self.users: EntityLoader[User] = EntityLoader(db, User)
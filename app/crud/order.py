@@ -1,19 +1,38 @@
-from sqlalchemy.orm import Session
+from datetime import datetime
+from sqlalchemy import bindparam, func, select, text, update
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
-from app.models.order import Order, OrderItem
+from app.models.order import Order, OrderItem, OrderStatus
 from app.models.product import Product
-from app.schemas.order import OrderCreate
+from app.models.outbox import OutboxEvent
+from app.schemas.order import OrderCreate, OrderItemResponse, OrderProductSummary, OrderUserSummary
+from app.crud.loaders import RequestLoaders
+from app.core.jobs import enqueue
+from app.crud.product import forget_product_reads
+from app.services.catalog_events import product_snapshot, publish_product_changes
+from app.services.leaderboard import record_returns, record_sales
+from app.services.outbox import wake_dispatchers
 
-def create_order(db: Session, order_data: OrderCreate, user_id: int):
+def create_order(
+    db: Session,
+    order_data: OrderCreate,
+    user_id: int,
+    loaders: Optional[RequestLoaders] = None
+):
     """
     Business logic for creating an order. 
     Includes stock validation and price snapshots.
     """
     total_amount = 0.0
     order_items_data = []
+    touched_products = []
+    loaders = loaders or RequestLoaders(db)
     
-    for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+    # One query for every product in the order
+    products = loaders.products.load_many(item.product_id for item in order_data.items)
+    
+    for item, product in zip(order_data.items, products):
         
         if not product:
             raise HTTPException(
@@ -38,6 +57,8 @@ def create_order(db: Session, order_data: OrderCreate, user_id: int):
         
         # Update stock
         product.stock_quantity -= item.quantity
+        if product not in touched_products:
+            touched_products.append(product)
     
     # Create order record
     new_order = Order(user_id=user_id, total_amount=total_amount)
@@ -47,6 +68,271 @@ def create_order(db: Session, order_data: OrderCreate, user_id: int):
     for item_data in order_items_data:
         db.add(OrderItem(order_id=new_order.id, **item_data))
     
+    # Written in the same transaction as the order; the outbox dispatcher
+    # delivers it to downstream systems after commit.
+    db.add(OutboxEvent(
+        event_type="order.created",
+        aggregate_id=new_order.id,
+        payload={
+            "order_id": new_order.id,
+            "user_id": user_id,
+            "total_amount": total_amount,
+            "items": order_items_data
+        }
+    ))
+    
+    # Snapshot before commit expires the products, saving a reload of each
+    snapshots = [product_snapshot(p) for p in touched_products]
+    categories = {snapshot["id"]: snapshot["category"] for snapshot in snapshots}
+    sales = [
+        (item["product_id"], categories[item["product_id"]], item["quantity"])
+        for item in order_items_data
+    ]
     db.commit()
     db.refresh(new_order)
+    
+    # Post-commit side effects run on the job runner, off the request path
+    forget_product_reads(*(snapshot["id"] for snapshot in snapshots))
+    enqueue(publish_product_changes, snapshots)
+    enqueue(record_sales, sales)
+    wake_dispatchers()
     return new_order
+
+
+# Status -> statuses an order may move to from it
+ORDER_TRANSITIONS: Dict[OrderStatus, Tuple[OrderStatus, ...]] = {
+    OrderStatus.PENDING: (OrderStatus.PROCESSING, OrderStatus.CANCELLED),
+    OrderStatus.PROCESSING: (OrderStatus.SHIPPED, OrderStatus.CANCELLED),
+    OrderStatus.SHIPPED: (OrderStatus.DELIVERED,),
+}
+
+
+def allowed_sources(target: OrderStatus) -> List[OrderStatus]:
+    """Statuses from which an order may move to ``target``."""
+    return [source for source, targets in ORDER_TRANSITIONS.items() if target in targets]
+
+
+def _restock_cancelled(db: Session, order_ids: List[int]) -> List[dict]:
+    """Return the items of cancelled orders to stock with one aggregated UPDATE."""
+    statement = text("""
+        UPDATE products SET
+            stock_quantity = products.stock_quantity + returned.quantity,
+            version = products.version + 1
+        FROM (
+            SELECT product_id, SUM(quantity) AS quantity
+            FROM order_items
+            WHERE order_id IN :order_ids
+            GROUP BY product_id
+        ) AS returned
+        WHERE products.id = returned.product_id
+        RETURNING products.id, products.name, products.price, products.stock_quantity,
+                  products.category, products.is_active, products.version
+    """).bindparams(bindparam("order_ids", expanding=True))
+    return [
+        {**row._asdict(), "is_active": bool(row.is_active), "deleted": False}
+        for row in db.execute(statement, {"order_ids": order_ids})
+    ]
+
+
+def transition_orders(
+    db: Session,
+    order_ids: List[int],
+    target: OrderStatus,
+    user_id: Optional[int] = None
+) -> Tuple[List[int], List[int]]:
+    """
+    Move orders to ``target`` with a single UPDATE whose WHERE clause only
+    matches orders in an allowed source status (and owned by ``user_id``,
+    if given). Cancelled orders are restocked in the same transaction, and
+    their units are taken off the best-seller leaderboards after commit.
+    Returns the updated ids and the ids that were missing or not allowed.
+    """
+    requested = list(dict.fromkeys(order_ids))
+    criteria = [Order.id.in_(requested), Order.status.in_(allowed_sources(target))]
+    if user_id is not None:
+        criteria.append(Order.user_id == user_id)
+    statement = (
+        update(Order)
+        .where(*criteria)
+        .values(status=target, updated_at=func.now())
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated_ids = sorted(db.execute(statement).scalars())
+    
+    snapshots = []
+    returns = []
+    if updated_ids:
+        if target == OrderStatus.CANCELLED:
+            snapshots = _restock_cancelled(db, updated_ids)
+            # The current category is only used when this worker does not hold the sale's bucket
+            returns = db.execute(
+                select(Order.created_at, OrderItem.product_id, Product.category, OrderItem.quantity)
+                .join(OrderItem, OrderItem.order_id == Order.id)
+                .join(Product, Product.id == OrderItem.product_id)
+                .where(Order.id.in_(updated_ids))
+            ).all()
+        db.add_all([
+            OutboxEvent(
+                event_type="order.status_changed",
+                aggregate_id=order_id,
+                payload={"order_id": order_id, "status": target.value}
+            )
+            for order_id in updated_ids
+        ])
+    db.commit()
+    
+    if snapshots:
+        forget_product_reads(*(snapshot["id"] for snapshot in snapshots))
+        enqueue(publish_product_changes, snapshots)
+    if returns:
+        enqueue(record_returns, [tuple(row) for row in returns])
+    if updated_ids:
+        wake_dispatchers()
+    updated = set(updated_ids)
+    return updated_ids, [order_id for order_id in requested if order_id not in updated]
+
+
+def order_filters(
+    user_id: Optional[int] = None,
+    status: Optional[OrderStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> list:
+    """Filter criteria shared by order listing, projection and counting."""
+    criteria = []
+    if user_id is not None:
+        criteria.append(Order.user_id == user_id)
+    if status is not None:
+        criteria.append(Order.status == status)
+    if created_from is not None:
+        criteria.append(Order.created_at >= created_from)
+    if created_to is not None:
+        criteria.append(Order.created_at < created_to)
+    return criteria
+
+
+def get_orders(
+    db: Session,
+    user_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    **filters
+) -> List[Order]:
+    """
+    List orders newest first, optionally restricted to a single user,
+    a status and a created_at range. Per-user listing is served by
+    ix_orders_user_id_created_at, admin filters by ix_orders_status_created_at
+    and ix_orders_created_at. Items are loaded for the whole page in one query.
+    """
+    query = db.query(Order).options(selectinload(Order.items)).filter(
+        *order_filters(user_id=user_id, **filters)
+    )
+    return query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+
+
+def _planner_estimate(db: Session, statement) -> Optional[int]:
+    """Row estimate from the Postgres planner, or None on other databases."""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    compiled = statement.compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_orders(
+    db: Session,
+    exact: bool = False,
+    exact_threshold: int = 1000,
+    **filters
+) -> Tuple[int, bool]:
+    """
+    Count the orders matching ``filters``. Returns ``(count, is_estimate)``.
+    Up to ``exact_threshold`` matches are counted exactly by a bounded scan;
+    beyond that, unless ``exact`` is set, the planner's estimate is used
+    so the count never costs more than a few index pages.
+    """
+    criteria = order_filters(**filters)
+    if exact:
+        return db.query(func.count(Order.id)).filter(*criteria).scalar(), False
+    
+    bounded = db.query(Order.id).filter(*criteria).limit(exact_threshold + 1).subquery()
+    counted = db.query(func.count()).select_from(bounded).scalar()
+    if counted <= exact_threshold:
+        return counted, False
+    
+    estimate = _planner_estimate(db, select(Order.id).where(*criteria))
+    return max(estimate or 0, counted), True
+
+
+def _project_orders(db: Session, query_fields: List[str], criteria, skip: int, limit: int) -> List[dict]:
+    """Select only the requested order columns and, if asked, their items."""
+    columns = [getattr(Order, name) for name in query_fields if name != "items"]
+    rows = (
+        db.query(*columns)
+        .filter(*criteria)
+        .order_by(Order.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    orders = [row._asdict() for row in rows]
+    
+    if "items" in query_fields and orders:
+        # One query for the items of every order on the page
+        item_columns = [getattr(OrderItem, name) for name in OrderItemResponse.model_fields]
+        items_by_order = {order["id"]: [] for order in orders}
+        for row in (
+            db.query(OrderItem.order_id, *item_columns)
+            .filter(OrderItem.order_id.in_(items_by_order))
+            .order_by(OrderItem.id)
+        ):
+            item = row._asdict()
+            items_by_order[item.pop("order_id")].append(item)
+        for order in orders:
+            order["items"] = items_by_order[order["id"]]
+    return orders
+
+
+def get_orders_projection(
+    db: Session,
+    fields: List[str],
+    user_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    **filters
+) -> List[dict]:
+    """Sparse-fieldset variant of get_orders."""
+    criteria = order_filters(user_id=user_id, **filters)
+    return _project_orders(db, fields, criteria, skip, limit)
+
+
+def get_order_projection(db: Session, order_id: int, fields: List[str]) -> Optional[dict]:
+    """
+    Sparse-fieldset lookup of one order. ``user_id`` is always loaded so
+    the caller can check ownership; strip it if it was not requested.
+    """
+    query_fields = list(dict.fromkeys([*fields, "user_id"]))
+    orders = _project_orders(db, query_fields, [Order.id == order_id], 0, 1)
+    return orders[0] if orders else None
+
+
+def expand_orders(orders: List[dict], expand: List[str], loaders: RequestLoaders) -> List[dict]:
+    """
+    Embed related resources into order dicts in place: ``product`` on each
+    item and/or ``user`` on each order. Each entity type costs at most one
+    query however many orders and items there are.
+    """
+    if "product" in expand:
+        items = [item for order in orders for item in order.get("items", [])]
+        products = loaders.products.load_many(item["product_id"] for item in items)
+        for item, product in zip(items, products):
+            item["product"] = OrderProductSummary.model_validate(product).model_dump() if product else None
+    if "user" in expand:
+        with_user = [order for order in orders if "user_id" in order]
+        users = loaders.users.load_many(order["user_id"] for order in with_user)
+        for order, user in zip(with_user, users):
+            order["user"] = OrderUserSummary.model_validate(user).model_dump() if user else None
+    return orders
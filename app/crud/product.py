@@ -1,19 +1,81 @@
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductUpdate
+from app.schemas.product import ProductBulkUpdateItem, ProductCreate, ProductResponse, ProductUpdate
+from app.core.jobs import enqueue
+from app.core.singleflight import get_single_flight
+from app.services.catalog_events import product_snapshot, publish_product_changes
 
 def get_product(db: Session, product_id: int) -> Optional[Product]:
     return db.query(Product).filter(Product.id == product_id).first()
 
 def get_products(db: Session, skip: int = 0, limit: int = 100) -> List[Product]:
-    return db.query(Product).filter(Product.is_active == True).offset(skip).limit(limit).all()
+    return (
+        db.query(Product)
+        .filter(Product.is_active == True)
+        .order_by(Product.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+def read_product(db: Session, product_id: int) -> Optional[dict]:
+    """
+    get_product for read-only endpoints: concurrent lookups of the same id
+    in this worker share one query and receive the same plain dict.
+    """
+    def load() -> Optional[dict]:
+        product = get_product(db, product_id)
+        return ProductResponse.model_validate(product).model_dump() if product else None
+
+    return get_single_flight().do("product", product_id, load)
+
+def read_products(db: Session, skip: int = 0, limit: int = 100) -> List[dict]:
+    """Coalesced get_products returning plain dicts."""
+    def load() -> List[dict]:
+        return [
+            ProductResponse.model_validate(product).model_dump()
+            for product in get_products(db, skip=skip, limit=limit)
+        ]
+
+    return get_single_flight().do("products", (skip, limit), load)
+
+def forget_product_reads(*product_ids: int) -> None:
+    """Make reads that start after a committed write run their own query."""
+    flights = get_single_flight()
+    for product_id in product_ids:
+        flights.forget("product", product_id)
+    flights.forget("products")
+
+def get_product_projection(db: Session, product_id: int, fields: List[str]) -> Optional[dict]:
+    """Load only the requested columns of one product."""
+    columns = [getattr(Product, name) for name in fields]
+    row = db.query(*columns).filter(Product.id == product_id).first()
+    return row._asdict() if row else None
+
+def get_products_projection(
+    db: Session, fields: List[str], skip: int = 0, limit: int = 100
+) -> List[dict]:
+    """Column-level variant of get_products for sparse fieldsets."""
+    columns = [getattr(Product, name) for name in fields]
+    rows = (
+        db.query(*columns)
+        .filter(Product.is_active == True)
+        .order_by(Product.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return [row._asdict() for row in rows]
 
 def create_product(db: Session, product_data: ProductCreate) -> Product:
     db_product = Product(**product_data.model_dump())
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    forget_product_reads(db_product.id)
+    enqueue(publish_product_changes, [product_snapshot(db_product)])
     return db_product
 
 def update_product(db: Session, db_product: Product, product_data: ProductUpdate) -> Product:
@@ -22,8 +84,78 @@ def update_product(db: Session, db_product: Product, product_data: ProductUpdate
         setattr(db_product, field, value)
     db.commit()
     db.refresh(db_product)
+    forget_product_reads(db_product.id)
+    enqueue(publish_product_changes, [product_snapshot(db_product)])
     return db_product
 
 def delete_product(db: Session, db_product: Product) -> None:
+    snapshot = product_snapshot(db_product, deleted=True)
     db.delete(db_product)
     db.commit()
+    forget_product_reads(snapshot["id"])
+    enqueue(publish_product_changes, [snapshot])
+
+
+BULK_UPDATE_CHUNK_SIZE = 1000
+
+def _bulk_update_chunk(db: Session, chunk: List[ProductBulkUpdateItem]) -> List[dict]:
+    """One set-based UPDATE for a chunk; returns snapshots of the updated rows."""
+    rows = []
+    params = {}
+    for i, item in enumerate(chunk):
+        rows.append(
+            f"(CAST(:id{i} AS INTEGER), CAST(:price{i} AS FLOAT), "
+            f"CAST(:stock{i} AS INTEGER), CAST(:active{i} AS BOOLEAN))"
+        )
+        params.update({
+            f"id{i}": item.id,
+            f"price{i}": item.price,
+            f"stock{i}": item.stock_quantity,
+            f"active{i}": item.is_active,
+        })
+    # NULL in the VALUES list means "leave unchanged"
+    statement = text(f"""
+        WITH v (id, price, stock_quantity, is_active) AS (VALUES {", ".join(rows)})
+        UPDATE products SET
+            price = COALESCE(v.price, products.price),
+            stock_quantity = COALESCE(v.stock_quantity, products.stock_quantity),
+            is_active = COALESCE(v.is_active, products.is_active),
+            updated_at = CURRENT_TIMESTAMP,
+            version = products.version + 1
+        FROM v
+        WHERE products.id = v.id
+        RETURNING products.id, products.name, products.price, products.stock_quantity,
+                  products.category, products.is_active, products.version
+    """)
+    return [
+        # SQLite hands booleans back as integers
+        {**row._asdict(), "is_active": bool(row.is_active), "deleted": False}
+        for row in db.execute(statement, params)
+    ]
+
+def bulk_update_products(
+    db: Session,
+    items: List[ProductBulkUpdateItem],
+    chunk_size: int = BULK_UPDATE_CHUNK_SIZE
+) -> Tuple[int, List[int]]:
+    """
+    Apply many price/stock/is_active changes with one UPDATE ... FROM
+    (VALUES ...) statement and commit per chunk, so row locks are held
+    briefly. Every updated row's version is bumped, so edits based on an
+    earlier read fail instead of overwriting it. Later entries win for
+    repeated ids. Returns the number of
+    updated products and the ids that do not exist.
+    """
+    by_id = {item.id: item for item in items}
+    changes = list(by_id.values())
+    snapshots = []
+    for start in range(0, len(changes), chunk_size):
+        snapshots.extend(_bulk_update_chunk(db, changes[start:start + chunk_size]))
+        db.commit()
+    
+    # Updated rows are published in one batch rather than one event each
+    updated_ids = {snapshot["id"] for snapshot in snapshots}
+    forget_product_reads(*updated_ids)
+    if snapshots:
+        enqueue(publish_product_changes, snapshots)
+    return len(updated_ids), sorted(set(by_id) - updated_ids)
@@ -1,23 +1,84 @@
+import os
+import threading
+from typing import Optional, Tuple
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy.orm import Session, sessionmaker
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
+# The engine is created lazily, once per process. With a pre-forking server
+# the master never opens connections, and a worker that inherits an engine
+# from its parent discards it instead of sharing the parent's sockets.
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+_engine_lock = threading.Lock()
+# SQLite only: the single connection that writes (see app/db/sqlite.py)
+_writer_engine: Optional[Engine] = None
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
 
 # Create Base class for declarative models
 Base = declarative_base()
 
 
+def _create_engines(settings) -> Tuple[Engine, Optional[Engine]]:
+    from app.db.sqlite import create_sqlite_engines, is_sqlite
+
+    if is_sqlite(settings.DATABASE_URL):
+        return create_sqlite_engines(
+            settings.DATABASE_URL,
+            pool_size=settings.DB_POOL_SIZE,
+            single_writer=settings.SQLITE_SINGLE_WRITER,
+            synchronous=settings.SQLITE_SYNCHRONOUS,
+            mmap_size=settings.SQLITE_MMAP_SIZE,
+            cache_size_kb=settings.SQLITE_CACHE_SIZE_KB,
+            busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+        )
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW
+    )
+    return engine, None
+
+
+def get_engine() -> Engine:
+    """Return this process's database engine, creating it on first use."""
+    global _engine, _engine_pid, _writer_engine
+    pid = os.getpid()
+    if _engine is None or _engine_pid != pid:
+        with _engine_lock:
+            if _engine is None or _engine_pid != pid:
+                # Inherited across fork: drop the pools without closing
+                # connections that still belong to the parent.
+                for inherited in (_engine, _writer_engine):
+                    if inherited is not None:
+                        inherited.dispose(close=False)
+                from app.core.config import get_settings
+
+                _engine, _writer_engine = _create_engines(get_settings())
+                _engine_pid = pid
+    return _engine
+
+
+def SessionLocal() -> Session:
+    """Create a session bound to this process's engine."""
+    engine = get_engine()
+    if _writer_engine is not None:
+        from app.db.sqlite import RoutingSession
+
+        return RoutingSession(engine, _writer_engine, autoflush=False)
+    return _session_factory(bind=engine)
+
+
+def __getattr__(name: str):
+    # Backwards compatible access to ``app.db.base.engine``
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_db():
     """Dependency for getting database session."""
     db = SessionLocal()
@@ -0,0 +1,181 @@
+"""
+N+1 query detection for development and tests.
+
+A ``QueryRecorder`` counts the SELECTs it sees by shape (the normalized
+SQL of the slow-query log). Writes only count towards the total: on some
+drivers the unit of work legitimately issues one INSERT per row. When one
+shape repeats more than a threshold, the usual cause is a lazy
+relationship (``Order.items``, ``OrderItem.product``, ``User.orders``)
+loaded once per row inside a loop. So the recorder also notes which relationship issued the statement (from
+the ORM's ``do_orm_execute`` event) and where in the code the shape first
+repeated.
+
+``NPlusOneMiddleware`` records every request when ``NPLUSONE_DETECTION``
+is ``warn`` (log a warning) or ``raise`` (fail the request, as the test
+suite does). ``capture_queries()`` records everything run inside a
+``with`` block, whatever the thread, which the ``query_budget`` test
+fixture builds on.
+"""
+import logging
+import os
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.db import query_stats
+from app.db.slow_queries import normalize_statement
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_HOOK_FILES = {os.path.abspath(__file__), os.path.abspath(query_stats.__file__)}
+
+
+class NPlusOneError(AssertionError):
+    """Raised in ``raise`` mode when a request repeats a statement shape too often."""
+
+
+@dataclass
+class RepeatedQuery:
+    statement: str
+    count: int
+    relationship: Optional[str]
+    call_site: Optional[str]
+
+    def describe(self) -> str:
+        source = f"lazy load of {self.relationship}" if self.relationship else "same statement"
+        where = f" at {self.call_site}" if self.call_site else ""
+        return f"{self.count} x {source}{where}: {self.statement}"
+
+
+def _call_site() -> Optional[str]:
+    """The innermost application frame, else the innermost frame outside SQLAlchemy."""
+    fallback = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename not in _HOOK_FILES and f"{os.sep}sqlalchemy{os.sep}" not in filename:
+            site = f"{os.path.relpath(filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+            if filename.startswith(_APP_DIR + os.sep):
+                return site
+            fallback = fallback or site
+        frame = frame.f_back
+    return fallback
+
+
+class QueryRecorder:
+    """SELECT shapes seen, with the relationship and call site behind each."""
+
+    def __init__(self):
+        self.total = 0
+        self.shapes: Counter = Counter()
+        self.relationships: Dict[str, str] = {}
+        self.call_sites: Dict[str, str] = {}
+        self._relationship: Optional[str] = None
+
+    def _observe(self, statement: str) -> None:
+        self.total += 1
+        relationship, self._relationship = self._relationship, None
+        if statement.lstrip()[:6].upper() != "SELECT":
+            return
+        shape = normalize_statement(statement)
+        self.shapes[shape] += 1
+        if relationship is not None:
+            self.relationships.setdefault(shape, relationship)
+        if self.shapes[shape] == 2:
+            self.call_sites[shape] = _call_site()
+
+    def repeated(self, threshold: int) -> List[RepeatedQuery]:
+        """Shapes run more than ``threshold`` times, most frequent first."""
+        return [
+            RepeatedQuery(shape, count, self.relationships.get(shape), self.call_sites.get(shape))
+            for shape, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+    def report(self) -> str:
+        lines = [f"{self.total} statements, of which SELECTs:"]
+        lines += [f"  {count} x {shape}" for shape, count in self.shapes.most_common()]
+        return "\n".join(lines)
+
+
+_current: ContextVar[Optional[QueryRecorder]] = ContextVar("nplusone_recorder", default=None)
+_captures: List[QueryRecorder] = []
+
+
+def _active() -> List[QueryRecorder]:
+    recorder = _current.get()
+    return _captures + [recorder] if recorder is not None else _captures
+
+
+def _observe(conn, cursor, statement, parameters, executemany, seconds) -> None:
+    for recorder in _active():
+        recorder._observe(statement)
+
+
+def _do_orm_execute(state) -> None:
+    if state.is_relationship_load and state.loader_strategy_path is not None:
+        relationship = str(state.loader_strategy_path.prop)
+        for recorder in _active():
+            recorder._relationship = relationship
+
+
+def install() -> None:
+    query_stats.add_observer(_observe)
+    if not event.contains(Session, "do_orm_execute", _do_orm_execute):
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryRecorder]:
+    """Record the statements of this context (one request)."""
+    install()
+    recorder = QueryRecorder()
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryRecorder]:
+    """Record every statement run inside the block, in any thread."""
+    install()
+    recorder = QueryRecorder()
+    _captures.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _captures.remove(recorder)
+
+
+class NPlusOneMiddleware:
+    """ASGI middleware reporting statement shapes a request repeats too often."""
+
+    def __init__(self, app, threshold: int = 5, raise_errors: bool = False):
+        self.app = app
+        self.threshold = threshold
+        self.raise_errors = raise_errors
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with record_queries() as recorder:
+            await self.app(scope, receive, send)
+        repeated = recorder.repeated(self.threshold)
+        if not repeated:
+            return
+        message = f"N+1 queries in {scope['method']} {scope['path']}:\n" + "\n".join(
+            "  " + query.describe() for query in repeated
+        )
+        if self.raise_errors:
+            raise NPlusOneError(message)
+        logger.warning(message)
@@ -0,0 +1,53 @@
+"""
+Optimistic concurrency for versioned rows.
+
+Models with a ``version_id_col`` (``Product.version``) add
+``WHERE version = <version loaded>`` to every UPDATE the ORM flushes and
+bump the version in the same statement. If another transaction changed
+the row since it was read, no row matches and the flush raises
+``StaleDataError``: nothing is overwritten and no lock was held while the
+caller worked.
+
+``retry_stale`` reruns an operation that lost such a race. The operation
+must load what it modifies itself, so a retry starts from the current
+rows rather than the stale copies the session rolled back.
+"""
+import logging
+import random
+import time
+from typing import Callable, Optional, TypeVar
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def retry_stale(
+    db: Session,
+    operation: Callable[[], T],
+    attempts: Optional[int] = None,
+    backoff: Optional[float] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> T:
+    """
+    Run ``operation``, rolling back and running it again (after an
+    exponential, jittered backoff) whenever a concurrent update makes it
+    fail with ``StaleDataError``. The error is re-raised after ``attempts``
+    tries.
+    """
+    settings = get_settings()
+    attempts = attempts or settings.OPTIMISTIC_RETRY_ATTEMPTS
+    backoff = settings.OPTIMISTIC_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except StaleDataError:
+            db.rollback()
+            if attempt == attempts:
+                raise
+            logger.debug("Concurrent update, retrying (attempt %d of %d)", attempt, attempts)
+            # Full jitter keeps racing writers from retrying in lockstep
+            sleep(random.uniform(0, backoff * 2 ** (attempt - 1)))
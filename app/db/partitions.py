@@ -0,0 +1,153 @@
+"""
+Monthly range partitions for ``orders`` and ``order_items`` (Postgres).
+
+Both tables are partitioned on ``created_at``. Order items get the created_at
+of their transaction, which equals the order's, so an order and its items
+always land in the same month. Partitions are named ``<table>_yYYYYmMM``;
+a ``<table>_default`` partition catches anything outside the created range.
+"""
+import re
+from datetime import date, datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PARTITIONED_TABLES = ("orders", "order_items")
+
+PARTITION_NAME = re.compile(r"^(orders|order_items)_(y(\d{4})m(\d{2})|default)$")
+
+# Arbitrary constant shared by every process creating partitions
+_PARTITION_LOCK_ID = 804_215_001
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(first: date, last: date) -> Iterator[date]:
+    """Month starts from ``first`` through ``last`` inclusive."""
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def parse_partition_month(name: str) -> Optional[date]:
+    """Month covered by a partition name, or None for the default partition."""
+    match = PARTITION_NAME.match(name)
+    if not match or match.group(3) is None:
+        return None
+    return date(int(match.group(3)), int(match.group(4)), 1)
+
+
+def is_partition_name(name: str) -> bool:
+    return PARTITION_NAME.match(name) is not None
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+        f"PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def create_default_partition_sql(table: str) -> str:
+    return f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+             "WHERE c.relname = :table"),
+        {"table": table},
+    ).scalar())
+
+
+def list_partitions(conn: Connection, table: str) -> List[str]:
+    """Names of the partitions currently attached to ``table``."""
+    rows = conn.execute(
+        text("SELECT child.relname FROM pg_inherits i "
+             "JOIN pg_class parent ON parent.oid = i.inhparent "
+             "JOIN pg_class child ON child.oid = i.inhrelid "
+             "WHERE parent.relname = :table ORDER BY child.relname"),
+        {"table": table},
+    )
+    return [row[0] for row in rows]
+
+
+def ensure_partitions(
+    conn: Connection,
+    months_ahead: int = 3,
+    first_month: Optional[date] = None,
+    today: Optional[date] = None,
+) -> List[str]:
+    """
+    Create any missing monthly partitions from ``first_month`` (default:
+    this month) through ``months_ahead`` months from now. Safe to run from
+    several workers at once. Returns the partitions it checked.
+    """
+    if not all(is_partitioned(conn, table) for table in PARTITIONED_TABLES):
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    last = add_months(month_start(today), months_ahead)
+    conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _PARTITION_LOCK_ID})
+    names = []
+    for table in PARTITIONED_TABLES:
+        for month in iter_months(first_month or today, last):
+            conn.execute(text(create_partition_sql(table, month)))
+            names.append(partition_name(table, month))
+    return names
+
+
+def partitions_before(conn: Connection, table: str, cutoff: date) -> List[Tuple[str, date]]:
+    """Attached monthly partitions of ``table`` that end on or before ``cutoff``."""
+    result = []
+    for name in list_partitions(conn, table):
+        month = parse_partition_month(name)
+        if month is not None and add_months(month, 1) <= cutoff:
+            result.append((name, month))
+    return result
+
+
+def detached_partitions_before(conn: Connection, table: str, cutoff: date) -> List[Tuple[str, date]]:
+    """
+    Standalone tables named like monthly partitions of ``table`` that end
+    on or before ``cutoff``: months an interrupted archive run detached
+    but did not finish.
+    """
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_class c "
+        "WHERE c.relkind = 'r' AND pg_table_is_visible(c.oid) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid) "
+        "ORDER BY c.relname"
+    ))
+    result = []
+    for (name,) in rows:
+        match = PARTITION_NAME.match(name)
+        month = parse_partition_month(name)
+        if match and match.group(1) == table and month is not None and add_months(month, 1) <= cutoff:
+            result.append((name, month))
+    return result
+
+
+def maintain_partitions(months_ahead: int = 3) -> List[str]:
+    """Job entry point: create upcoming partitions using the app engine."""
+    from app.db.base import get_engine
+
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        return []
+    with engine.begin() as conn:
+        return ensure_partitions(conn, months_ahead=months_ahead)
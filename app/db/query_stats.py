@@ -0,0 +1,92 @@
+"""
+Per-request database time and statement counts.
+
+``install()`` adds cursor-execute hooks to every engine. While a request is
+tracked (``track()`` stores a ``QueryStats`` in a context variable), each
+statement adds its count and duration to it. Sync endpoints run in a copy
+of the request's context, so their queries land on the same object.
+Observers (such as the slow-query log) see every timed statement.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """Statements executed and seconds spent in them, for one ASGI request."""
+
+    __slots__ = ("count", "seconds", "scope")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.scope = scope
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+# Called as observer(conn, cursor, statement, parameters, executemany, seconds)
+Observer = Callable[[Any, Any, str, Any, bool, float], None]
+_observers: List[Observer] = []
+
+
+@contextmanager
+def track(scope: Optional[dict] = None) -> Iterator[QueryStats]:
+    """Count the statements executed inside the block."""
+    stats = QueryStats(scope)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    for observer in _observers:
+        observer(conn, cursor, statement, parameters, executemany, elapsed)
+
+
+def _handle_error(context):
+    # The failed statement never reaches after_cursor_execute. Only read
+    # attributes that are always set: this hook must not mask the error.
+    connection = getattr(context, "connection", None)
+    if connection is not None and getattr(context, "execution_context", None) is not None:
+        started = connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def install() -> None:
+    """Time statements on every engine; safe to call more than once."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+def add_observer(observer: Observer) -> None:
+    install()
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    if observer in _observers:
+        _observers.remove(observer)
@@ -0,0 +1,196 @@
+"""
+Slow-query log.
+
+Every statement is timed by the hooks in ``app.db.query_stats``. Statements
+over the threshold are normalized (literals, placeholders and IN lists
+collapsed), fingerprinted and kept, with the shape of their bind parameters
+and the route of the request that ran them, in a bounded ring buffer that
+admins read through ``GET /api/v1/admin/slow-queries``.
+
+For a sampled subset of slow SELECTs, and at most once per statement per
+``explain_interval``, the plan is captured right away on the same
+connection: ``EXPLAIN (ANALYZE, BUFFERS)`` on PostgreSQL (inside a
+savepoint, so a failed EXPLAIN cannot abort the request's transaction) and
+``EXPLAIN QUERY PLAN`` on SQLite. ANALYZE runs the query a second time, so
+keep the sample rate low.
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from app.core.config import get_settings
+from app.db import query_stats
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def normalize_statement(statement: str) -> str:
+    """One line, with literals and placeholders as ``?`` and lists as ``(?, ...)``."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _STRING.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    return _LIST.sub("(?, ...)", statement)
+
+
+def _types(parameters) -> str:
+    values = parameters.values() if isinstance(parameters, Mapping) else (parameters or ())
+    runs: List[list] = []
+    for value in values:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return ", ".join(name if count == 1 else f"{name}*{count}" for name, count in runs)
+
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    """Bind-parameter types without their values, e.g. ``(int*3, str)``."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x ({_types(rows[0])})" if rows else "0 rows"
+    return f"({_types(parameters)})"
+
+
+def explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    """The plan of ``statement`` as text lines, using a raw cursor on ``conn``."""
+    dialect = conn.dialect.name
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if dialect == "postgresql":
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+                rows = cursor.fetchall()
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return [row[0] for row in rows]
+        if dialect == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        return None
+    finally:
+        cursor.close()
+
+
+def _origin() -> Optional[str]:
+    stats = query_stats.current()
+    if stats is None or stats.scope is None:
+        return None
+    from app.core.access_log import route_template
+
+    scope = stats.scope
+    return f"{scope['method']} {route_template(scope) or scope['path']}"
+
+
+class SlowQueryLog:
+    """Ring buffer of statements slower than ``threshold_ms``."""
+
+    def __init__(
+        self,
+        threshold_ms: float = 200.0,
+        size: int = 500,
+        explain_sample_rate: float = 0.05,
+        explain_interval: float = 300.0,
+        random_source=random.random,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_interval = explain_interval
+        self._random = random_source
+        self._entries: deque = deque(maxlen=size)
+        self._explained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._counters = {"recorded": 0, "explained": 0, "explain_errors": 0}
+
+    def _should_explain(self, fingerprint: str, statement: str, executemany: bool) -> bool:
+        if executemany or not statement.lstrip()[:6].upper() == "SELECT":
+            return False
+        if self.explain_sample_rate <= 0 or self._random() >= self.explain_sample_rate:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(fingerprint, float("-inf")) < self.explain_interval:
+                return False
+            if len(self._explained) >= 1000:
+                self._explained.clear()
+            self._explained[fingerprint] = now
+        return True
+
+    def observe(self, conn, cursor, statement: str, parameters, executemany: bool, seconds: float) -> None:
+        """``query_stats`` observer; never raises into the statement that was timed."""
+        duration_ms = seconds * 1000
+        if duration_ms < self.threshold_ms:
+            return
+        try:
+            normalized = normalize_statement(statement)
+            fingerprint = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+            plan = None
+            if self._should_explain(fingerprint, statement, executemany):
+                try:
+                    plan = explain(conn, statement, parameters)
+                    self._counters["explained"] += 1
+                except Exception:
+                    self._counters["explain_errors"] += 1
+                    logger.warning("Could not explain slow query %s", fingerprint, exc_info=True)
+            entry = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "duration_ms": round(duration_ms, 2),
+                "fingerprint": fingerprint,
+                "statement": normalized,
+                "parameters": parameter_shape(parameters, executemany),
+                "route": _origin(),
+                "plan": plan,
+            }
+            with self._lock:
+                self._entries.append(entry)
+                self._counters["recorded"] += 1
+        except Exception:
+            logger.exception("Could not record slow query")
+
+    def entries(self, limit: Optional[int] = None) -> List[dict]:
+        """Recorded statements, newest first."""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._explained.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "size": self._entries.maxlen,
+            "buffered": len(self._entries),
+            **self._counters,
+        }
+
+
+@lru_cache
+def get_slow_query_log() -> SlowQueryLog:
+    """This worker's slow-query log, configured from settings on first use."""
+    settings = get_settings()
+    return SlowQueryLog(
+        threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+        size=settings.SLOW_QUERY_LOG_SIZE,
+        explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        explain_interval=settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS,
+    )
@@ -0,0 +1,130 @@
+"""
+Tuned SQLite for single-node installs.
+
+With ``DATABASE_URL=sqlite:////var/lib/shop/shop.db`` every connection is
+set up for a server workload rather than SQLite's conservative defaults:
+
+* ``journal_mode=WAL``: readers no longer block the writer or each other.
+* ``synchronous=NORMAL``: a commit no longer waits for an fsync. A power
+  loss can lose the last transactions but never corrupts the database.
+* ``mmap_size`` and ``cache_size``: pages are read through memory maps and
+  cached in memory.
+* ``busy_timeout``: a connection waits for a lock instead of failing with
+  "database is locked".
+
+SQLite allows a single writer at a time. Sessions route their writes
+through one writer connection per process, and everything after a write
+until the transaction ends. Writers in the process then queue on the pool
+rather than on SQLite's lock (which backs off by sleeping). Reads go to a
+pool of reader connections that run concurrently.
+"""
+from typing import Optional, Tuple
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+_READ_PREFIXES = ("SELECT", "EXPLAIN", "PRAGMA")
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def is_in_memory(url: str) -> bool:
+    return ":memory:" in url or url.rstrip("/") == "sqlite:"
+
+
+def pragmas(
+    synchronous: str = "NORMAL",
+    mmap_size: int = 268435456,
+    cache_size_kb: int = 65536,
+    busy_timeout_ms: int = 5000,
+) -> Tuple[str, ...]:
+    return (
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA mmap_size={int(mmap_size)}",
+        # Negative sizes are in KiB rather than pages
+        f"PRAGMA cache_size=-{int(cache_size_kb)}",
+        f"PRAGMA busy_timeout={int(busy_timeout_ms)}",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    )
+
+
+def _apply_pragmas(engine: Engine, statements: Tuple[str, ...]) -> None:
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def create_sqlite_engines(
+    url: str,
+    pool_size: int = 10,
+    single_writer: bool = True,
+    writer_timeout: float = 30.0,
+    **pragma_settings,
+) -> Tuple[Engine, Optional[Engine]]:
+    """
+    The reader engine and, for file databases with ``single_writer``, an
+    engine holding the one writer connection (None otherwise).
+    """
+    statements = pragmas(**pragma_settings)
+    connect_args = {"check_same_thread": False}
+    if is_in_memory(url):
+        # Every connection to an in-memory database is a separate database
+        engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+        _apply_pragmas(engine, statements)
+        return engine, None
+    reader = create_engine(url, connect_args=connect_args, pool_size=pool_size, max_overflow=0)
+    _apply_pragmas(reader, statements)
+    if not single_writer:
+        return reader, None
+    writer = create_engine(
+        url, connect_args=connect_args, pool_size=1, max_overflow=0, pool_timeout=writer_timeout
+    )
+    _apply_pragmas(writer, statements)
+    return reader, writer
+
+
+def is_write(clause) -> bool:
+    """Whether ``clause`` may modify the database; raw SQL counts unless it only reads."""
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(_READ_PREFIXES)
+    return False
+
+
+class RoutingSession(Session):
+    """
+    A session over a reader and a writer engine. Flushes and writing
+    statements use the writer, and so does every statement after them
+    until the transaction ends, so a transaction reads its own writes.
+    """
+
+    def __init__(self, reader: Engine, writer: Engine, **kwargs):
+        super().__init__(bind=reader, **kwargs)
+        self.reader = reader
+        self.writer = writer
+        self.writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.writing or self._flushing or is_write(clause):
+            self.writing = True
+            return self.writer
+        return self.reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _release_writer(session: RoutingSession, transaction) -> None:
+    if transaction.parent is None:
+        session.writing = False
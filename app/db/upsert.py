@@ -0,0 +1,11 @@
+"""Dialect-aware ``INSERT ... ON CONFLICT`` for the databases we run on."""
+from sqlalchemy.orm import Session
+
+
+def insert_for(db: Session):
+    """The ``insert()`` construct with ``on_conflict_do_update`` support for this session's database."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
@@ -1,45 +1,240 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.core.config import settings
-from app.api.v1.router import api_router
-
-# Create FastAPI application
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.VERSION,
-    description="Production-ready E-Commerce API with FastAPI and PostgreSQL",
-    docs_url="/docs",
-    redoc_url="/redoc"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include API router
-app.include_router(api_router, prefix=settings.API_V1_STR)
-
-
-@app.get("/", tags=["Root"])
-def root():
-    """Root endpoint."""
-    return {
-        "message": "Welcome to E-Commerce API",
-        "version": settings.VERSION,
-        "docs": "/docs"
-    }
-
-
-@app.get("/health", tags=["Health"])
-def health_check():
-    """Health check endpoint."""
-    return {
-        "status": "healthy",
-        "service": settings.PROJECT_NAME,
-        "version": settings.VERSION
-    }
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background services with the application."""
+    import asyncio
+    from app.core.jobs import get_job_runner
+    from app.db.base import SessionLocal, get_engine
+    from app.db.partitions import maintain_partitions
+    from app.services import catalog_events
+    from app.services.broadcast import get_broadcast_hub
+    from app.services.catalog_snapshot import get_catalog_snapshot, rebuild_catalog_snapshot
+    from app.services.facets import get_facet_index, rebuild_facets
+    from app.services.leaderboard import get_leaderboard, sync_leaderboard
+    from app.services.recommendations import reload_related_index
+    from app.services.write_behind import flush_write_behind, get_last_seen, get_view_counts
+    from app.services.outbox import OutboxDispatcher, build_sinks
+
+    settings = get_settings()
+    access_log = app.state.access_log
+    if access_log is not None:
+        access_log.start()
+    job_runner = get_job_runner()
+    await job_runner.start()
+    rate_limit_store = app.state.rate_limit_store
+    if rate_limit_store is not None:
+        # Buckets idle this long are full again; forget them
+        job_runner.every(settings.RATE_LIMIT_IDLE_SECONDS, rate_limit_store.evict_idle, run_now=False)
+    if get_engine().dialect.name == "postgresql":
+        job_runner.every(
+            settings.ORDER_PARTITION_CHECK_INTERVAL_SECONDS,
+            maintain_partitions,
+            settings.ORDER_PARTITION_MONTHS_AHEAD,
+            run_now=False,  # The migration already created the coming months
+        )
+    hub = get_broadcast_hub()
+    hub.attach(asyncio.get_running_loop())
+    catalog_events.subscribe(hub.publish)
+    facet_index = get_facet_index()
+    catalog_events.subscribe(facet_index.apply)
+    # The first facets request builds the index; this keeps it from drifting
+    job_runner.every(settings.FACET_REBUILD_INTERVAL_SECONDS, rebuild_facets, run_now=False)
+    # Product writes mark the snapshot stale; rebuilds are debounced
+    snapshot = get_catalog_snapshot()
+    catalog_events.subscribe(snapshot.mark_dirty)
+    job_runner.every(settings.CATALOG_SNAPSHOT_DEBOUNCE_SECONDS, rebuild_catalog_snapshot, run_now=False)
+    # Pick up indexes written by the offline recommendations job
+    job_runner.every(
+        settings.RECOMMENDATIONS_RELOAD_INTERVAL_SECONDS,
+        reload_related_index,
+        settings.RECOMMENDATIONS_DIR,
+        run_now=False,
+    )
+    # Share this worker's sales and merge in every other worker's
+    job_runner.every(settings.LEADERBOARD_SYNC_INTERVAL_SECONDS, sync_leaderboard, run_now=False)
+    # Batched upserts of view counts and last-seen times
+    job_runner.every(settings.WRITE_BEHIND_FLUSH_INTERVAL_SECONDS, flush_write_behind, run_now=False)
+    dispatcher = None
+    sinks = build_sinks(settings.OUTBOX_FILE_SINK_PATH, settings.OUTBOX_HTTP_SINK_URL)
+    if settings.OUTBOX_DISPATCHER_ENABLED and sinks:
+        dispatcher = OutboxDispatcher(
+            SessionLocal,
+            sinks,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            poll_interval=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            retry_backoff=settings.OUTBOX_RETRY_BACKOFF_SECONDS,
+            lease=settings.OUTBOX_LEASE_SECONDS,
+        )
+        dispatcher.start()
+    app.state.outbox_dispatcher = dispatcher
+    yield
+    if dispatcher is not None:
+        dispatcher.stop()
+    catalog_events.unsubscribe(snapshot.mark_dirty)
+    catalog_events.unsubscribe(facet_index.apply)
+    catalog_events.unsubscribe(hub.publish)
+    hub.close()
+    await job_runner.stop(timeout=settings.JOB_DRAIN_TIMEOUT_SECONDS)
+    if get_leaderboard().pending:
+        try:
+            await asyncio.to_thread(sync_leaderboard, False)
+        except Exception:
+            logger.warning("Could not persist best-seller sales on shutdown", exc_info=True)
+    if get_view_counts().pending or get_last_seen().pending:
+        await asyncio.to_thread(flush_write_behind)
+    if access_log is not None:
+        access_log.stop()
+
+
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI application.
+    Routers and their dependencies are imported here rather than at module
+    import, and the database engine is only created on the first request.
+    """
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse
+    from sqlalchemy.orm.exc import StaleDataError
+    from app.api.v1.router import api_router
+    from app.core.admission import DEFAULT_CLASSES, AdmissionController, AdmissionMiddleware, parse_routes
+    from app.core.access_log import AccessLogMiddleware, AccessLogWriter, Sampler, parse_sample_rules
+    from app.core.rate_limit import RateLimitMiddleware, build_store, parse_rules
+    from app.core.singleflight import SingleFlightTimeout
+    from app.db import query_stats
+    from app.db.slow_queries import get_slow_query_log
+
+    settings = get_settings()
+
+    # Create FastAPI application
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.VERSION,
+        description="Production-ready E-Commerce API with FastAPI and PostgreSQL",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan
+    )
+
+    # Innermost: only requests that passed rate limiting compete for capacity
+    app.state.admission = None
+    if settings.ADMISSION_CONTROL_ENABLED:
+        app.state.admission = AdmissionController(
+            DEFAULT_CLASSES,
+            parse_routes(settings.ADMISSION_ROUTES),
+            cooldown=settings.ADMISSION_DECREASE_COOLDOWN_SECONDS,
+        )
+        app.add_middleware(AdmissionMiddleware, controller=app.state.admission)
+
+    # Rate limiting runs inside CORS so rejections still carry CORS headers
+    app.state.rate_limit_store = None
+    if settings.RATE_LIMIT_ENABLED:
+        store = build_store(
+            settings.RATE_LIMIT_BACKEND,
+            settings.RATE_LIMIT_SQLITE_PATH,
+            settings.RATE_LIMIT_IDLE_SECONDS,
+        )
+        app.state.rate_limit_store = store
+        app.add_middleware(
+            RateLimitMiddleware,
+            store=store,
+            rules=parse_rules(settings.RATE_LIMITS),
+            trust_forwarded_for=settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+        )
+    
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Configure appropriately for production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        query_stats.add_observer(get_slow_query_log().observe)
+
+    if settings.NPLUSONE_DETECTION != "off":
+        from app.db.nplusone import NPlusOneMiddleware
+
+        app.add_middleware(
+            NPlusOneMiddleware,
+            threshold=settings.NPLUSONE_THRESHOLD,
+            raise_errors=settings.NPLUSONE_DETECTION == "raise",
+        )
+
+    # Outermost, so rate-limited and CORS-rejected requests are logged too
+    app.state.access_log = None
+    if settings.ACCESS_LOG_ENABLED:
+        app.state.access_log = AccessLogWriter.open(
+            settings.ACCESS_LOG_PATH,
+            queue_size=settings.ACCESS_LOG_QUEUE_SIZE,
+            batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+        )
+        app.add_middleware(
+            AccessLogMiddleware,
+            writer=app.state.access_log,
+            sampler=Sampler(
+                rate=settings.ACCESS_LOG_SAMPLE_RATE,
+                rules=parse_sample_rules(settings.ACCESS_LOG_SAMPLE_RATES),
+                slow_ms=settings.ACCESS_LOG_SLOW_MS,
+                keep_status=settings.ACCESS_LOG_KEEP_STATUS,
+            ),
+        )
+
+    @app.exception_handler(SingleFlightTimeout)
+    def single_flight_timeout(request, exc):
+        # The shared query is stuck; shed the waiters instead of piling on
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Service temporarily unavailable"},
+            headers={"Retry-After": "1"},
+        )
+
+    @app.exception_handler(StaleDataError)
+    def stale_data(request, exc):
+        # Still losing to concurrent writers after every retry
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "Conflicting concurrent update, please retry"},
+            headers={"Retry-After": "1"},
+        )
+
+    # Include API router
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+
+    @app.get("/", tags=["Root"])
+    def root():
+        """Root endpoint."""
+        return {
+            "message": "Welcome to E-Commerce API",
+            "version": settings.VERSION,
+            "docs": "/docs"
+        }
+
+    @app.get("/health", tags=["Health"])
+    def health_check():
+        """Health check endpoint."""
+        return {
+            "status": "healthy",
+            "service": settings.PROJECT_NAME,
+            "version": settings.VERSION
+        }
+
+    return app
+
+
+def __getattr__(name: str):
+    # ``app.main:app`` (uvicorn, gunicorn, tests) builds the app on first access
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
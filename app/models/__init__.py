@@ -1,5 +1,9 @@
 from app.models.user import User
 from app.models.product import Product
 from app.models.order import Order, OrderItem
+from app.models.outbox import OutboxEvent
+from app.models.sales import ProductSalesHourly
+from app.models.activity import ProductViewCount, UserLastSeen
 
-__all__ = ["User", "Product", "Order", "OrderItem"]
+__all__ = ["User", "Product", "Order", "OrderItem", "OutboxEvent", "ProductSalesHourly",
+           "ProductViewCount", "UserLastSeen"]
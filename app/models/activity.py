@@ -0,0 +1,20 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer
+from app.db.base import Base
+
+
+class ProductViewCount(Base):
+    """Lifetime views per product, written in batches by the write-behind buffer."""
+    
+    __tablename__ = "product_view_counts"
+    
+    product_id = Column(Integer, primary_key=True)
+    views = Column(BigInteger, nullable=False, default=0)
+
+
+class UserLastSeen(Base):
+    """When each user last made an authenticated request, written in batches."""
+    
+    __tablename__ = "user_last_seen"
+    
+    user_id = Column(Integer, primary_key=True)
+    last_seen_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index, and_
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class OutboxEvent(Base):
+    """Domain event written in the same transaction as the change it describes."""
+    
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+    # Set when delivery gave up after the dispatcher's max_attempts
+    failed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Only undelivered events are ever claimed by the dispatcher
+        Index(
+            "ix_outbox_events_pending",
+            available_at,
+            id,
+            postgresql_where=and_(dispatched_at.is_(None), failed_at.is_(None)),
+            sqlite_where=and_(dispatched_at.is_(None), failed_at.is_(None)),
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -18,6 +18,20 @@ class Product(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped by every UPDATE; ORM flushes fail with StaleDataError if another writer got there first
+    version = Column(Integer, nullable=False, server_default="1")
+    
+    __table_args__ = (
+        # Partial index for the active catalog listing, paginated by id
+        Index(
+            "ix_products_active_id",
+            id,
+            postgresql_where=is_active == True,
+            sqlite_where=is_active == True,
+        ),
+    )
+    
+    __mapper_args__ = {"version_id_col": version}
     
     # Relationships
     order_items = relationship("OrderItem", back_populates="product")
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String
+from app.db.base import Base
+
+
+class ProductSalesHourly(Base):
+    """Units sold per product per hour; the durable side of the best-seller leaderboards."""
+    
+    __tablename__ = "product_sales_hourly"
+    
+    bucket_hour = Column(Integer, primary_key=True)  # Hours since the Unix epoch (UTC)
+    product_id = Column(Integer, primary_key=True)
+    category = Column(String, nullable=True)
+    units = Column(Integer, nullable=False, default=0)
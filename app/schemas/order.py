@@ -38,6 +38,43 @@ class OrderResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class OrderStatusUpdate(BaseModel):
+    """Schema for moving one order to a new status."""
+    status: OrderStatus
+
+
+class OrderBatchStatusUpdate(BaseModel):
+    """Schema for moving many orders to the same status."""
+    order_ids: List[int] = Field(..., min_length=1, max_length=10000)
+    status: OrderStatus
+
+
+class OrderStatusTransitionResult(BaseModel):
+    """Orders that moved to the new status and those that could not."""
+    status: OrderStatus
+    updated_ids: List[int]
+    failed_ids: List[int]
+
+
+class OrderProductSummary(BaseModel):
+    """Product details embedded in order items with ``expand=product``."""
+    id: int
+    name: str
+    category: Optional[str] = None
+    price: float
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OrderUserSummary(BaseModel):
+    """Customer details embedded in orders with ``expand=user``."""
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
 class OrderSummary(BaseModel):
     """Schema for order summary (from raw SQL queries)."""
     order_id: int
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -33,5 +33,25 @@ class ProductResponse(ProductBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = Field(..., description="Incremented by every change; the ETag of the product")
     
     model_config = ConfigDict(from_attributes=True)
+
+
+class ProductBulkUpdateItem(BaseModel):
+    """One product change in a bulk update; omitted fields are left alone."""
+    id: int = Field(..., gt=0)
+    price: Optional[float] = Field(None, gt=0)
+    stock_quantity: Optional[int] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+
+class ProductBulkUpdate(BaseModel):
+    """Schema for bulk product updates."""
+    items: List[ProductBulkUpdateItem] = Field(..., min_length=1, max_length=50000)
+
+
+class ProductBulkUpdateResult(BaseModel):
+    """Outcome of a bulk product update."""
+    updated: int
+    missing_ids: List[int] = []
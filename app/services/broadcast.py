@@ -0,0 +1,145 @@
+"""
+Per-worker broadcast hub for live product updates.
+
+Product changes published through ``app.services.catalog_events`` are fanned
+out to server-sent event subscribers on this worker's event loop. Each
+subscription keeps at most one pending update per product, so bursts of
+changes to the same product collapse into the latest state, and a slow
+client can never hold more than ``max_pending`` updates in memory. When
+that cap is exceeded the oldest updates are dropped and the client is told
+to resync instead.
+"""
+import asyncio
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, List, Optional, Set
+from app.core.config import get_settings
+
+
+class TooManySubscribers(Exception):
+    """Raised when the worker already serves its maximum number of streams."""
+
+
+class Subscription:
+    """One client's interest in a set of products and/or categories."""
+
+    def __init__(self, product_ids: Iterable[int], categories: Iterable[str], max_pending: int):
+        self.product_ids: Set[int] = set(product_ids)
+        self.categories: Set[str] = set(categories)
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[int, dict]" = OrderedDict()
+        self.overflowed = False
+        self.closed = False
+        self.ready = asyncio.Event()
+
+    def wants(self, change: dict) -> bool:
+        return change["id"] in self.product_ids or change.get("category") in self.categories
+
+    def offer(self, change: dict) -> None:
+        """Queue a change, replacing any undelivered update for the same product."""
+        self.pending[change["id"]] = change
+        self.pending.move_to_end(change["id"])
+        if len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.overflowed = True
+        self.ready.set()
+
+    def drain(self) -> List[dict]:
+        changes = list(self.pending.values())
+        self.pending.clear()
+        self.ready.clear()
+        return changes
+
+    def close(self) -> None:
+        self.closed = True
+        self.ready.set()
+
+
+class BroadcastHub:
+    """Fans product changes out to the subscriptions on one event loop."""
+
+    def __init__(
+        self,
+        max_subscribers: int = 1000,
+        max_pending: int = 500,
+        coalesce_seconds: float = 0.25,
+        heartbeat_seconds: float = 15.0,
+    ):
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.coalesce_seconds = coalesce_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscriptions: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def close(self) -> None:
+        """End every open stream (used on shutdown)."""
+        for subscription in list(self._subscriptions):
+            subscription.close()
+        self._subscriptions.clear()
+        self._loop = None
+
+    def subscribe(self, product_ids: Iterable[int], categories: Iterable[str]) -> Subscription:
+        if len(self._subscriptions) >= self.max_subscribers:
+            raise TooManySubscribers(f"{self.max_subscribers} streams already open")
+        subscription = Subscription(product_ids, categories, self.max_pending)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, changes: List[dict]) -> None:
+        """Catalog listener; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._fan_out, changes)
+
+    def _fan_out(self, changes: List[dict]) -> None:
+        for subscription in self._subscriptions:
+            for change in changes:
+                if subscription.wants(change):
+                    subscription.offer(change)
+
+    async def stream(self, subscription: Subscription) -> AsyncIterator[str]:
+        """Yield server-sent event frames until the client goes away."""
+        try:
+            yield "retry: 3000\n: subscribed\n\n"
+            while not subscription.closed:
+                try:
+                    await asyncio.wait_for(subscription.ready.wait(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.closed:
+                    break
+                # Let rapid successive updates to the same product coalesce
+                await asyncio.sleep(self.coalesce_seconds)
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                for change in subscription.drain():
+                    yield f"event: product\ndata: {json.dumps(change)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+
+@lru_cache
+def get_broadcast_hub() -> BroadcastHub:
+    """This worker's hub, configured from settings on first use."""
+    settings = get_settings()
+    return BroadcastHub(
+        max_subscribers=settings.SSE_MAX_SUBSCRIBERS,
+        max_pending=settings.SSE_MAX_PENDING_UPDATES,
+        coalesce_seconds=settings.SSE_COALESCE_MS / 1000,
+        heartbeat_seconds=settings.SSE_HEARTBEAT_SECONDS,
+    )
@@ -0,0 +1,78 @@
+"""
+Product change notifications.
+
+Writers publish lightweight product snapshots after commit; in-process
+consumers (caches, live update streams, precomputed views) subscribe with
+``subscribe()``. Publishing is normally scheduled on the job runner so the
+fan-out never runs on the request path.
+
+Batches can reach ``publish_product_changes`` out of commit order: they
+are enqueued from concurrent request threads and run on several job
+workers, and a failed job is retried later. Every snapshot carries the
+product's ``version``, so a snapshot older than the last one delivered for
+its product is dropped, and batches are delivered one at a time, so every
+listener sees the same sequence.
+"""
+import logging
+import threading
+from typing import Callable, Dict, List, Tuple
+from app.models.product import Product
+
+logger = logging.getLogger(__name__)
+
+ProductListener = Callable[[List[dict]], None]
+
+_listeners: List[ProductListener] = []
+
+# product id -> (version, deleted) of the last snapshot delivered
+_delivered: Dict[int, Tuple[int, bool]] = {}
+_publish_lock = threading.Lock()
+
+
+def subscribe(listener: ProductListener) -> None:
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def unsubscribe(listener: ProductListener) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def reset() -> None:
+    """Forget the delivered versions (tests, or a database restored from backup)."""
+    with _publish_lock:
+        _delivered.clear()
+
+
+def product_snapshot(product: Product, deleted: bool = False) -> dict:
+    """Capture the fields consumers care about while the instance is loaded."""
+    return {
+        "id": product.id,
+        "name": product.name,
+        "price": product.price,
+        "stock_quantity": product.stock_quantity,
+        "category": product.category,
+        "is_active": product.is_active,
+        "version": product.version,
+        "deleted": deleted,
+    }
+
+
+def publish_product_changes(changes: List[dict]) -> None:
+    """Deliver a batch of product snapshots to every listener, skipping stale ones."""
+    with _publish_lock:
+        current = []
+        for change in changes:
+            # A deletion keeps the version of the row it removed, and wins over its update
+            key = (change["version"], change["deleted"])
+            if key > _delivered.get(change["id"], (0, False)):
+                _delivered[change["id"]] = key
+                current.append(change)
+        if not current:
+            return
+        for listener in list(_listeners):
+            try:
+                listener(current)
+            except Exception:
+                logger.exception("Product change listener %r failed", listener)
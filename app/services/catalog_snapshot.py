@@ -0,0 +1,261 @@
+"""
+Precomputed catalog snapshots.
+
+The active catalog, as ``GET /products/`` would return it, is written to
+local disk as JSON documents: one for every product and one per category,
+each next to a gzip-compressed copy. Every build goes to a directory named
+after its content hash, and a ``CURRENT`` file, replaced atomically, points
+readers at the latest one, so workers sharing the disk never see a
+half-written snapshot.
+
+Writes mark the snapshot dirty through catalog change events and a
+scheduled job rebuilds it at most once per debounce interval (and after
+``max_age`` regardless, to pick up other hosts' writes). Workers sharing
+the directory build one at a time under a ``flock`` on ``.lock``. The
+pointer's mtime records when its build started reading the database, so a
+worker that gets the lock after another's build just follows ``CURRENT``
+if that build started after its own changes were committed. Reads look up a
+prebuilt file and its strong ETag in memory and hand the path to
+``FileResponse``: no query and no serialization per request.
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.models.product import Product
+from app.schemas.product import ProductResponse
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+
+@dataclass(frozen=True)
+class SnapshotFile:
+    path: str
+    etag: str
+    stat: os.stat_result
+
+
+@contextmanager
+def _locked(directory: str) -> Iterator[None]:
+    """Hold the directory's build lock, shared with every worker using it."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _replace(path: str, data: bytes, mtime: Optional[float] = None) -> None:
+    fd, partial = tempfile.mkstemp(prefix="." + os.path.basename(path) + "-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+        if mtime is not None:
+            os.utime(partial, (mtime, mtime))
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+
+
+def _pointer(directory: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(os.path.join(directory, CURRENT_FILE))
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(
+    directory: str, products: List[dict], keep: int = 3, started_at: Optional[float] = None
+) -> str:
+    """
+    Write ``products`` as a new snapshot version and make it current.
+    ``started_at`` (default now) is when ``products`` were read. Workers
+    sharing ``directory`` call this with its lock held.
+    """
+    started_at = time.time() if started_at is None else started_at
+    documents: Dict[str, List[dict]] = {"all": products, "empty": []}
+    categories: Dict[str, str] = {}
+    for product in products:
+        category = product.get("category")
+        if category is None:
+            continue
+        name = categories.setdefault(
+            category, "category-" + hashlib.sha1(category.encode()).hexdigest()[:16]
+        )
+        documents.setdefault(name, []).append(product)
+
+    bodies = {name: json.dumps(rows, separators=(",", ":")).encode() for name, rows in documents.items()}
+    version = hashlib.sha256(bodies["all"]).hexdigest()[:16]
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, version)
+    if not os.path.isdir(target):
+        staging = tempfile.mkdtemp(prefix=".build-", dir=directory)
+        files = {}
+        for name, body in bodies.items():
+            # mtime=0 keeps the compressed bytes, and so the ETag, reproducible
+            for filename, data in ((f"{name}.json", body), (f"{name}.json.gz", gzip.compress(body, 9, mtime=0))):
+                with open(os.path.join(staging, filename), "wb") as out:
+                    out.write(data)
+                files[filename] = '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+        manifest = {"version": version, "products": len(products), "categories": categories, "etags": files}
+        with open(os.path.join(staging, MANIFEST_FILE), "w") as out:
+            json.dump(manifest, out)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another worker published the same content first
+            shutil.rmtree(staging, ignore_errors=True)
+    _replace(os.path.join(directory, CURRENT_FILE), version.encode(), mtime=started_at)
+    _prune(directory, version, keep)
+    return version
+
+
+def _prune(directory: str, current: str, keep: int) -> None:
+    versions = []
+    for entry in os.scandir(directory):
+        if not entry.is_dir() or entry.name.startswith(".") or entry.name == current:
+            continue
+        try:
+            versions.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue  # Removed by a writer outside the lock
+    versions.sort(reverse=True)
+    # Older versions stay around briefly for responses that already picked them
+    for _, path in versions[max(keep - 1, 0):]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class CatalogSnapshot:
+    """This worker's view of the current snapshot on disk."""
+
+    def __init__(self, directory: str, keep: int = 3, max_age: float = 300.0):
+        self.directory = directory
+        self.keep = keep
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._pointer_mtime: Optional[float] = None
+        self._version: Optional[str] = None
+        self._categories: Dict[str, str] = {}
+        self._files: Dict[str, SnapshotFile] = {}
+        # Wall-clock time of the first change not yet in a build
+        self._dirty_since: Optional[float] = None
+        self._built_at = float("-inf")
+
+    @property
+    def version(self) -> Optional[str]:
+        self.refresh()
+        return self._version
+
+    def mark_dirty(self, changes: List[dict]) -> None:
+        """Catalog listener: the next scheduled run rebuilds the snapshot."""
+        if self._dirty_since is None:
+            self._dirty_since = time.time()
+
+    def due(self) -> bool:
+        return self._dirty_since is not None or time.monotonic() - self._built_at >= self.max_age
+
+    def refresh(self) -> bool:
+        """Follow ``CURRENT`` if another build replaced it since the last look."""
+        pointer = os.path.join(self.directory, CURRENT_FILE)
+        try:
+            mtime = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._pointer_mtime:
+            return False
+        with self._lock:
+            if mtime == self._pointer_mtime:
+                return False
+            with open(pointer) as current:
+                version = current.read().strip()
+            base = os.path.join(self.directory, version)
+            with open(os.path.join(base, MANIFEST_FILE)) as manifest_file:
+                manifest = json.load(manifest_file)
+            files = {}
+            for filename, etag in manifest["etags"].items():
+                path = os.path.join(base, filename)
+                files[filename] = SnapshotFile(path, etag, os.stat(path))
+            self._version, self._categories, self._files = version, manifest["categories"], files
+            self._pointer_mtime = mtime
+        return True
+
+    def rebuild(self, db: Session) -> str:
+        """
+        Materialize the active catalog from the database, unless another
+        worker's build, started after this worker's pending changes (or
+        within ``max_age``), is already current.
+        """
+        dirty_since, self._dirty_since = self._dirty_since, None
+        needed_since = dirty_since if dirty_since is not None else time.time() - self.max_age
+        try:
+            with _locked(self.directory):
+                pointer = _pointer(self.directory)
+                if pointer is not None and pointer.st_mtime >= needed_since:
+                    self._built_at = time.monotonic() - max(time.time() - pointer.st_mtime, 0.0)
+                    self.refresh()
+                    return self._version
+                started_at = time.time()
+                products = [
+                    ProductResponse.model_validate(product).model_dump(mode="json")
+                    for product in db.query(Product).filter(Product.is_active == True).order_by(Product.id)
+                ]
+                version = write_snapshot(self.directory, products, keep=self.keep, started_at=started_at)
+        except Exception:
+            if self._dirty_since is None:
+                self._dirty_since = dirty_since
+            raise
+        self._built_at = time.monotonic()
+        self.refresh()
+        return version
+
+    def lookup(self, category: Optional[str] = None, compressed: bool = False) -> Optional[SnapshotFile]:
+        """The prebuilt file for every product or one category; None before the first build."""
+        self.refresh()
+        if self._version is None:
+            return None
+        name = "all" if category is None else self._categories.get(category, "empty")
+        return self._files[f"{name}.json.gz" if compressed else f"{name}.json"]
+
+
+@lru_cache
+def get_catalog_snapshot() -> CatalogSnapshot:
+    """This worker's snapshot reader, configured from settings on first use."""
+    settings = get_settings()
+    return CatalogSnapshot(
+        settings.CATALOG_SNAPSHOT_DIR,
+        keep=settings.CATALOG_SNAPSHOT_KEEP_VERSIONS,
+        max_age=settings.CATALOG_SNAPSHOT_MAX_AGE_SECONDS,
+    )
+
+
+def rebuild_catalog_snapshot() -> None:
+    """Scheduled job: rebuild if products changed or the snapshot is old."""
+    from app.db.base import SessionLocal
+
+    snapshot = get_catalog_snapshot()
+    if not snapshot.due():
+        return
+    db = SessionLocal()
+    try:
+        snapshot.rebuild(db)
+    finally:
+        db.close()
@@ -0,0 +1,142 @@
+"""
+In-memory category facets for storefront navigation.
+
+The index holds, for every category of active products, the product count
+and a sorted list of prices (for min/max). It is built with one narrow
+query, kept current by catalog change events, and rebuilt from the
+database on a schedule to repair any drift. Reads return a pre-serialized
+JSON payload, so serving facets costs no query and no per-request work.
+"""
+import json
+import threading
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.product import Product
+
+# product id -> (category, price) for every active product
+Entry = Tuple[Optional[str], float]
+
+
+class FacetIndex:
+    """Per-category counts and price ranges, updated by deltas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Entry] = {}
+        self._prices: Dict[Optional[str], List[float]] = {}
+        self._payload: Optional[bytes] = None
+        self._built = False
+        # One list per rebuild in progress, of changes that arrive while it reads the database
+        self._replays: List[List[dict]] = []
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def reset(self) -> None:
+        """Forget everything; the next read rebuilds from the database."""
+        with self._lock:
+            self._entries, self._prices = {}, {}
+            self._payload = None
+            self._built = False
+
+    def _add(self, product_id: int, category: Optional[str], price: float) -> None:
+        self._entries[product_id] = (category, price)
+        insort(self._prices.setdefault(category, []), price)
+
+    def _remove(self, product_id: int) -> None:
+        entry = self._entries.pop(product_id, None)
+        if entry is None:
+            return
+        category, price = entry
+        prices = self._prices[category]
+        del prices[bisect_left(prices, price)]
+        if not prices:
+            del self._prices[category]
+
+    def _apply(self, change: dict) -> None:
+        self._remove(change["id"])
+        if change.get("is_active") and not change.get("deleted"):
+            self._add(change["id"], change.get("category"), float(change["price"]))
+
+    def apply(self, changes: List[dict]) -> None:
+        """Catalog listener: fold product snapshots into the index."""
+        with self._lock:
+            for replay in self._replays:
+                replay.extend(changes)
+            if not self._built:
+                return
+            for change in changes:
+                self._apply(change)
+            self._payload = None
+
+    def rebuild(self, rows: Iterable[Tuple[int, Optional[str], float]], replay: Iterable[dict] = ()) -> None:
+        """Replace the index with ``(id, category, price)`` rows of active products, then ``replay``."""
+        fresh = FacetIndex()
+        for product_id, category, price in rows:
+            fresh._add(product_id, category, float(price))
+        with self._lock:
+            for change in replay:
+                fresh._apply(change)
+            self._entries, self._prices = fresh._entries, fresh._prices
+            self._payload = None
+            self._built = True
+
+    def rebuild_from(self, db: Session) -> None:
+        # Overlapping rebuilds (the scheduled job and a first request) each keep their own replay
+        replay: List[dict] = []
+        with self._lock:
+            self._replays.append(replay)
+        try:
+            rows = db.query(Product.id, Product.category, Product.price).filter(
+                Product.is_active == True
+            ).all()
+            self.rebuild(rows, replay)
+        finally:
+            with self._lock:
+                self._replays.remove(replay)
+
+    def _facets(self) -> dict:
+        categories = sorted(self._prices.items(), key=lambda item: (item[0] is None, item[0] or ""))
+        return {
+            "total": len(self._entries),
+            "categories": [
+                {
+                    "category": category,
+                    "count": len(prices),
+                    "min_price": prices[0],
+                    "max_price": prices[-1],
+                }
+                for category, prices in categories
+            ],
+        }
+
+    def facets(self) -> dict:
+        with self._lock:
+            return self._facets()
+
+    def payload(self) -> bytes:
+        """The facets as JSON, serialized once per change rather than per request."""
+        with self._lock:
+            if self._payload is None:
+                self._payload = json.dumps(self._facets()).encode()
+            return self._payload
+
+
+@lru_cache
+def get_facet_index() -> FacetIndex:
+    """This worker's facet index."""
+    return FacetIndex()
+
+
+def rebuild_facets() -> None:
+    """Scheduled job: rebuild the index from the database."""
+    from app.db.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        get_facet_index().rebuild_from(db)
+    finally:
+        db.close()
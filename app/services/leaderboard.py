@@ -0,0 +1,258 @@
+"""
+Incremental best-seller leaderboards.
+
+Order placement records units sold into hourly buckets held in memory;
+cancellation takes them back out of the bucket of the hour the order was
+placed in. A bucket holds one total and one category per product, like a
+``product_sales_hourly`` row: a product recategorized within the hour
+moves that hour's units to its new category.
+Every rolling window (last 24 hours, last 7 days) keeps running per-product
+totals, overall and per category: a new sale adds to them and a bucket
+leaving the window is subtracted once, so reads never re-aggregate.
+Top-K lists come from ``heapq.nlargest`` over those totals and are memoized
+until the next change.
+
+Each worker periodically upserts the sales it recorded into
+``product_sales_hourly`` and reloads the recent buckets, which merges the
+other workers' sales and lets the leaderboards survive restarts. Nothing
+here reads ``order_items``.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.sales import ProductSalesHourly
+
+logger = logging.getLogger(__name__)
+
+# Window name -> length in hourly buckets
+WINDOWS = {"day": 24, "week": 24 * 7}
+
+# (product_id, category, units)
+Sale = Tuple[int, Optional[str], int]
+
+# (placed_at epoch seconds, product_id, category, units); the category is
+# only used when the sale's own bucket is no longer held
+Return = Tuple[float, int, Optional[str], int]
+
+
+class _AllCategories:
+    def __repr__(self) -> str:
+        return "ALL_CATEGORIES"
+
+
+ALL_CATEGORIES = _AllCategories()
+
+
+class Leaderboard:
+    """Rolling-window units sold per product, with per-category top-K reads."""
+
+    def __init__(self, windows: Dict[str, int] = WINDOWS, clock: Callable[[], float] = time.time):
+        self.windows = dict(windows)
+        self.retention = max(self.windows.values())
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._reset(self._hour())
+        # (hour, product_id) -> (category, units) recorded here but not yet written to the database
+        self._pending: Dict[Tuple[int, int], Tuple[Optional[str], int]] = {}
+
+    def _hour(self) -> int:
+        return int(self._clock() // 3600)
+
+    def _reset(self, now: int) -> None:
+        # hour -> product_id -> (category, units)
+        self._buckets: Dict[int, Dict[int, Tuple[Optional[str], int]]] = {}
+        self._totals = {name: defaultdict(Counter) for name in self.windows}
+        self._starts = {name: now - size + 1 for name, size in self.windows.items()}
+        self._categories: Dict[int, Optional[str]] = {}
+        self._cache: Dict[tuple, List[dict]] = {}
+        self._now = now
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def pending(self) -> int:
+        """Bucket rows recorded here but not yet flushed."""
+        return len(self._pending)
+
+    def _count(self, window: str, product_id: int, category: Optional[str], units: int) -> None:
+        for key in (category, ALL_CATEGORIES):
+            totals = self._totals[window][key]
+            totals[product_id] += units
+            if totals[product_id] <= 0:
+                del totals[product_id]
+
+    def _add(self, hour: int, product_id: int, category: Optional[str], units: int) -> None:
+        bucket = self._buckets.setdefault(hour, {})
+        previous, held = bucket.get(product_id, (category, 0))
+        bucket[product_id] = (category, held + units)
+        if units > 0:
+            self._categories[product_id] = category
+        for window, start in self._starts.items():
+            if start <= hour <= self._now:
+                if previous != category and held:
+                    # Recategorized: the hour's earlier units follow the product
+                    moved = self._totals[window]
+                    moved[previous][product_id] -= held
+                    if moved[previous][product_id] <= 0:
+                        del moved[previous][product_id]
+                    moved[category][product_id] += held
+                self._count(window, product_id, category, units)
+
+    def _keep(self, hour: int, product_id: int, category: Optional[str], units: int) -> None:
+        _, pending = self._pending.get((hour, product_id), (category, 0))
+        self._pending[(hour, product_id)] = (category, pending + units)
+
+    def _advance(self) -> None:
+        """Slide every window to the current hour, subtracting buckets that fell out."""
+        now = self._hour()
+        if now == self._now:
+            return
+        for window, size in self.windows.items():
+            start = now - size + 1
+            for hour in [h for h in self._buckets if self._starts[window] <= h < start]:
+                for product_id, (category, units) in self._buckets[hour].items():
+                    self._count(window, product_id, category, -units)
+            # Buckets recorded ahead of the old window edge enter it now
+            for hour in [h for h in self._buckets if self._now < h <= now and h >= start]:
+                for product_id, (category, units) in self._buckets[hour].items():
+                    self._count(window, product_id, category, units)
+            self._starts[window] = start
+        for hour in [h for h in self._buckets if h <= now - self.retention]:
+            del self._buckets[hour]
+        self._now = now
+        self._cache.clear()
+
+    def record(self, sales: Iterable[Sale]) -> None:
+        """Add units sold now."""
+        with self._lock:
+            self._advance()
+            for product_id, category, units in sales:
+                self._add(self._now, product_id, category, units)
+                self._keep(self._now, product_id, category, units)
+            self._cache.clear()
+
+    def take_back(self, returns: Iterable[Return]) -> None:
+        """Subtract returned units from the hour, and category, they were sold in."""
+        with self._lock:
+            self._advance()
+            for placed_at, product_id, category, units in returns:
+                hour = int(placed_at // 3600)
+                if hour <= self._now - self.retention:
+                    continue
+                category, _ = self._buckets.get(hour, {}).get(product_id, (category, 0))
+                self._add(hour, product_id, category, -units)
+                self._keep(hour, product_id, category, -units)
+            self._cache.clear()
+
+    def top(self, window: str, category=ALL_CATEGORIES, limit: int = 50) -> List[dict]:
+        """Best sellers in ``window``, optionally within one category."""
+        with self._lock:
+            self._advance()
+            key = (window, category, limit)
+            if key not in self._cache:
+                totals = self._totals[window].get(category, {})
+                best = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], -item[0]))
+                self._cache[key] = [
+                    {"product_id": product_id, "category": self._categories.get(product_id), "units": units}
+                    for product_id, units in best
+                ]
+            return self._cache[key]
+
+    def flush(self, db: Session) -> int:
+        """Upsert pending sales into ``product_sales_hourly``; returns the rows written."""
+        from app.db.upsert import insert_for
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        # One row per (bucket_hour, product_id): an upsert may not hit a row twice
+        rows = [
+            {"bucket_hour": hour, "product_id": product_id, "category": category, "units": units}
+            for (hour, product_id), (category, units) in pending.items()
+        ]
+        try:
+            insert = insert_for(db)
+            statement = insert(ProductSalesHourly).values(rows)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[ProductSalesHourly.bucket_hour, ProductSalesHourly.product_id],
+                set_={
+                    "units": ProductSalesHourly.units + statement.excluded.units,
+                    "category": statement.excluded.category,
+                },
+            ))
+            db.query(ProductSalesHourly).filter(
+                ProductSalesHourly.bucket_hour <= self._hour() - self.retention
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for (hour, product_id), (category, units) in pending.items():
+                    # Sales recorded since keep the newer category
+                    newer, _ = self._pending.get((hour, product_id), (category, 0))
+                    self._keep(hour, product_id, newer, units)
+            raise
+        return len(rows)
+
+    def reload(self, db: Session) -> None:
+        """Replace the in-memory buckets with the database's plus unflushed local sales."""
+        now = self._hour()
+        rows = db.query(
+            ProductSalesHourly.bucket_hour,
+            ProductSalesHourly.product_id,
+            ProductSalesHourly.category,
+            ProductSalesHourly.units,
+        ).filter(ProductSalesHourly.bucket_hour > now - self.retention).all()
+        with self._lock:
+            self._reset(now)
+            for hour, product_id, category, units in rows:
+                self._add(hour, product_id, category, units)
+            for (hour, product_id), (category, units) in self._pending.items():
+                if hour > now - self.retention:
+                    self._add(hour, product_id, category, units)
+            self._loaded = True
+
+
+@lru_cache
+def get_leaderboard() -> Leaderboard:
+    """This worker's leaderboards."""
+    return Leaderboard()
+
+
+def record_sales(sales: List[Sale]) -> None:
+    """Job entry point used by order placement."""
+    get_leaderboard().record(sales)
+
+
+def record_returns(returns: List[Tuple[datetime, int, Optional[str], int]]) -> None:
+    """Job entry point used by order cancellation: ``(placed_at, product_id, category, units)``."""
+    get_leaderboard().take_back(
+        # SQLite hands back naive UTC
+        ((placed_at if placed_at.tzinfo else placed_at.replace(tzinfo=timezone.utc)).timestamp(),
+         product_id, category, units)
+        for placed_at, product_id, category, units in returns
+    )
+
+
+def sync_leaderboard(reload: bool = True) -> None:
+    """Scheduled job: persist this worker's sales and pick up everyone else's."""
+    from app.db.base import SessionLocal
+
+    leaderboard = get_leaderboard()
+    db = SessionLocal()
+    try:
+        leaderboard.flush(db)
+        if reload:
+            leaderboard.reload(db)
+    finally:
+        db.close()
@@ -0,0 +1,189 @@
+"""
+Archival of old monthly order partitions.
+
+Each partition is streamed to a compressed file with a server-side cursor,
+so memory stays flat however large the month is. The partition is
+detached first, so nothing can change it while it is exported, and the
+file is fsynced and renamed into place before the table may be dropped. A
+rerun after a failed export picks up the tables it left detached. Only
+finished months can be archived. Archives are gzip NDJSON by default, or
+Parquet when ``pyarrow`` is installed.
+"""
+import enum
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from app.db.partitions import (
+    PARTITIONED_TABLES,
+    detached_partitions_before,
+    month_start,
+    partitions_before,
+)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "parquet")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _iter_batches(conn: Connection, table: str, batch_size: int) -> Iterator[List[dict]]:
+    quoted = conn.dialect.identifier_preparer.quote(table)
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+        text(f"SELECT * FROM {quoted}")
+    )
+    for rows in result.partitions():
+        yield [row._asdict() for row in rows]
+
+
+def _write_ndjson(batches: Iterator[List[dict]], path: str) -> int:
+    count = 0
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+            for batch in batches:
+                out.write("".join(
+                    json.dumps(row, default=_json_default, separators=(",", ":")) + "\n"
+                    for row in batch
+                ).encode())
+                count += len(batch)
+        raw.flush()
+        os.fsync(raw.fileno())
+    return count
+
+
+def _write_parquet(batches: Iterator[List[dict]], path: str) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet archives require the pyarrow package") from exc
+
+    count = 0
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                table = pa.Table.from_pylist(batch)
+                writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+            else:
+                table = pa.Table.from_pylist(batch, schema=writer.schema)
+            writer.write_table(table)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+    with open(path, "rb") as written:
+        os.fsync(written.fileno())
+    return count
+
+
+@dataclass
+class ArchivedPartition:
+    table: str
+    path: str
+    rows: int
+
+
+def export_table(
+    conn: Connection,
+    table: str,
+    output_dir: str,
+    fmt: str = "ndjson",
+    batch_size: int = 5000,
+) -> ArchivedPartition:
+    """Stream every row of ``table`` into ``output_dir`` and return the result."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown archive format: {fmt}")
+    extension = "ndjson.gz" if fmt == "ndjson" else "parquet"
+    path = os.path.join(output_dir, f"{table}.{extension}")
+    partial = path + ".partial"
+    writer = _write_ndjson if fmt == "ndjson" else _write_parquet
+    try:
+        rows = writer(_iter_batches(conn, table, batch_size), partial)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, path)
+    return ArchivedPartition(table=table, path=path, rows=rows)
+
+
+def archive_partitions(
+    engine: Engine,
+    before: date,
+    output_dir: str,
+    fmt: str = "ndjson",
+    batch_size: int = 5000,
+    drop: bool = False,
+    dry_run: bool = False,
+    today: Optional[date] = None,
+) -> List[ArchivedPartition]:
+    """
+    Archive and detach every monthly partition that ends on or before
+    ``before``, oldest first. Order items and their orders share a month, so
+    both tables are detached, archived and (with ``drop``) dropped together
+    for each month.
+
+    Partitions are detached before they are exported: writes through the
+    parent tables can no longer reach them, so the file holds exactly what
+    is dropped afterwards. Tables are only dropped once their files are
+    fsynced; if an export fails, the detached tables are left in place and
+    the next run exports them. ``before`` may not be later than the start
+    of the current month, whose partition still takes new orders.
+    """
+    this_month = month_start(today or datetime.now(timezone.utc).date())
+    if before > this_month:
+        raise RuntimeError(
+            f"Cannot archive months that are not over yet: --before must be {this_month:%Y-%m} or earlier"
+        )
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Order partitions only exist on PostgreSQL")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # month -> (parent, partition, still attached)
+    months: Dict[date, List[Tuple[str, str, bool]]] = {}
+    with engine.connect() as conn:
+        for parent in PARTITIONED_TABLES:
+            for name, month in detached_partitions_before(conn, parent, before):
+                logger.info("Resuming the archive of detached table %s", name)
+                months.setdefault(month, []).append((parent, name, False))
+            for name, month in partitions_before(conn, parent, before):
+                months.setdefault(month, []).append((parent, name, True))
+
+    archived = []
+    for month in sorted(months):
+        partitions = months[month]
+        if dry_run:
+            archived.extend(ArchivedPartition(name, "", 0) for _, name, _ in partitions)
+            continue
+        with engine.begin() as conn:
+            for parent, name, attached in partitions:
+                if attached:
+                    conn.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {name}"))
+        with engine.connect() as conn:
+            for _, name, _ in partitions:
+                result = export_table(conn, name, output_dir, fmt, batch_size)
+                logger.info("Archived %d rows from %s to %s", result.rows, name, result.path)
+                archived.append(result)
+        if drop:
+            with engine.begin() as conn:
+                for _, name, _ in partitions:
+                    conn.execute(text(f"DROP TABLE {name}"))
+    return archived
@@ -0,0 +1,231 @@
+"""
+Transactional outbox dispatcher.
+
+Events are written to ``outbox_events`` in the same transaction as the
+change they describe (see ``app.crud.order.create_order``). A background
+thread claims undelivered rows in batches with ``FOR UPDATE SKIP LOCKED``
+and leases them by pushing ``available_at`` past the sink timeouts, then
+commits: no row lock or pooled connection is held while sinks do network
+I/O. It hands each batch to every configured sink and settles it in a
+second short transaction, marking it delivered with a single UPDATE. A
+dispatcher that dies mid-batch leaves the lease to expire, and the events
+are claimed again.
+
+Delivery is at-least-once per sink. A batch succeeds or fails as a whole,
+so when one sink fails, the batch is retried with exponential backoff and
+sent again to every sink, including those that already accepted it. After
+``max_attempts`` failures an event is set aside: it gets ``failed_at`` and
+an ERROR log, and is never claimed again. Clear ``failed_at`` and reset
+``attempts`` to have it retried.
+"""
+import json
+import logging
+import threading
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Protocol
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_active_dispatchers: List["OutboxDispatcher"] = []
+
+
+class OutboxSink(Protocol):
+    """Destination for a batch of serialized outbox events."""
+
+    def send(self, events: List[dict]) -> None:
+        ...
+
+
+class FileSink:
+    """Append events as newline-delimited JSON, one write per batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, events: List[dict]) -> None:
+        lines = "".join(json.dumps(event, default=str) + "\n" for event in events)
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(lines)
+
+
+class HttpSink:
+    """POST each batch as a JSON array to a webhook endpoint."""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, events: List[dict]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(events, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"Sink returned HTTP {response.status}")
+
+
+def serialize_event(event: OutboxEvent) -> dict:
+    return {
+        "id": event.id,
+        "type": event.event_type,
+        "aggregate_id": event.aggregate_id,
+        "payload": event.payload,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+    }
+
+
+class OutboxDispatcher:
+    """Claims pending outbox events in batches and delivers them to sinks."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        sinks: List[OutboxSink],
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        max_attempts: int = 10,
+        retry_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        lease: float = 60.0,
+    ):
+        self.session_factory = session_factory
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Exponential delay before the next attempt of a failed batch."""
+        seconds = min(self.retry_backoff * (2 ** (attempts - 1)), self.max_backoff)
+        return timedelta(seconds=seconds)
+
+    def dispatch_batch(self, db: Session) -> int:
+        """Deliver one batch. Returns the number of events claimed."""
+        now = datetime.now(timezone.utc)
+        events = (
+            db.query(OutboxEvent)
+            .filter(
+                OutboxEvent.dispatched_at.is_(None),
+                OutboxEvent.failed_at.is_(None),
+                OutboxEvent.available_at <= now,
+                OutboxEvent.attempts < self.max_attempts,
+            )
+            .order_by(OutboxEvent.available_at, OutboxEvent.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not events:
+            db.rollback()
+            return 0
+
+        ids = [event.id for event in events]
+        batch = [serialize_event(event) for event in events]
+        leased_until = now + timedelta(seconds=self.lease)
+        for event in events:
+            event.available_at = leased_until
+        db.commit()
+
+        try:
+            for sink in self.sinks:
+                sink.send(batch)
+        except Exception as exc:
+            logger.warning("Outbox delivery of %d events failed: %s", len(ids), exc)
+            self._record_failure(db, ids, exc)
+        else:
+            db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_(ids))
+                .values(dispatched_at=datetime.now(timezone.utc), last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        return len(ids)
+
+    def _record_failure(self, db: Session, ids: List[int], exc: Exception) -> None:
+        now = datetime.now(timezone.utc)
+        for event in db.query(OutboxEvent).filter(OutboxEvent.id.in_(ids)):
+            event.attempts += 1
+            event.last_error = str(exc)[:1000]
+            event.available_at = now + self.backoff(event.attempts)
+            if event.attempts >= self.max_attempts:
+                event.failed_at = now
+                logger.error(
+                    "Outbox event %d (%s) failed %d times and will not be retried: %s",
+                    event.id, event.event_type, event.attempts, exc,
+                )
+        db.commit()
+
+    def run_once(self) -> int:
+        """Drain every currently deliverable event. Returns the count claimed."""
+        total = 0
+        while not self._stop.is_set():
+            db = self.session_factory()
+            try:
+                claimed = self.dispatch_batch(db)
+            finally:
+                db.close()
+            total += claimed
+            if claimed < self.batch_size:
+                break
+        return total
+
+    def wake(self) -> None:
+        """Ask the dispatcher to poll now instead of waiting out the interval."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Outbox dispatcher iteration failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+        _active_dispatchers.append(self)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self in _active_dispatchers:
+            _active_dispatchers.remove(self)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def wake_dispatchers() -> None:
+    """Nudge running dispatchers after new events are committed."""
+    for dispatcher in list(_active_dispatchers):
+        dispatcher.wake()
+
+
+def build_sinks(file_path: Optional[str], http_url: Optional[str]) -> List[OutboxSink]:
+    """Create the sinks enabled in settings."""
+    sinks: List[OutboxSink] = []
+    if file_path:
+        sinks.append(FileSink(file_path))
+    if http_url:
+        sinks.append(HttpSink(http_url))
+    return sinks
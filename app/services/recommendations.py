@@ -0,0 +1,262 @@
+"""
+"Frequently bought together" recommendations.
+
+An offline job (``python -m app.cli build-recommendations``) streams
+``order_items`` in order-id order and, chunk by chunk, turns the baskets
+into a sparse order x product matrix ``B``; ``B.T @ B`` counts how many
+orders contain each pair of products. The running co-occurrence matrix is
+saved next to a compact top-K index: three flat arrays in CSR layout
+(``products``, ``offsets``, ``neighbors``/``scores``). Workers load the
+index and answer lookups with one binary search and an array slice.
+
+Each run remembers the last order it consumed, so later runs only fold in
+new orders; ``--full`` recomputes from scratch. NumPy and SciPy are only
+imported by the job and when an index is loaded.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "related.npz"
+STATE_FILE = "state.json"
+
+
+def _require_numpy():
+    try:
+        import numpy as np
+        import scipy.sparse as sparse
+    except ImportError as exc:
+        raise RuntimeError("Recommendations require the numpy and scipy packages") from exc
+    return np, sparse
+
+
+class RelatedIndex:
+    """Top-K co-purchased products per product, in CSR-style arrays."""
+
+    def __init__(self, products, offsets, neighbors, scores):
+        self.products = products
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    @classmethod
+    def from_matrix(cls, matrix, top_k: int) -> "RelatedIndex":
+        """Keep the ``top_k`` highest counts of every row, ties by product id."""
+        np, _ = _require_numpy()
+        coo = matrix.tocoo()
+        order = np.lexsort((coo.col, -coo.data, coo.row))
+        rows, cols, counts = coo.row[order], coo.col[order], coo.data[order]
+        products, first, sizes = np.unique(rows, return_index=True, return_counts=True)
+        rank = np.arange(rows.size) - np.repeat(first, sizes)
+        keep = rank < top_k
+        kept = np.minimum(sizes, top_k)
+        offsets = np.zeros(products.size + 1, dtype=np.int64)
+        np.cumsum(kept, out=offsets[1:])
+        return cls(
+            products.astype(np.int64),
+            offsets,
+            cols[keep].astype(np.int64),
+            counts[keep].astype(np.int32),
+        )
+
+    def related(self, product_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+        """``(product_id, orders_in_common)`` pairs, most frequent first."""
+        position = int(self.products.searchsorted(product_id))
+        if position == len(self.products) or self.products[position] != product_id:
+            return []
+        start = int(self.offsets[position])
+        end = min(int(self.offsets[position + 1]), start + limit)
+        return list(zip(self.neighbors[start:end].tolist(), self.scores[start:end].tolist()))
+
+    def save(self, path: str) -> None:
+        np, _ = _require_numpy()
+        with open(path, "wb") as out:
+            np.savez(out, products=self.products, offsets=self.offsets,
+                     neighbors=self.neighbors, scores=self.scores)
+
+    @classmethod
+    def load(cls, path: str) -> "RelatedIndex":
+        np, _ = _require_numpy()
+        with np.load(path) as data:
+            return cls(data["products"], data["offsets"], data["neighbors"], data["scores"])
+
+
+class CooccurrenceBuilder:
+    """Accumulates product pair counts from chunks of (order_id, product_id) rows."""
+
+    def __init__(self, matrix=None, max_basket_size: int = 100):
+        np, sparse = _require_numpy()
+        self.matrix = matrix if matrix is not None else sparse.csr_matrix((0, 0), dtype=np.int32)
+        self.max_basket_size = max_basket_size
+        self.orders = 0
+
+    def consume(self, order_ids, product_ids) -> None:
+        """Fold complete baskets into the matrix. Every order must be whole in one call."""
+        np, sparse = _require_numpy()
+        if len(order_ids) == 0:
+            return
+        baskets, rows = np.unique(order_ids, return_inverse=True)
+        size = max(int(product_ids.max()) + 1, self.matrix.shape[0])
+        basket = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, product_ids)),
+            shape=(len(baskets), size),
+        )
+        basket.sum_duplicates()
+        basket.data[:] = 1  # A product bought twice in one order counts once
+        # Huge baskets add quadratic noise rather than signal
+        basket = basket[np.diff(basket.indptr) <= self.max_basket_size]
+        pairs = (basket.T @ basket).tocsr()
+        pairs.setdiag(0)
+        pairs.eliminate_zeros()
+        if self.matrix.shape[0] < size:
+            self.matrix = self.matrix.copy()
+            self.matrix.resize((size, size))
+        self.matrix = (self.matrix + pairs).astype(np.int32)
+        self.orders += basket.shape[0]
+
+    def index(self, top_k: int) -> RelatedIndex:
+        return RelatedIndex.from_matrix(self.matrix, top_k)
+
+
+def stream_order_items(
+    engine: Engine,
+    after_order_id: int,
+    until_order_id: int,
+    chunk_size: int = 50_000,
+) -> Iterator[tuple]:
+    """
+    Yield ``(order_ids, product_ids)`` arrays for orders in
+    ``(after_order_id, until_order_id]``, reading with a server-side cursor.
+    Each chunk ends on an order boundary.
+    """
+    np, _ = _require_numpy()
+    statement = text(
+        "SELECT order_id, product_id FROM order_items "
+        "WHERE order_id > :after AND order_id <= :until ORDER BY order_id"
+    )
+    carry: list = []
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            statement, {"after": after_order_id, "until": until_order_id}
+        )
+        for rows in result.partitions():
+            rows = carry + [tuple(row) for row in rows]
+            last_order = rows[-1][0]
+            split = len(rows)
+            while split and rows[split - 1][0] == last_order:
+                split -= 1
+            complete, carry = rows[:split], rows[split:]
+            if complete:
+                data = np.asarray(complete, dtype=np.int64)
+                yield data[:, 0], data[:, 1]
+    if carry:
+        data = np.asarray(carry, dtype=np.int64)
+        yield data[:, 0], data[:, 1]
+
+
+def _read_state(directory: str) -> dict:
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return {"last_order_id": 0, "matrix": None}
+    with open(path) as state:
+        return json.load(state)
+
+
+def _replace(path: str, write) -> None:
+    partial = path + ".partial"
+    write(partial)
+    os.replace(partial, path)
+
+
+def build_recommendations(
+    engine: Engine,
+    directory: str,
+    top_k: int = 20,
+    max_basket_size: int = 100,
+    settle_seconds: float = 300.0,
+    chunk_size: int = 50_000,
+    full: bool = False,
+) -> dict:
+    """
+    Fold orders placed since the previous run into the co-occurrence matrix
+    and rewrite the top-K index. Orders younger than ``settle_seconds`` are
+    left for the next run so transactions still in flight are not skipped.
+    """
+    _, sparse = _require_numpy()
+    os.makedirs(directory, exist_ok=True)
+    previous = _read_state(directory)
+    state = {"last_order_id": 0, "matrix": None} if full else previous
+    matrix = None
+    if state["matrix"]:
+        matrix = sparse.load_npz(os.path.join(directory, state["matrix"])).tocsr()
+    builder = CooccurrenceBuilder(matrix, max_basket_size=max_basket_size)
+
+    settled = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+    with engine.connect() as conn:
+        until = conn.execute(
+            text("SELECT max(id) FROM orders WHERE created_at < :settled"), {"settled": settled}
+        ).scalar()
+    until = max(until or 0, state["last_order_id"])
+
+    for order_ids, product_ids in stream_order_items(engine, state["last_order_id"], until, chunk_size):
+        builder.consume(order_ids, product_ids)
+    index = builder.index(top_k)
+
+    # The state file names the matrix that matches its watermark, and is
+    # switched atomically, so a crash at any point never counts orders twice.
+    matrix_file = f"cooccurrence-{until}.npz"
+
+    def write_matrix(path: str) -> None:
+        with open(path, "wb") as out:
+            sparse.save_npz(out, builder.matrix)
+
+    def write_state(path: str) -> None:
+        with open(path, "w") as out:
+            json.dump({"last_order_id": until, "matrix": matrix_file}, out)
+
+    _replace(os.path.join(directory, matrix_file), write_matrix)
+    _replace(os.path.join(directory, STATE_FILE), write_state)
+    _replace(os.path.join(directory, INDEX_FILE), index.save)
+    if previous["matrix"] and previous["matrix"] != matrix_file:
+        os.remove(os.path.join(directory, previous["matrix"]))
+    logger.info("Recommendations: %d new orders, %d products indexed", builder.orders, len(index))
+    return {"orders": builder.orders, "products": len(index), "last_order_id": until}
+
+
+_index: Optional[RelatedIndex] = None
+_index_mtime: Optional[float] = None
+_index_lock = threading.Lock()
+
+
+def reload_related_index(directory: str) -> bool:
+    """Load the index if the file changed since the last load."""
+    global _index, _index_mtime
+    path = os.path.join(directory, INDEX_FILE)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return False
+    with _index_lock:
+        if mtime == _index_mtime:
+            return False
+        _index, _index_mtime = RelatedIndex.load(path), mtime
+    return True
+
+
+def get_related_index() -> Optional[RelatedIndex]:
+    """This worker's index, loaded on first use; None until a job has built one."""
+    if _index_mtime is None:
+        from app.core.config import get_settings
+
+        reload_related_index(get_settings().RECOMMENDATIONS_DIR)
+    return _index
@@ -0,0 +1,188 @@
+"""
+Write-behind buffers for high-frequency counters.
+
+Product page views and users' last-seen times change on nearly every
+request, and a database write for each would double the write load. Each
+worker instead aggregates them in memory:
+
+* a view adds 1 to the product's pending count;
+* a request keeps the later of the user's pending and new timestamps.
+
+A scheduled job swaps the pending values out and writes them as batched
+``INSERT ... ON CONFLICT DO UPDATE`` statements into
+``product_view_counts`` and ``user_last_seen``. Keys are sorted, so
+workers flushing at the same time take row locks in the same order. A
+failed flush merges its values back for the next attempt. A crash loses
+at most one flush interval of counts.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.db.upsert import insert_for
+from app.models.activity import ProductViewCount, UserLastSeen
+
+logger = logging.getLogger(__name__)
+
+Writer = Callable[[Session, List[Tuple[Hashable, Any]]], None]
+
+
+class WriteBehindBuffer:
+    """Pending values per key, merged in memory and upserted in batches."""
+
+    def __init__(
+        self,
+        name: str,
+        merge: Callable[[Any, Any], Any],
+        write: Writer,
+        max_keys: int = 100000,
+        batch_size: int = 1000,
+    ):
+        self.name = name
+        self.max_keys = max_keys
+        self.batch_size = batch_size
+        self._merge = merge
+        self._write = write
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, Any] = {}
+        self._counters = {"recorded": 0, "dropped": 0, "flushes": 0, "rows_written": 0, "failures": 0}
+        self._last_flush_ms = None
+        self._max_flush_ms = 0.0
+
+    def add(self, key: Hashable, value: Any) -> None:
+        """Merge ``value`` into the pending value of ``key``; new keys are dropped when full."""
+        with self._lock:
+            if key in self._pending:
+                self._pending[key] = self._merge(self._pending[key], value)
+            elif len(self._pending) < self.max_keys:
+                self._pending[key] = value
+            else:
+                self._counters["dropped"] += 1
+                return
+            self._counters["recorded"] += 1
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self, db: Session) -> int:
+        """Write every pending value; returns the rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        started = time.perf_counter()
+        items = sorted(pending.items())
+        try:
+            for start in range(0, len(items), self.batch_size):
+                self._write(db, items[start:start + self.batch_size])
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._counters["failures"] += 1
+                for key, value in pending.items():
+                    current = self._pending.get(key)
+                    self._pending[key] = value if current is None else self._merge(value, current)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._counters["flushes"] += 1
+            self._counters["rows_written"] += len(items)
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+        return len(items)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            last_flush_ms = self._last_flush_ms
+            return {
+                "pending": len(self._pending),
+                "max_keys": self.max_keys,
+                **self._counters,
+                "last_flush_ms": round(last_flush_ms, 2) if last_flush_ms is not None else None,
+                "max_flush_ms": round(self._max_flush_ms, 2),
+            }
+
+
+def _write_view_counts(db: Session, items: List[Tuple[int, int]]) -> None:
+    insert = insert_for(db)
+    statement = insert(ProductViewCount).values(
+        [{"product_id": product_id, "views": views} for product_id, views in items]
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[ProductViewCount.product_id],
+        set_={"views": ProductViewCount.views + statement.excluded.views},
+    ))
+
+
+def _write_last_seen(db: Session, items: List[Tuple[int, datetime]]) -> None:
+    insert = insert_for(db)
+    statement = insert(UserLastSeen).values(
+        [{"user_id": user_id, "last_seen_at": seen} for user_id, seen in items]
+    )
+    # Another worker may have flushed a later time already
+    newer = statement.excluded.last_seen_at > UserLastSeen.last_seen_at
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[UserLastSeen.user_id],
+        set_={"last_seen_at": case((newer, statement.excluded.last_seen_at), else_=UserLastSeen.last_seen_at)},
+    ))
+
+
+@lru_cache
+def get_view_counts() -> WriteBehindBuffer:
+    """This worker's pending product view counts."""
+    settings = get_settings()
+    return WriteBehindBuffer(
+        "product_views",
+        merge=lambda pending, views: pending + views,
+        write=_write_view_counts,
+        max_keys=settings.WRITE_BEHIND_MAX_KEYS,
+        batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    )
+
+
+@lru_cache
+def get_last_seen() -> WriteBehindBuffer:
+    """This worker's pending user last-seen times."""
+    settings = get_settings()
+    return WriteBehindBuffer(
+        "user_last_seen",
+        merge=max,
+        write=_write_last_seen,
+        max_keys=settings.WRITE_BEHIND_MAX_KEYS,
+        batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    )
+
+
+def record_product_view(product_id: int) -> None:
+    get_view_counts().add(product_id, 1)
+
+
+def record_user_seen(user_id: int) -> None:
+    get_last_seen().add(user_id, datetime.now(timezone.utc))
+
+
+def buffers() -> List[WriteBehindBuffer]:
+    return [get_view_counts(), get_last_seen()]
+
+
+def flush_write_behind() -> None:
+    """Scheduled job: write every buffer's pending values."""
+    from app.db.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for buffer in buffers():
+            try:
+                buffer.flush(db)
+            except Exception:
+                # Kept for the next run; the other buffers still flush
+                logger.warning("Could not flush %s", buffer.name, exc_info=True)
+    finally:
+        db.close()
@@ -0,0 +1,109 @@
+"""
+Access logging overhead per request.
+
+Drives a trivial ASGI endpoint directly (no sockets) and compares no
+access logging with writing JSON on the request path (what a plain logging
+handler does), the queued writer logging every request, and the queued
+writer sampling 1% of them. Each runs against a local file and against a
+target that stalls now and then, as a busy log pipe does.
+
+    python benchmarks/access_log.py [--requests 20000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.access_log import AccessLogMiddleware, AccessLogWriter, Sampler  # noqa: E402
+
+SCOPE = {
+    "type": "http",
+    "method": "GET",
+    "path": "/api/v1/products/1",
+    "headers": [(b"host", b"bench")],
+}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def drive(app, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(SCOPE), receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+class SlowFile:
+    """A log target that sometimes stalls, like a congested pipe to a log collector."""
+
+    def __init__(self, path: str, stall_every: int = 100, stall_seconds: float = 0.002):
+        self.file = open(path, "a")
+        self.writes = 0
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+
+    def write(self, data: str) -> None:
+        self.writes += 1
+        if self.writes % self.stall_every == 0:
+            time.sleep(self.stall_seconds)
+        self.file.write(data)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+class SynchronousWriter(AccessLogWriter):
+    """Formats and writes each entry on the request path, like a plain logging handler."""
+
+    def submit(self, entry: dict) -> None:
+        self.stream.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.stream.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix="access-log-bench-")
+    results = {}
+
+    results["no access log"] = asyncio.run(drive(endpoint, args.requests))
+
+    scenarios = [
+        ("synchronous, every request", SynchronousWriter, 1.0),
+        ("queued, every request", AccessLogWriter, 1.0),
+        ("queued, 1% sampled", AccessLogWriter, 0.01),
+    ]
+    for label, writer_class, rate in scenarios:
+        for target in ("file", "stalling"):
+            path = os.path.join(directory, f"{len(results)}.log")
+            stream = SlowFile(path) if target == "stalling" else open(path, "a")
+            writer = writer_class(stream, queue_size=args.requests)
+            writer.start()
+            app = AccessLogMiddleware(endpoint, writer, Sampler(rate=rate))
+            results[f"{label} ({target})"] = asyncio.run(drive(app, args.requests))
+            writer.stop()
+
+    baseline = results["no access log"]
+    for label, micros in results.items():
+        print(f"{label:40s} {micros:8.1f} us/request  (+{micros - baseline:.1f})")
+
+
+if __name__ == "__main__":
+    main()
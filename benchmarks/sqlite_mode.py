@@ -0,0 +1,128 @@
+"""
+SQLite throughput, default settings against the tuned mode.
+
+Threads stand in for concurrent requests against one database file. Each
+thread runs a mix of product reads and checkouts: a stock decrement plus an
+order insert, committed together. The default configuration uses a
+rollback journal with ``synchronous=FULL``, and every session writes on its
+own connection. The tuned mode (``app.db.sqlite``) uses WAL,
+``synchronous=NORMAL``, a memory map and one writer connection per
+process. Failed operations are mostly "database is locked".
+
+    python benchmarks/sqlite_mode.py [--threads 8] [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.db.base import Base  # noqa: E402
+from app.db.optimistic import retry_stale  # noqa: E402
+from app.db.sqlite import RoutingSession, create_sqlite_engines  # noqa: E402
+from app.models.order import Order  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+PRODUCTS = 1000
+
+
+def seed(engine) -> None:
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        session.add(User(email="bench@example.com", username="bench", hashed_password="x"))
+        session.add_all(
+            Product(name=f"Product {i}", price=10.0, stock_quantity=10 ** 6, category=f"c{i % 20}")
+            for i in range(PRODUCTS)
+        )
+        session.commit()
+
+
+def checkout(session, product_id: int) -> None:
+    product = session.get(Product, product_id)
+    product.stock_quantity -= 1
+    session.add(Order(user_id=1, total_amount=product.price))
+    session.commit()
+
+
+def run(session_factory, threads: int, seconds: float, write_ratio: float) -> dict:
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed_value: int) -> None:
+        rng = random.Random(seed_value)
+        local = {"reads": 0, "writes": 0, "errors": 0}
+        while time.perf_counter() < deadline:
+            session = session_factory()
+            product_id = rng.randint(1, PRODUCTS)
+            try:
+                if rng.random() < write_ratio:
+                    retry_stale(session, lambda: checkout(session, product_id), attempts=3, backoff=0.001)
+                    local["writes"] += 1
+                else:
+                    session.execute(select(Product).where(Product.id == product_id)).scalar_one()
+                    local["reads"] += 1
+            except Exception:
+                session.rollback()
+                local["errors"] += 1
+            finally:
+                session.close()
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {**counts, "ops": (counts["reads"] + counts["writes"]) / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix="sqlite-bench-")
+
+    default_url = f"sqlite:///{os.path.join(directory, 'default.db')}"
+    default = create_engine(
+        default_url,
+        connect_args={"check_same_thread": False, "timeout": 5},
+        pool_size=args.threads,
+        max_overflow=0,
+    )
+    seed(default)
+
+    reader, writer = create_sqlite_engines(
+        f"sqlite:///{os.path.join(directory, 'tuned.db')}", pool_size=args.threads
+    )
+    seed(writer)
+
+    scenarios = {
+        "default (rollback journal, FULL)": lambda: Session(default, autoflush=False),
+        "tuned (WAL, NORMAL, one writer)": lambda: RoutingSession(reader, writer, autoflush=False),
+    }
+    for label, factory in scenarios.items():
+        result = run(factory, args.threads, args.seconds, args.write_ratio)
+        print(
+            f"{label:34s} {result['ops']:9.0f} ops/s  "
+            f"reads {result['reads']:7d}  writes {result['writes']:6d}  errors {result['errors']:4d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Production server configuration.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The application is imported once in the master (preload) and forked into
+uvicorn workers. Each worker creates its own database engine lazily and
+runs the warm-up in ``app.core.warmup`` before it accepts connections.
+"""
+import logging
+import multiprocessing
+import time
+
+from app.core.config import settings
+
+_boot_started = time.perf_counter()
+
+bind = settings.SERVER_BIND
+workers = settings.SERVER_WORKERS or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = settings.SERVER_TIMEOUT_SECONDS
+graceful_timeout = settings.SERVER_TIMEOUT_SECONDS
+keepalive = 5
+accesslog = None
+errorlog = "-"
+loglevel = "info"
+
+
+def when_ready(server):
+    from app.core.warmup import memory_usage_mb
+
+    server.log.info(
+        "Master ready in %.0f ms with %d workers: %s",
+        (time.perf_counter() - _boot_started) * 1000,
+        server.num_workers,
+        memory_usage_mb(),
+    )
+
+
+def post_worker_init(worker):
+    # Runs in the worker after the app is loaded and before it serves traffic
+    from app.core.warmup import warm_up
+
+    logging.getLogger("app").setLevel(logging.INFO)
+    started = time.perf_counter()
+    try:
+        report = warm_up(worker.wsgi)
+    except Exception:
+        worker.log.exception("Worker %s warm-up failed; continuing cold", worker.pid)
+        return
+    worker.log.info(
+        "Worker %s ready in %.0f ms: %s",
+        worker.pid,
+        (time.perf_counter() - started) * 1000,
+        report,
+    )
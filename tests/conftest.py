@@ -1,11 +1,27 @@
+import os
+from contextlib import contextmanager
+
+# Fail any request that repeats one statement shape too often (lazy loads in a loop)
+os.environ.setdefault("NPLUSONE_DETECTION", "raise")
+# Keep access log lines out of pytest's output; test_access_log swaps in its own stream
+os.environ.setdefault("ACCESS_LOG_PATH", os.devnull)
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from app.main import app
+from app.db import base
+from app.db.nplusone import capture_queries
 from app.db.base import Base, get_db
+from app.core.config import get_settings
 from app.core.security import get_password_hash
+from app.services import catalog_events
+from app.services.catalog_snapshot import get_catalog_snapshot
+from app.services.facets import get_facet_index
+from app.services.leaderboard import get_leaderboard
+from app.services.write_behind import get_last_seen, get_view_counts
 
 # Create in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -23,6 +39,8 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def db_session():
     """Create a fresh database session for each test."""
     Base.metadata.create_all(bind=engine)
+    # Product ids and versions start over with the database
+    catalog_events.reset()
     session = TestingSessionLocal()
     try:
         yield session
@@ -32,7 +50,7 @@ def db_session():
 
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(db_session, monkeypatch, tmp_path):
     """Create a test client with database session override."""
     def override_get_db():
         try:
@@ -41,11 +59,43 @@ def client(db_session):
             db_session.close()
     
     app.dependency_overrides[get_db] = override_get_db
+    if app.state.rate_limit_store is not None:
+        app.state.rate_limit_store.clear()
+    get_facet_index().reset()
+    get_leaderboard.cache_clear()
+    settings = get_settings()
+    monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_DIR", str(tmp_path / "catalog"))
+    # Tests build snapshots on demand rather than on a timer
+    monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_DEBOUNCE_SECONDS", 3600.0)
+    get_catalog_snapshot.cache_clear()
+    # Tests flush write-behind buffers explicitly
+    monkeypatch.setattr(settings, "WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", 3600.0)
+    get_view_counts.cache_clear()
+    get_last_seen.cache_clear()
+    # Background jobs open their own sessions; keep them on the test database
+    monkeypatch.setattr(base, "_engine", engine)
+    monkeypatch.setattr(base, "_engine_pid", os.getpid())
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def query_budget():
+    """
+    Assert how many statements a block runs, e.g.
+    ``with query_budget(3): client.get(...)``.
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        with capture_queries() as recorder:
+            yield recorder
+        assert recorder.total <= max_queries, (
+            f"Query budget of {max_queries} exceeded:\n{recorder.report()}"
+        )
+    return budget
+
+
 @pytest.fixture
 def test_user(db_session):
     """Create a test user."""
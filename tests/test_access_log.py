@@ -0,0 +1,60 @@
+import io
+import json
+import time
+
+from fastapi import status
+
+from app.core.access_log import AccessLogWriter, Sampler, parse_sample_rules
+from app.main import app
+
+
+def test_sampler_always_keeps_slow_and_failed_requests():
+    sampler = Sampler(
+        rate=0.0,
+        rules=parse_sample_rules({"GET /api/v1/products*": 1.0, "GET /health": 0.0}),
+        slow_ms=100,
+        keep_status=500,
+    )
+    assert sampler.keep("GET", "/api/v1/products/3", 200, 1.0)
+    assert not sampler.keep("POST", "/api/v1/products/", 201, 1.0)
+    assert not sampler.keep("GET", "/health", 200, 1.0)
+    assert sampler.keep("GET", "/health", 200, 150.0)
+    assert sampler.keep("GET", "/health", 503, 1.0)
+
+    half = Sampler(rate=0.5, random_source=iter([0.2, 0.7]).__next__)
+    assert [half.keep("GET", "/", 200, 1.0) for _ in range(2)] == [True, False]
+
+
+def test_writer_batches_json_lines_and_drops_when_full():
+    out = io.StringIO()
+    writer = AccessLogWriter(out, queue_size=2)
+    for number in range(3):
+        writer.submit({"n": number})
+    assert writer.dropped == 1
+
+    writer.start()
+    writer.stop()
+    assert [json.loads(line)["n"] for line in out.getvalue().splitlines()] == [0, 1]
+    assert writer.written == 2
+
+
+def test_requests_are_logged_with_db_time_and_user(client, auth_headers, test_user, monkeypatch):
+    user_id = test_user.id
+    out = io.StringIO()
+    monkeypatch.setattr(app.state.access_log, "stream", out)
+
+    response = client.get("/api/v1/products/", headers={**auth_headers, "X-Request-ID": "abc123"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["x-request-id"] == "abc123"
+
+    deadline = time.monotonic() + 2
+    while '"abc123"' not in out.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    entry = next(
+        json.loads(line) for line in out.getvalue().splitlines() if '"abc123"' in line
+    )
+    assert entry["user_id"] == user_id
+    assert entry["route"] == "/api/v1/products/"
+    assert entry["status"] == 200
+    assert entry["db_queries"] >= 1
+    assert entry["duration_ms"] >= entry["db_ms"] > 0
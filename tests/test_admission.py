@@ -0,0 +1,124 @@
+import asyncio
+
+from fastapi import status
+
+from app.core.admission import AdmissionController, AdmissionMiddleware, RouteClass, parse_routes
+
+
+def route_class(name, priority, limit=2, budget_ms=50, factor=0.5):
+    return RouteClass(name, priority, initial_limit=limit, min_limit=1, max_limit=10,
+                      latency_target_ms=100, queue_budget_ms=budget_ms, decrease_factor=factor)
+
+
+def controller(cooldown=0.0):
+    return AdmissionController(
+        [route_class("checkout", 0, factor=0.9), route_class("catalog", 2)],
+        parse_routes({"GET /stream": "exempt", "POST /orders*": "checkout", "GET *": "catalog"}),
+        cooldown=cooldown,
+    )
+
+
+def test_requests_are_classified_by_route():
+    admission = controller()
+    assert admission.classify("POST", "/orders/").route_class.name == "checkout"
+    assert admission.classify("GET", "/products/1").route_class.name == "catalog"
+    assert admission.classify("GET", "/stream") is None
+    assert admission.classify("DELETE", "/products/1") is None
+
+
+def test_limits_grow_when_fast_and_shrink_lower_priorities_first():
+    admission = controller()
+    checkout, catalog = admission.limiters["checkout"], admission.limiters["catalog"]
+    admission.record(catalog, latency_ms=10, failed=False)
+    assert catalog.limit == 2.5
+
+    # A slow checkout sheds browsing harder than checkout itself
+    admission.record(checkout, latency_ms=500, failed=False)
+    assert checkout.limit == 1.8
+    assert catalog.limit == 1.25
+
+    # Slow browsing never takes capacity away from checkout
+    admission.record(catalog, latency_ms=0, failed=True)
+    assert catalog.limit == 1
+    assert checkout.limit == 1.8
+
+
+def test_waiters_get_freed_slots_or_are_shed_after_their_budget():
+    async def scenario():
+        limiter = controller(cooldown=60).limiters["catalog"]
+        await limiter.acquire()
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()
+        await waiting
+        assert limiter.in_flight == 2
+
+        try:
+            await limiter.acquire()
+        except Exception as exc:
+            return type(exc).__name__, limiter.metrics()
+
+    rejected, metrics = asyncio.run(scenario())
+    assert rejected == "AdmissionRejected"
+    assert metrics["waiting"] == 0
+    assert (metrics["admitted"], metrics["queued"], metrics["rejected"]) == (3, 2, 1)
+
+
+def test_cancelled_waiters_give_back_a_handed_over_slot():
+    async def scenario():
+        checkout = controller().limiters["checkout"]
+        await checkout.acquire()
+        await checkout.acquire()
+        queued = asyncio.ensure_future(checkout.acquire())
+        waiting = asyncio.ensure_future(checkout.acquire())
+        await asyncio.sleep(0)
+        # The slot goes to the first waiter, whose request is cancelled before it resumes
+        checkout.release()
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        await waiting
+        assert checkout.in_flight == 2
+        assert checkout.metrics()["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_middleware_rejects_with_503_and_retry_after():
+    admission = controller()
+    gate = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def call(middleware):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware({"type": "http", "method": "GET", "path": "/products/"}, None, send)
+        return sent[0]
+
+    async def scenario():
+        middleware = AdmissionMiddleware(app, admission)
+        running = [asyncio.ensure_future(call(middleware)) for _ in range(2)]
+        await asyncio.sleep(0)
+        shed = await call(middleware)
+        gate.set()
+        return shed, [(await task)["status"] for task in running]
+
+    shed, statuses = asyncio.run(scenario())
+    assert shed["status"] == 503
+    assert (b"retry-after", b"1") in shed["headers"]
+    assert statuses == [200, 200]
+
+
+def test_admins_see_admission_metrics(client, auth_headers, admin_auth_headers):
+    client.get("/api/v1/products/", headers=auth_headers)
+    assert client.get("/api/v1/admin/admission", headers=auth_headers).status_code == status.HTTP_403_FORBIDDEN
+    metrics = client.get("/api/v1/admin/admission", headers=admin_auth_headers).json()
+    assert metrics["catalog"]["admitted"] >= 1
+    assert metrics["checkout"]["priority"] < metrics["catalog"]["priority"]
@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+from fastapi import status
+
+from app.services.catalog_snapshot import (
+    CURRENT_FILE,
+    CatalogSnapshot,
+    _locked,
+    rebuild_catalog_snapshot,
+    write_snapshot,
+)
+
+
+def product(product_id, category):
+    return {"id": product_id, "name": f"p{product_id}", "category": category}
+
+
+def test_snapshots_are_versioned_by_content_and_pruned(tmp_path):
+    directory = str(tmp_path)
+    first = write_snapshot(directory, [product(1, "Books"), product(2, None)])
+    assert (tmp_path / CURRENT_FILE).read_text() == first
+    assert json.loads(gzip.decompress((tmp_path / first / "all.json.gz").read_bytes())) == [
+        product(1, "Books"), product(2, None)
+    ]
+    manifest = json.loads((tmp_path / first / "manifest.json").read_text())
+    books = manifest["categories"]["Books"]
+    assert json.loads((tmp_path / first / f"{books}.json").read_text()) == [product(1, "Books")]
+
+    assert write_snapshot(directory, [product(1, "Books"), product(2, None)]) == first
+    versions = [write_snapshot(directory, [product(n, "Books")], keep=2) for n in range(3, 6)]
+    assert sorted(os.listdir(directory)) == sorted([CURRENT_FILE, *versions[-2:]])
+
+
+def test_snapshot_endpoint_serves_files_with_strong_etags(
+    client, auth_headers, admin_auth_headers, test_product, query_budget
+):
+    listed = client.get("/api/v1/products/", headers=auth_headers).json()
+
+    response = client.get("/api/v1/products/snapshot", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == listed
+    etag = response.headers["etag"]
+    assert etag.startswith('"')
+
+    # Only the user lookup of each request
+    with query_budget(2):
+        cached = client.get("/api/v1/products/snapshot", headers={**auth_headers, "If-None-Match": etag})
+        books = client.get(
+            "/api/v1/products/snapshot",
+            params={"category": "Nothing here"},
+            headers={**auth_headers, "Accept-Encoding": "identity"},
+        )
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert books.json() == []
+    assert "content-encoding" not in books.headers
+    refused = client.get(
+        "/api/v1/products/snapshot", headers={**auth_headers, "Accept-Encoding": "gzip;q=0, identity"}
+    )
+    assert "content-encoding" not in refused.headers
+    assert refused.json() == client.get("/api/v1/products/snapshot", headers=auth_headers).json()
+
+    client.put(
+        f"/api/v1/products/{test_product.id}",
+        json={"price": 12.5},
+        headers=admin_auth_headers,
+    )
+    # Change events arrive through the job runner; then the debounced job rebuilds
+    deadline = time.monotonic() + 2
+    while True:
+        rebuild_catalog_snapshot()
+        response = client.get("/api/v1/products/snapshot", headers=auth_headers)
+        if response.headers["etag"] != etag or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert response.headers["etag"] != etag
+    response = client.get(
+        "/api/v1/products/snapshot", params={"category": test_product.category}, headers=auth_headers
+    )
+    assert [row["price"] for row in response.json()] == [12.5]
+
+
+def test_workers_sharing_a_directory_never_lose_the_current_version(tmp_path):
+    directory = str(tmp_path)
+    errors = []
+
+    def build(worker):
+        try:
+            for n in range(20):
+                with _locked(directory):
+                    write_snapshot(directory, [product(worker * 100 + n, "Books")], keep=1)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=build, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    current = (tmp_path / CURRENT_FILE).read_text()
+    assert sorted(name for name in os.listdir(directory) if not name.startswith(".")) == sorted([CURRENT_FILE, current])
+
+
+def test_a_worker_follows_a_build_that_covers_its_changes(tmp_path, db_session, test_product, query_budget):
+    first, second = CatalogSnapshot(str(tmp_path)), CatalogSnapshot(str(tmp_path))
+    first.mark_dirty([])
+    version = second.rebuild(db_session)
+
+    # Built after first's change was committed, so first only re-reads CURRENT
+    with query_budget(0):
+        assert first.rebuild(db_session) == version
+    assert not first.due()
+
+    second.mark_dirty([])
+    time.sleep(0.01)
+    first.mark_dirty([])
+    with query_budget(1) as queries:
+        first.rebuild(db_session)
+    assert queries.total == 1
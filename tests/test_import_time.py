@@ -0,0 +1,68 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import budgets in microseconds. They sit at roughly three to
+# four times the measured cost so that slow CI machines don't flake, while
+# pulling FastAPI, passlib or engine creation back into these paths fails.
+IMPORT_BUDGETS_US = {
+    "app.models": 1_000_000,
+    "app.main": 1_500_000,
+}
+
+# Modules that must not be imported as a side effect of the target import
+FORBIDDEN_IMPORTS = {
+    "app.models": ["fastapi", "passlib", "jose", "pydantic_settings", "app.core.config"],
+    "app.main": ["passlib", "jose", "app.api.v1.router", "app.crud.order"],
+}
+
+
+def import_profile(code):
+    """Run ``code`` in a fresh interpreter and parse its -X importtime output."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if cumulative_us.strip().isdigit():
+            cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS_US))
+def test_import_time_budget(module):
+    """Importing the module stays within its cumulative time budget."""
+    profile = import_profile(f"import {module}")
+
+    assert profile[module] <= IMPORT_BUDGETS_US[module], (
+        f"import {module} took {profile[module] / 1000:.0f} ms, "
+        f"budget is {IMPORT_BUDGETS_US[module] / 1000:.0f} ms"
+    )
+    leaked = [name for name in FORBIDDEN_IMPORTS[module] if name in profile]
+    assert not leaked, f"import {module} pulled in {leaked}"
+
+
+def test_create_app_defers_engine_and_password_hashing():
+    """Building the app creates neither the engine nor the bcrypt context."""
+    code = (
+        "import sys\n"
+        "from app.main import create_app\n"
+        "from app.db import base\n"
+        "from app.core.security import get_pwd_context\n"
+        "create_app()\n"
+        "assert base._engine is None\n"
+        "assert get_pwd_context.cache_info().currsize == 0\n"
+        "assert 'passlib' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import status
+
+from app.core.jobs import JobQueueFull, JobRunner, RetryPolicy
+from app.services import catalog_events
+
+
+def test_jobs_run_in_background_and_drain_on_stop():
+    """Queued jobs finish before stop() returns."""
+    done = []
+
+    async def scenario():
+        runner = JobRunner(workers=2, queue_size=10)
+        await runner.start()
+        for i in range(5):
+            runner.enqueue(done.append, i)
+        await runner.stop(timeout=5)
+        return runner.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    assert metrics["completed"] == 5
+    assert metrics["pending"] == 0
+    assert metrics["latency_ms"]["max"] >= 0
+
+
+def test_full_queue_rejects_immediately():
+    """Enqueue never blocks; it raises once the queue is at capacity."""
+    release = threading.Event()
+
+    async def scenario():
+        runner = JobRunner(workers=1, queue_size=2)
+        await runner.start()
+        runner.enqueue(release.wait, 5)
+        runner.enqueue(release.wait, 5)
+        with pytest.raises(JobQueueFull):
+            runner.enqueue(release.wait, 5)
+        release.set()
+        await runner.stop(timeout=5)
+        return runner.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["rejected"] == 1
+    assert metrics["completed"] == 2
+
+
+def test_failing_job_is_retried():
+    """A job that fails transiently is retried per the policy."""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("transient")
+
+    async def scenario():
+        runner = JobRunner(workers=1, retry=RetryPolicy(max_attempts=3, backoff=0.01))
+        await runner.start()
+        runner.enqueue(flaky)
+        await runner.stop(timeout=5)
+        return runner.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert len(attempts) == 3
+    assert metrics["retried"] == 2
+    assert metrics["completed"] == 1
+    assert metrics["failed"] == 0
+
+
+def test_scheduled_job_repeats_until_stop():
+    """every() enqueues the job on an interval and stops with the runner."""
+    ticks = []
+
+    async def scenario():
+        runner = JobRunner(workers=1)
+        await runner.start()
+        runner.every(0.01, ticks.append, 1)
+        await asyncio.sleep(0.1)
+        await runner.stop(timeout=5)
+        count = len(ticks)
+        await asyncio.sleep(0.05)
+        return count
+
+    count = asyncio.run(scenario())
+    assert count >= 3
+    assert len(ticks) == count
+
+
+def test_order_publishes_stock_change(client, auth_headers, test_product):
+    """Creating an order fans out the new stock level through the job runner."""
+    received = threading.Event()
+    changes = []
+
+    def listener(batch):
+        changes.extend(batch)
+        received.set()
+
+    catalog_events.subscribe(listener)
+    try:
+        response = client.post(
+            "/api/v1/orders/",
+            json={"items": [{"product_id": test_product.id, "quantity": 3}]},
+            headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert received.wait(5)
+    finally:
+        catalog_events.unsubscribe(listener)
+
+    assert changes[0]["id"] == test_product.id
+    assert changes[0]["stock_quantity"] == test_product.stock_quantity - 3
+
+
+def test_stale_product_changes_are_dropped():
+    """Batches published out of commit order never roll a product back."""
+    def change(product_id, version, stock, deleted=False):
+        return {"id": product_id, "stock_quantity": stock, "version": version, "deleted": deleted}
+
+    catalog_events.reset()
+    received = []
+    catalog_events.subscribe(received.append)
+    try:
+        catalog_events.publish_product_changes([change(1, 3, 7), change(2, 1, 5)])
+        # Version 2 of product 1 lost the race to the job worker
+        catalog_events.publish_product_changes([change(1, 2, 9)])
+        catalog_events.publish_product_changes([change(1, 2, 9), change(2, 2, 4)])
+        catalog_events.publish_product_changes([change(1, 3, 7, deleted=True)])
+    finally:
+        catalog_events.unsubscribe(received.append)
+        catalog_events.reset()
+
+    assert received == [
+        [change(1, 3, 7), change(2, 1, 5)],
+        [change(2, 2, 4)],
+        [change(1, 3, 7, deleted=True)],
+    ]
+
+
+def test_job_metrics_admin_only(client, auth_headers, admin_auth_headers):
+    """Job metrics are exposed to admins only."""
+    assert client.get("/api/v1/admin/jobs", headers=auth_headers).status_code == 403
+
+    response = client.get("/api/v1/admin/jobs", headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["running"] is True
+    assert "queue_depth" in response.json()
@@ -0,0 +1,152 @@
+import time
+
+from fastapi import status
+
+from app.models.sales import ProductSalesHourly
+from app.services.leaderboard import Leaderboard
+
+HOUR = 3600
+
+
+class Clock:
+    def __init__(self, now=1_000 * HOUR):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_windows_slide_and_expire_old_sales():
+    clock = Clock()
+    board = Leaderboard(clock=clock)
+    board.record([(1, "Books", 5), (2, "Games", 3)])
+    clock.now += 2 * HOUR
+    board.record([(2, "Games", 4), (3, "Books", 1)])
+
+    assert board.top("day") == [
+        {"product_id": 2, "category": "Games", "units": 7},
+        {"product_id": 1, "category": "Books", "units": 5},
+        {"product_id": 3, "category": "Books", "units": 1},
+    ]
+    assert [row["product_id"] for row in board.top("day", "Books")] == [1, 3]
+    assert board.top("day", limit=1)[0]["product_id"] == 2
+
+    # The first hour leaves the day window but stays in the week
+    clock.now += 23 * HOUR
+    assert board.top("day") == [
+        {"product_id": 2, "category": "Games", "units": 4},
+        {"product_id": 3, "category": "Books", "units": 1},
+    ]
+    assert board.top("week")[0] == {"product_id": 2, "category": "Games", "units": 7}
+
+    clock.now += 8 * 24 * HOUR
+    assert board.top("week") == []
+    assert board.top("day", "Books") == []
+
+
+def test_flush_and_reload_merge_workers(db_session):
+    clock = Clock()
+    first, second = Leaderboard(clock=clock), Leaderboard(clock=clock)
+    first.record([(1, "Books", 2)])
+    second.record([(1, "Books", 3), (2, "Games", 1)])
+
+    assert first.flush(db_session) == 1
+    assert second.flush(db_session) == 2
+    assert first.pending == 0
+    assert db_session.get(ProductSalesHourly, (1000, 1)).units == 5
+
+    first.record([(2, "Games", 1)])  # Not flushed yet, survives the reload
+    first.reload(db_session)
+    assert first.top("week") == [
+        {"product_id": 1, "category": "Books", "units": 5},
+        {"product_id": 2, "category": "Games", "units": 2},
+    ]
+
+
+def test_best_sellers_endpoint_counts_placed_orders(client, auth_headers, test_product):
+    response = client.get("/api/v1/products/best-sellers", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"window": "day", "category": None, "products": []}
+
+    for quantity in (2, 3):
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"product_id": test_product.id, "quantity": quantity}]},
+            headers=auth_headers,
+        )
+
+    expected = [{"product_id": test_product.id, "category": test_product.category, "units": 5}]
+    deadline = time.monotonic() + 2
+    while True:
+        response = client.get(
+            "/api/v1/products/best-sellers",
+            params={"window": "week", "category": test_product.category},
+            headers=auth_headers,
+        )
+        if response.json()["products"] == expected or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert response.json()["products"] == expected
+
+    assert client.get(
+        "/api/v1/products/best-sellers", params={"window": "year"}, headers=auth_headers
+    ).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_returns_come_out_of_the_hour_the_sale_was_made():
+    clock = Clock()
+    board = Leaderboard(clock=clock)
+    placed_at = clock.now
+    board.record([(1, "Books", 5), (2, "Games", 3)])
+    clock.now += 23 * HOUR
+    board.take_back([(placed_at, 1, "Books", 2)])
+
+    assert board.top("day") == [
+        {"product_id": 1, "category": "Books", "units": 3},
+        {"product_id": 2, "category": "Games", "units": 3},
+    ]
+    # Leaving the day window takes only what is left of the sale with it
+    clock.now += HOUR
+    assert board.top("day") == []
+    assert board.top("week")[0]["units"] == 3
+    # Returns older than the longest window are ignored
+    board.take_back([(placed_at - 8 * 24 * HOUR, 2, "Games", 3)])
+    assert board.top("week")[1]["units"] == 3
+
+
+def test_recategorized_products_keep_one_row_per_hour(db_session):
+    clock = Clock()
+    board = Leaderboard(clock=clock)
+    board.record([(1, "Books", 2)])
+    board.record([(1, "Comics", 3)])
+    # The product's current category is no help; the sale's bucket knows better
+    board.take_back([(clock.now, 1, "Manga", 1)])
+
+    assert board.top("day", "Comics") == [{"product_id": 1, "category": "Comics", "units": 4}]
+    assert board.top("day", "Books") == []
+    assert board.top("day", "Manga") == []
+    assert board.flush(db_session) == 1
+    row = db_session.get(ProductSalesHourly, (1000, 1))
+    assert (row.category, row.units) == ("Comics", 4)
+
+
+def test_cancelled_orders_leave_the_best_sellers(client, auth_headers, test_product):
+    order_ids = [
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"product_id": test_product.id, "quantity": quantity}]},
+            headers=auth_headers,
+        ).json()["id"]
+        for quantity in (2, 3)
+    ]
+    response = client.post(f"/api/v1/orders/{order_ids[1]}/status", json={"status": "cancelled"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    expected = [{"product_id": test_product.id, "category": test_product.category, "units": 2}]
+    deadline = time.monotonic() + 2
+    while True:
+        response = client.get("/api/v1/products/best-sellers", headers=auth_headers)
+        if response.json()["products"] == expected or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert response.json()["products"] == expected
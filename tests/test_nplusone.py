@@ -0,0 +1,64 @@
+import pytest
+from fastapi import Depends, FastAPI, status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.db.base import get_db
+from app.db.nplusone import NPlusOneError, NPlusOneMiddleware, record_queries
+from app.models.order import Order, OrderItem
+
+
+@pytest.fixture
+def orders(db_session, test_user, test_product):
+    for quantity in range(1, 7):
+        order = Order(user_id=test_user.id, total_amount=test_product.price * quantity)
+        db_session.add(order)
+        db_session.flush()
+        db_session.add(OrderItem(
+            order_id=order.id, product_id=test_product.id,
+            quantity=quantity, price_at_purchase=test_product.price,
+        ))
+    db_session.commit()
+    db_session.expunge_all()
+
+
+def test_lazy_loads_in_a_loop_are_reported_with_relationship_and_call_site(db_session, orders):
+    with record_queries() as recorder:
+        for order in db_session.query(Order).all():
+            order.items
+    (repeated,) = recorder.repeated(threshold=5)
+    assert repeated.count == 6
+    assert repeated.relationship == "Order.items"
+    assert "test_nplusone.py" in repeated.call_site
+    assert "FROM order_items" in repeated.statement
+    assert recorder.total == 7
+
+
+def test_middleware_fails_requests_over_the_threshold(db_session, orders):
+    api = FastAPI()
+
+    @api.get("/quantities")
+    def quantities(db: Session = Depends(get_db)):
+        return [item.quantity for order in db.query(Order).all() for item in order.items]
+
+    api.dependency_overrides[get_db] = lambda: db_session
+    api.add_middleware(NPlusOneMiddleware, threshold=5, raise_errors=True)
+    with pytest.raises(NPlusOneError, match="6 x lazy load of Order.items"):
+        TestClient(api).get("/quantities")
+
+    api.user_middleware.clear()
+    api.middleware_stack = None
+    api.add_middleware(NPlusOneMiddleware, threshold=6, raise_errors=True)
+    assert TestClient(api).get("/quantities").json() == [1, 2, 3, 4, 5, 6]
+
+
+def test_order_listing_stays_within_its_query_budget(client, auth_headers, orders, query_budget):
+    with query_budget(4) as recorder:
+        response = client.get("/api/v1/orders/", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 6
+    assert recorder.total > 0
+
+    with pytest.raises(AssertionError, match="Query budget of 0 exceeded"):
+        with query_budget(0):
+            client.get("/api/v1/orders/", headers=auth_headers)
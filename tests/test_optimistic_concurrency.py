@@ -0,0 +1,82 @@
+import pytest
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.db.optimistic import retry_stale
+from app.models.product import Product
+
+
+def test_update_with_if_match(client, admin_auth_headers, test_product):
+    url = f"/api/v1/products/{test_product.id}"
+    response = client.get(url, headers=admin_auth_headers)
+    assert response.headers["ETag"] == '"1"'
+    assert response.json()["version"] == 1
+
+    response = client.put(url, json={"price": 10.0}, headers={**admin_auth_headers, "If-Match": '"1"'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] == '"2"'
+    assert response.json()["version"] == 2
+
+    # A second edit based on the same read is refused rather than applied
+    response = client.put(url, json={"price": 20.0}, headers={**admin_auth_headers, "If-Match": '"1"'})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert response.headers["ETag"] == '"2"'
+    # Weak tags never satisfy If-Match
+    response = client.put(url, json={"price": 20.0}, headers={**admin_auth_headers, "If-Match": 'W/"2"'})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert client.get(url, headers=admin_auth_headers).json()["price"] == 10.0
+
+    # Without If-Match the update applies to whatever version is current
+    response = client.put(url, json={"price": 30.0}, headers=admin_auth_headers)
+    assert response.json()["price"] == 30.0
+    assert response.json()["version"] == 3
+
+
+def test_stale_flush_is_detected(db_session, test_product):
+    product = db_session.get(Product, test_product.id)
+    # Another writer updates the row after we read it
+    db_session.execute(text("UPDATE products SET price = 1, version = version + 1 WHERE id = :id"), {"id": product.id})
+    product.price = 2.0
+    with pytest.raises(StaleDataError):
+        db_session.flush()
+    db_session.rollback()
+
+
+def test_retry_stale_reruns_with_backoff(db_session):
+    calls, delays = [], []
+
+    def operation():
+        calls.append(1)
+        if len(calls) < 3:
+            raise StaleDataError("lost the race")
+        return "done"
+
+    assert retry_stale(db_session, operation, attempts=3, backoff=0.1, sleep=delays.append) == "done"
+    assert len(calls) == 3
+    assert 0 <= delays[0] <= 0.1 and 0 <= delays[1] <= 0.2
+
+    def always_stale():
+        raise StaleDataError("lost the race")
+
+    with pytest.raises(StaleDataError):
+        retry_stale(db_session, always_stale, attempts=2, sleep=delays.append)
+
+
+def test_set_based_writes_bump_version(client, admin_auth_headers, auth_headers, test_product):
+    url = f"/api/v1/products/{test_product.id}"
+    response = client.patch(
+        "/api/v1/products/bulk",
+        json={"items": [{"id": test_product.id, "price": 5.0}]},
+        headers=admin_auth_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert client.get(url, headers=auth_headers).json()["version"] == 2
+
+    response = client.post(
+        "/api/v1/orders/",
+        json={"items": [{"product_id": test_product.id, "quantity": 1}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert client.get(url, headers=auth_headers).json()["version"] == 3
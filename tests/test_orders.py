@@ -138,3 +138,281 @@ def test_get_order_summary(client, auth_headers, test_product):
     assert "order_id" in data[0]
     assert "user_email" in data[0]
     assert "item_count" in data[0]
+
+
+def test_list_orders_sparse_fields(client, auth_headers, test_product):
+    """Order listings honour sparse fieldsets, including nested items."""
+    order_data = {
+        "items": [
+            {
+                "product_id": test_product.id,
+                "quantity": 2
+            }
+        ]
+    }
+    order_id = client.post("/api/v1/orders/", json=order_data, headers=auth_headers).json()["id"]
+    
+    response = client.get("/api/v1/orders/?fields=status,items", headers=auth_headers)
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert set(data[0]) == {"id", "status", "items"}
+    assert data[0]["id"] == order_id
+    assert data[0]["status"] == "pending"
+    assert data[0]["items"][0]["quantity"] == 2
+    
+    response = client.get(f"/api/v1/orders/{order_id}?fields=total_amount", headers=auth_headers)
+    assert response.json() == {"id": order_id, "total_amount": test_product.price * 2}
+
+
+def test_list_orders_filters_and_total_count(client, auth_headers, admin_auth_headers, test_product):
+    """Orders can be filtered by status, date range and user, with a total count."""
+    order_data = {
+        "items": [
+            {
+                "product_id": test_product.id,
+                "quantity": 1
+            }
+        ]
+    }
+    for _ in range(3):
+        client.post("/api/v1/orders/", json=order_data, headers=auth_headers)
+    
+    response = client.get("/api/v1/orders/?status=pending&limit=2", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
+    assert response.headers["x-total-count"] == "3"
+    assert response.headers["x-total-count-estimated"] == "false"
+    
+    response = client.get("/api/v1/orders/?status=shipped", headers=auth_headers)
+    assert response.json() == []
+    assert response.headers["x-total-count"] == "0"
+    
+    response = client.get(
+        "/api/v1/orders/?created_from=2999-01-01T00:00:00",
+        headers=admin_auth_headers
+    )
+    assert response.json() == []
+    
+    user_id = client.get("/api/v1/orders/", headers=auth_headers).json()[0]["user_id"]
+    response = client.get(f"/api/v1/orders/?user_id={user_id}", headers=admin_auth_headers)
+    assert response.headers["x-total-count"] == "3"
+
+
+def test_list_orders_other_user_forbidden(client, auth_headers):
+    """Regular users cannot list another user's orders."""
+    response = client.get("/api/v1/orders/?user_id=9999", headers=auth_headers)
+    
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_large_order_count_is_estimated(client, auth_headers, test_product, monkeypatch):
+    """Past the exact-count threshold the total is an estimate unless asked."""
+    from app.core.config import get_settings
+    
+    monkeypatch.setattr(get_settings(), "ORDER_COUNT_EXACT_THRESHOLD", 1)
+    order_data = {
+        "items": [
+            {
+                "product_id": test_product.id,
+                "quantity": 1
+            }
+        ]
+    }
+    for _ in range(3):
+        client.post("/api/v1/orders/", json=order_data, headers=auth_headers)
+    
+    response = client.get("/api/v1/orders/", headers=auth_headers)
+    assert response.headers["x-total-count-estimated"] == "true"
+    assert int(response.headers["x-total-count"]) >= 2
+    
+    response = client.get("/api/v1/orders/?exact_count=true", headers=auth_headers)
+    assert response.headers["x-total-count-estimated"] == "false"
+    assert response.headers["x-total-count"] == "3"
+
+
+def _create_products(db_session, count):
+    from app.models.product import Product
+    
+    products = [
+        Product(name=f"Product {i}", price=5.0 + i, stock_quantity=50, category="Bulk")
+        for i in range(count)
+    ]
+    db_session.add_all(products)
+    db_session.commit()
+    return [p.id for p in products]
+
+
+def test_create_order_loads_products_in_one_query(client, db_session, auth_headers):
+    """Products for every order item are fetched with a single IN query."""
+    from tests.test_query_plans import capture_selects
+    
+    product_ids = _create_products(db_session, 6)
+    items = [{"product_id": product_id, "quantity": 1} for product_id in product_ids]
+    items.append({"product_id": product_ids[0], "quantity": 2})
+    
+    with capture_selects() as statements:
+        response = client.post("/api/v1/orders/", json={"items": items}, headers=auth_headers)
+    
+    assert response.status_code == status.HTTP_201_CREATED
+    product_queries = [s for s, _ in statements if "FROM products" in s]
+    assert len(product_queries) == 1
+    response = client.get(f"/api/v1/products/{product_ids[0]}", headers=auth_headers)
+    assert response.json()["stock_quantity"] == 47
+
+
+def test_expand_product_costs_constant_queries(client, db_session, auth_headers):
+    """expand=product embeds product details without a query per item."""
+    from tests.test_query_plans import capture_selects
+    
+    product_ids = _create_products(db_session, 8)
+    for chunk in (product_ids[:1], product_ids):
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"product_id": product_id, "quantity": 1} for product_id in chunk]},
+            headers=auth_headers
+        )
+    
+    query_counts = []
+    for order_id in (1, 2):
+        with capture_selects() as statements:
+            response = client.get(f"/api/v1/orders/{order_id}?expand=product", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        query_counts.append(len(statements))
+    assert query_counts[0] == query_counts[1]
+    
+    items = response.json()["items"]
+    assert len(items) == 8
+    assert items[0]["product"] == {
+        "id": product_ids[0], "name": "Product 0", "category": "Bulk", "price": 5.0
+    }
+    
+    with capture_selects() as statements:
+        response = client.get("/api/v1/orders/?expand=product,user", headers=auth_headers)
+    orders = response.json()
+    assert len(orders) == 2
+    assert orders[0]["user"]["username"] == "testuser"
+    assert all(item["product"]["name"].startswith("Product") for o in orders for item in o["items"])
+    assert len([s for s, _ in statements if "FROM products" in s]) == 1
+    assert len([s for s, _ in statements if "FROM users" in s]) == 2  # auth + expansion
+
+
+def test_expand_product_loads_items_missing_from_fields(client, db_session, auth_headers):
+    product_ids = _create_products(db_session, 2)
+    client.post(
+        "/api/v1/orders/",
+        json={"items": [{"product_id": product_id, "quantity": 1} for product_id in product_ids]},
+        headers=auth_headers
+    )
+    
+    for url in ("/api/v1/orders/?fields=id&expand=product", "/api/v1/orders/1?fields=id&expand=product"):
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        order = response.json()[0] if isinstance(response.json(), list) else response.json()
+        assert set(order) == {"id", "items"}
+        assert [item["product"]["id"] for item in order["items"]] == product_ids
+
+
+def test_expand_rejects_unknown_relations(client, auth_headers):
+    response = client.get("/api/v1/orders/?expand=warehouse", headers=auth_headers)
+    
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def _place_orders(client, headers, product_id, count):
+    return [
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"product_id": product_id, "quantity": 2}]},
+            headers=headers
+        ).json()["id"]
+        for _ in range(count)
+    ]
+
+
+def test_batch_status_transition_reports_failures(client, auth_headers, admin_auth_headers, test_product):
+    """Only orders in an allowed source status move; the rest are reported."""
+    order_ids = _place_orders(client, auth_headers, test_product.id, 3)
+    
+    response = client.post(
+        "/api/v1/orders/status",
+        json={"order_ids": order_ids[:2], "status": "processing"},
+        headers=admin_auth_headers
+    )
+    assert response.json() == {"status": "processing", "updated_ids": order_ids[:2], "failed_ids": []}
+    
+    # PENDING -> SHIPPED is not allowed, and 9999 does not exist
+    response = client.post(
+        "/api/v1/orders/status",
+        json={"order_ids": [*order_ids, 9999], "status": "shipped"},
+        headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["updated_ids"] == order_ids[:2]
+    assert response.json()["failed_ids"] == [order_ids[2], 9999]
+    
+    response = client.get(f"/api/v1/orders/{order_ids[0]}", headers=auth_headers)
+    assert response.json()["status"] == "shipped"
+    
+    response = client.post(
+        "/api/v1/orders/status",
+        json={"order_ids": order_ids, "status": "processing"},
+        headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_cancel_restocks_with_one_aggregated_update(client, auth_headers, admin_auth_headers, test_product):
+    """Cancelling returns every item to stock in a single UPDATE."""
+    from sqlalchemy import event
+    from tests.conftest import engine
+    
+    stock = test_product.stock_quantity
+    product_id = test_product.id
+    order_ids = _place_orders(client, auth_headers, product_id, 3)
+    updates = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE PRODUCTS"):
+            updates.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post(
+            "/api/v1/orders/status",
+            json={"order_ids": order_ids, "status": "cancelled"},
+            headers=admin_auth_headers
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    assert response.json()["updated_ids"] == order_ids
+    assert len(updates) == 1
+    product = client.get(f"/api/v1/products/{product_id}", headers=auth_headers).json()
+    assert product["stock_quantity"] == stock
+    
+    # A cancelled order cannot be cancelled (and restocked) again
+    response = client.post(
+        f"/api/v1/orders/{order_ids[0]}/status", json={"status": "cancelled"}, headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_customer_can_only_cancel_own_order(client, auth_headers, admin_auth_headers, test_product):
+    order_id = _place_orders(client, auth_headers, test_product.id, 1)[0]
+    
+    response = client.post(
+        f"/api/v1/orders/{order_id}/status", json={"status": "shipped"}, headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    response = client.post(
+        f"/api/v1/orders/{order_id}/status", json={"status": "cancelled"}, headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "cancelled"
+    
+    response = client.post(
+        "/api/v1/orders/9999/status", json={"status": "processing"}, headers=admin_auth_headers
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,156 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+
+from app.models.outbox import OutboxEvent
+from app.services.outbox import FileSink, OutboxDispatcher
+from tests.conftest import TestingSessionLocal
+
+
+class RecordingSink:
+    """In-memory stand-in for an HTTP webhook."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def send(self, events):
+        if self.fail:
+            raise ConnectionError("downstream unavailable")
+        self.batches.append(events)
+
+
+def place_order(client, headers, product_id, quantity=1):
+    return client.post(
+        "/api/v1/orders/",
+        json={"items": [{"product_id": product_id, "quantity": quantity}]},
+        headers=headers
+    )
+
+
+def test_create_order_writes_outbox_event(client, db_session, auth_headers, test_product):
+    """Creating an order records an order.created event in the same transaction."""
+    response = place_order(client, auth_headers, test_product.id, quantity=2)
+    assert response.status_code == status.HTTP_201_CREATED
+    order_id = response.json()["id"]
+
+    event = db_session.query(OutboxEvent).one()
+    assert event.event_type == "order.created"
+    assert event.aggregate_id == order_id
+    assert event.payload["items"][0]["quantity"] == 2
+    assert event.dispatched_at is None
+
+
+def test_failed_order_writes_no_outbox_event(client, db_session, auth_headers, test_product):
+    """A rejected order leaves no event behind."""
+    response = place_order(client, auth_headers, test_product.id, quantity=1000)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    assert db_session.query(OutboxEvent).count() == 0
+
+
+def test_dispatcher_delivers_in_batches(db_session):
+    """Pending events are delivered batch by batch and marked dispatched."""
+    for order_id in range(1, 6):
+        db_session.add(OutboxEvent(
+            event_type="order.created", aggregate_id=order_id, payload={"order_id": order_id}
+        ))
+    db_session.commit()
+
+    sink = RecordingSink()
+    dispatcher = OutboxDispatcher(TestingSessionLocal, [sink], batch_size=2)
+
+    assert dispatcher.run_once() == 5
+    assert [len(batch) for batch in sink.batches] == [2, 2, 1]
+    assert [e["aggregate_id"] for batch in sink.batches for e in batch] == [1, 2, 3, 4, 5]
+
+    db_session.expire_all()
+    assert db_session.query(OutboxEvent).filter(OutboxEvent.dispatched_at.is_(None)).count() == 0
+    assert dispatcher.run_once() == 0
+
+
+def test_dispatcher_retries_with_backoff(db_session):
+    """A failing sink leaves events pending and pushes them into the future."""
+    db_session.add(OutboxEvent(event_type="order.created", aggregate_id=1, payload={}))
+    db_session.commit()
+
+    dispatcher = OutboxDispatcher(
+        TestingSessionLocal, [RecordingSink(fail=True)], retry_backoff=30
+    )
+    before = datetime.utcnow()
+    assert dispatcher.run_once() == 1
+
+    db_session.expire_all()
+    event = db_session.query(OutboxEvent).one()
+    assert event.attempts == 1
+    assert event.dispatched_at is None
+    assert "downstream unavailable" in event.last_error
+    assert event.available_at.replace(tzinfo=None) >= before + timedelta(seconds=29)
+
+    # Not yet due, so nothing is claimed
+    assert dispatcher.run_once() == 0
+    assert dispatcher.backoff(3) == timedelta(seconds=120)
+
+
+def test_sinks_run_outside_the_claiming_transaction(db_session):
+    """Claimed events are leased and committed before any network I/O."""
+    db_session.add(OutboxEvent(event_type="order.created", aggregate_id=1, payload={}))
+    db_session.commit()
+    sessions = []
+
+    def session_factory():
+        sessions.append(TestingSessionLocal())
+        return sessions[-1]
+
+    class CheckingSink(RecordingSink):
+        def send(self, events):
+            assert not sessions[-1].in_transaction()
+            with TestingSessionLocal() as other:
+                leased = other.query(OutboxEvent).one()
+                assert leased.dispatched_at is None
+                assert leased.available_at.replace(tzinfo=None) >= datetime.utcnow() + timedelta(seconds=59)
+            super().send(events)
+
+    sink = CheckingSink()
+    dispatcher = OutboxDispatcher(session_factory, [sink], lease=60)
+    assert dispatcher.run_once() == 1
+    assert len(sink.batches) == 1
+    db_session.expire_all()
+    assert db_session.query(OutboxEvent).one().dispatched_at is not None
+
+
+def test_exhausted_events_are_set_aside(db_session, caplog):
+    """An event that keeps failing is marked failed and logged, not silently dropped."""
+    db_session.add(OutboxEvent(event_type="order.created", aggregate_id=1, payload={}))
+    db_session.commit()
+
+    dispatcher = OutboxDispatcher(
+        TestingSessionLocal, [RecordingSink(fail=True)], max_attempts=2, retry_backoff=0
+    )
+    assert dispatcher.run_once() == 1
+    db_session.expire_all()
+    assert db_session.query(OutboxEvent).one().failed_at is None
+
+    with caplog.at_level("ERROR", logger="app.services.outbox"):
+        assert dispatcher.run_once() == 1
+    db_session.expire_all()
+    event = db_session.query(OutboxEvent).one()
+    assert (event.attempts, event.dispatched_at) == (2, None)
+    assert event.failed_at is not None
+    assert "will not be retried" in caplog.text
+
+    dispatcher.sinks = [RecordingSink()]
+    assert dispatcher.run_once() == 0
+
+
+def test_file_sink_appends_ndjson(tmp_path):
+    """The file sink writes one JSON document per line."""
+    path = tmp_path / "outbox.ndjson"
+    sink = FileSink(str(path))
+    sink.send([{"id": 1}, {"id": 2}])
+    sink.send([{"id": 3}])
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3]
@@ -0,0 +1,174 @@
+import gzip
+import json
+import os
+from datetime import date
+
+import pytest
+
+from app.cli import build_parser
+from app.db.partitions import (
+    add_months,
+    create_partition_sql,
+    ensure_partitions,
+    iter_months,
+    parse_partition_month,
+    partition_name,
+)
+from app.models.order import Order, OrderItem, OrderStatus
+from app.services import order_archive
+from app.services.order_archive import archive_partitions, export_table
+from tests.conftest import engine
+
+
+def test_month_arithmetic_wraps_years():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert list(iter_months(date(2026, 11, 15), date(2027, 1, 1))) == [
+        date(2026, 11, 1), date(2026, 12, 1), date(2027, 1, 1)
+    ]
+
+
+def test_partition_names_round_trip():
+    name = partition_name("order_items", date(2026, 3, 1))
+    assert name == "order_items_y2026m03"
+    assert parse_partition_month(name) == date(2026, 3, 1)
+    assert parse_partition_month("orders_default") is None
+    assert parse_partition_month("products_y2026m03") is None
+
+
+def test_create_partition_sql_covers_one_month():
+    sql = create_partition_sql("orders", date(2026, 12, 1))
+    assert sql == (
+        "CREATE TABLE IF NOT EXISTS orders_y2026m12 PARTITION OF orders "
+        "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')"
+    )
+
+
+def test_partition_maintenance_is_a_noop_without_postgres(db_session):
+    with engine.connect() as conn:
+        assert ensure_partitions(conn) == []
+    with pytest.raises(RuntimeError):
+        archive_partitions(engine, date(2026, 1, 1), "/tmp/unused")
+
+
+def test_export_table_streams_gzip_ndjson(db_session, test_user, test_product, tmp_path):
+    """Rows are streamed in batches into a gzip NDJSON file."""
+    for i in range(5):
+        order = Order(user_id=test_user.id, total_amount=10.0 + i, status=OrderStatus.PENDING)
+        order.items.append(OrderItem(product_id=test_product.id, quantity=1, price_at_purchase=10.0))
+        db_session.add(order)
+    db_session.commit()
+
+    with engine.connect() as conn:
+        result = export_table(conn, "orders", str(tmp_path), batch_size=2)
+
+    assert result.rows == 5
+    assert result.path == str(tmp_path / "orders.ndjson.gz")
+    assert not list(tmp_path.glob("*.partial"))
+    with gzip.open(result.path, "rt") as archive:
+        rows = [json.loads(line) for line in archive]
+    assert [row["total_amount"] for row in rows] == [10.0, 11.0, 12.0, 13.0, 14.0]
+    assert rows[0]["user_id"] == test_user.id
+    assert rows[0]["status"] == "PENDING"
+
+
+def test_archive_command_parses_month():
+    args = build_parser().parse_args(
+        ["archive-orders", "--before", "2026-01", "--output-dir", "/archive", "--drop"]
+    )
+    assert args.before == date(2026, 1, 1)
+    assert args.format == "ndjson"
+    assert args.drop is True
+
+
+def test_archive_refuses_months_that_are_not_over(tmp_path):
+    """Archiving up to a future month would detach and drop live partitions."""
+    with pytest.raises(RuntimeError, match="not over yet"):
+        archive_partitions(engine, date(2027, 1, 1), str(tmp_path), drop=True, today=date(2026, 10, 19))
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.fixture
+def pg():
+    """Partitioned orders tables, two months of rows, in a scratch schema."""
+    from sqlalchemy import create_engine, text
+
+    schema = "archive_test"
+    admin = create_engine(os.environ["TEST_POSTGRES_URL"])
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    pg = create_engine(
+        os.environ["TEST_POSTGRES_URL"], connect_args={"options": f"-csearch_path={schema}"}
+    )
+    try:
+        with pg.begin() as conn:
+            for table in ("orders", "order_items"):
+                conn.execute(text(
+                    f"CREATE TABLE {table} (id integer, created_at timestamptz NOT NULL) "
+                    "PARTITION BY RANGE (created_at)"
+                ))
+                conn.execute(text(create_partition_sql(table, date(2025, 1, 1))))
+                conn.execute(text(create_partition_sql(table, date(2025, 2, 1))))
+            conn.execute(text("INSERT INTO orders VALUES (1, '2025-01-10'), (2, '2025-01-20'), (3, '2025-02-01')"))
+            conn.execute(text("INSERT INTO order_items VALUES (1, '2025-01-10')"))
+        yield pg
+    finally:
+        pg.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        admin.dispose()
+
+
+needs_postgres = pytest.mark.skipif(
+    not os.environ.get("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL (a scratch PostgreSQL database)"
+)
+
+
+@needs_postgres
+def test_partitions_are_detached_before_export_and_dropped_after(pg, tmp_path, monkeypatch):
+    """A month is cut off from writes before it is exported, so the archive holds every row dropped."""
+    from sqlalchemy import text
+    from app.db.partitions import list_partitions
+
+    exported = []
+    export = order_archive.export_table
+
+    def export_detached(conn, table, *args, **kwargs):
+        with pg.connect() as check:
+            attached = list_partitions(check, "orders") + list_partitions(check, "order_items")
+        assert table not in attached
+        exported.append(table)
+        return export(conn, table, *args, **kwargs)
+
+    monkeypatch.setattr(order_archive, "export_table", export_detached)
+    archived = archive_partitions(pg, date(2025, 2, 1), str(tmp_path), drop=True)
+
+    assert exported == ["orders_y2025m01", "order_items_y2025m01"]
+    assert {partition.table: partition.rows for partition in archived} == {
+        "orders_y2025m01": 2, "order_items_y2025m01": 1
+    }
+    with pg.connect() as conn:
+        assert conn.execute(text("SELECT to_regclass('orders_y2025m01')")).scalar() is None
+        assert conn.execute(text("SELECT count(*) FROM orders")).scalar() == 1
+
+
+@needs_postgres
+def test_rerun_archives_partitions_left_detached(pg, tmp_path, monkeypatch):
+    """A failed export leaves its month detached; the next run still archives it."""
+    from sqlalchemy import text
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(order_archive, "export_table", fail)
+        with pytest.raises(OSError):
+            archive_partitions(pg, date(2025, 2, 1), str(tmp_path), drop=True)
+
+    archived = archive_partitions(pg, date(2025, 2, 1), str(tmp_path), drop=True)
+    assert {partition.table: partition.rows for partition in archived} == {
+        "orders_y2025m01": 2, "order_items_y2025m01": 1
+    }
+    with pg.connect() as conn:
+        assert conn.execute(text("SELECT to_regclass('order_items_y2025m01')")).scalar() is None
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import status
+from starlette.requests import ClientDisconnect
+
+from app.services.broadcast import BroadcastHub, TooManySubscribers
+
+
+def change(product_id, stock, category="Electronics"):
+    return {"id": product_id, "category": category, "stock_quantity": stock}
+
+
+def collect(hub, subscription, frames):
+    """Read ``frames`` frames from a subscription's stream."""
+    async def read():
+        stream = hub.stream(subscription)
+        received = [await stream.__anext__() for _ in range(frames)]
+        await stream.aclose()
+        return received
+    return read()
+
+
+def test_rapid_updates_are_coalesced():
+    """Several changes to one product inside the window arrive as the latest one."""
+    async def scenario():
+        hub = BroadcastHub(coalesce_seconds=0.05)
+        hub.attach(asyncio.get_running_loop())
+        subscription = hub.subscribe([1], [])
+        reader = asyncio.ensure_future(collect(hub, subscription, 2))
+        await asyncio.sleep(0)
+        for stock in (9, 8, 7):
+            hub.publish([change(1, stock)])
+        hub.publish([change(2, 0)])  # not subscribed
+        frames = await reader
+        return frames, hub.subscriber_count
+
+    frames, subscribers = asyncio.run(scenario())
+    assert frames[0].startswith("retry:")
+    assert frames[1].startswith("event: product")
+    payload = json.loads(frames[1].split("data: ", 1)[1])
+    assert payload["stock_quantity"] == 7
+    assert subscribers == 0
+
+
+def test_category_subscription_and_overflow_resync():
+    """A slow client keeps at most max_pending updates and is told to resync."""
+    async def scenario():
+        hub = BroadcastHub(max_pending=2, coalesce_seconds=0)
+        hub.attach(asyncio.get_running_loop())
+        subscription = hub.subscribe([], ["Books"])
+        hub.publish([change(i, 1, category="Books") for i in range(1, 5)])
+        await asyncio.sleep(0)
+        return subscription, await collect(hub, subscription, 4)
+
+    subscription, frames = asyncio.run(scenario())
+    assert frames[1].startswith("event: resync")
+    assert [json.loads(f.split("data: ", 1)[1])["id"] for f in frames[2:]] == [3, 4]
+
+
+def test_subscriber_cap():
+    """The hub refuses streams beyond its per-worker cap."""
+    hub = BroadcastHub(max_subscribers=1)
+    hub.subscribe([1], [])
+    with pytest.raises(TooManySubscribers):
+        hub.subscribe([2], [])
+
+
+def test_unconsumed_stream_releases_its_subscription():
+    """A client gone before the first byte does not keep a subscriber slot."""
+    from app.api.v1.products import EventStreamResponse
+
+    hub = BroadcastHub(max_subscribers=1)
+    response = EventStreamResponse(hub, hub.subscribe([1], []))
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client disconnected")
+
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send))
+    assert hub.subscriber_count == 0
+
+
+def test_stream_requires_a_filter(client, auth_headers):
+    """Subscribing to nothing is rejected."""
+    response = client.get("/api/v1/products/stream", headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.get("/api/v1/products/stream?ids=a,b", headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_stream_requires_authentication(client):
+    """The stream is only available to signed-in users."""
+    response = client.get("/api/v1/products/stream?ids=1")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
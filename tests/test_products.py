@@ -1,3 +1,5 @@
+import threading
+
 import pytest
 from fastapi import status
 
@@ -127,3 +129,136 @@ def test_delete_product_as_admin(client, admin_auth_headers, test_product):
         headers=admin_auth_headers
     )
     assert get_response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_list_products_sparse_fields(client, auth_headers, test_product):
+    """Only the requested fields (plus id) are returned."""
+    response = client.get(
+        "/api/v1/products/?fields=name,price",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data == [{"id": test_product.id, "name": test_product.name, "price": test_product.price}]
+
+
+def test_sparse_fields_narrow_the_sql_projection(client, auth_headers, test_product):
+    """Unrequested columns such as description are not selected."""
+    from sqlalchemy import event
+    from tests.conftest import engine
+    
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM products" in statement:
+            statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(
+            f"/api/v1/products/{test_product.id}?fields=stock_quantity",
+            headers=auth_headers
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    assert response.json() == {"id": test_product.id, "stock_quantity": test_product.stock_quantity}
+    assert statements and all("description" not in s for s in statements)
+
+
+def test_unknown_sparse_field_rejected(client, auth_headers):
+    """Requesting a field that does not exist is a client error."""
+    response = client.get("/api/v1/products/?fields=name,secret", headers=auth_headers)
+    
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "secret" in response.json()["detail"]
+
+
+def test_bulk_update_products(client, db_session, admin_auth_headers, auth_headers):
+    """Bulk updates apply set-based per chunk and report unknown ids."""
+    from sqlalchemy import event
+    from app.crud import product as crud_product
+    from app.models.product import Product
+    from app.schemas.product import ProductBulkUpdateItem
+    from app.services import catalog_events
+    from tests.conftest import engine
+    
+    products = [Product(name=f"Bulk {i}", price=10.0, stock_quantity=5) for i in range(5)]
+    db_session.add_all(products)
+    db_session.commit()
+    ids = [p.id for p in products]
+    published = []
+    received = threading.Event()
+    
+    def listener(batch):
+        published.append(batch)
+        received.set()
+    
+    catalog_events.subscribe(listener)
+    
+    items = [{"id": product_id, "price": 20.0 + i} for i, product_id in enumerate(ids)]
+    items[1] = {"id": ids[1], "stock_quantity": 0, "is_active": False}
+    items.append({"id": 9999, "price": 1.0})
+    try:
+        response = client.patch(
+            "/api/v1/products/bulk", json={"items": items}, headers=admin_auth_headers
+        )
+        # Published by a background job after the response
+        assert received.wait(5)
+    finally:
+        catalog_events.unsubscribe(listener)
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"updated": 5, "missing_ids": [9999]}
+    assert len(published) == 1 and len(published[0]) == 5
+    
+    second = client.get(f"/api/v1/products/{ids[1]}", headers=auth_headers).json()
+    assert (second["price"], second["stock_quantity"], second["is_active"]) == (10.0, 0, False)
+    assert client.get(f"/api/v1/products/{ids[4]}", headers=auth_headers).json()["price"] == 24.0
+    
+    # Chunking covers every row, one UPDATE per chunk
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("WITH"):
+            statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        updated, missing = crud_product.bulk_update_products(
+            db_session, [ProductBulkUpdateItem(id=i, price=7.0) for i in ids], chunk_size=2
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert (updated, missing) == (5, [])
+    assert len(statements) == 3
+
+
+def test_bulk_update_requires_admin(client, auth_headers, test_product):
+    response = client.patch(
+        "/api/v1/products/bulk",
+        json={"items": [{"id": test_product.id, "price": 1.0}]},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_deactivated_users_lose_catalog_read_access(client, db_session, auth_headers, test_user, test_product):
+    """Precomputed catalog views check the user row like every other endpoint."""
+    urls = [
+        "/api/v1/products/facets",
+        "/api/v1/products/snapshot",
+        "/api/v1/products/best-sellers",
+        f"/api/v1/products/{test_product.id}/related",
+    ]
+    for url in urls:
+        assert client.get(url, headers=auth_headers).status_code == status.HTTP_200_OK
+    
+    from app.models.user import User
+    
+    db_session.get(User, test_user.id).is_active = False
+    db_session.commit()
+    for url in urls:
+        assert client.get(url, headers=auth_headers).status_code == status.HTTP_400_BAD_REQUEST
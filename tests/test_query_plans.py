@@ -0,0 +1,141 @@
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+
+from app.crud import order as crud_order
+from app.crud import product as crud_product
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from tests.conftest import engine
+
+
+@contextmanager
+def capture_selects():
+    """Record every SELECT issued on the test engine with its parameters."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(db_session, statement, parameters):
+    """Return the plan lines that read a whole table without an index."""
+    if engine.dialect.name == "postgresql":
+        rows = db_session.connection().exec_driver_sql(
+            f"EXPLAIN {statement}", parameters
+        ).fetchall()
+        return [row[0] for row in rows if "Seq Scan" in row[0]]
+
+    rows = db_session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    ).fetchall()
+    # SQLite reports "SCAN <table>" for a table scan and appends
+    # "USING [COVERING] INDEX ..." when it walks an index instead.
+    # Scans of derived tables (anon_N subqueries) read already-filtered rows.
+    return [
+        row[-1] for row in rows
+        if re.fullmatch(r"SCAN \w+", row[-1]) and not row[-1].startswith("SCAN anon_")
+    ]
+
+
+@pytest.fixture
+def order_history(db_session, test_user, test_product):
+    """A handful of orders so the planner has real rows to consider."""
+    for quantity in range(1, 4):
+        order = Order(user_id=test_user.id, total_amount=test_product.price * quantity)
+        db_session.add(order)
+        db_session.flush()
+        db_session.add(OrderItem(
+            order_id=order.id,
+            product_id=test_product.id,
+            quantity=quantity,
+            price_at_purchase=test_product.price
+        ))
+    db_session.commit()
+    return test_user
+
+
+def assert_no_full_scans(db_session, statements):
+    assert statements, "no queries were captured"
+    for statement, parameters in statements:
+        scans = full_scans(db_session, statement, parameters)
+        assert not scans, f"full scan {scans} in:\n{statement}"
+
+
+def test_user_order_listing_uses_index(db_session, order_history):
+    """Per-user order listing must not scan the orders table."""
+    with capture_selects() as statements:
+        orders = crud_order.get_orders(db_session, user_id=order_history.id)
+        assert len(orders) == 3
+
+    assert_no_full_scans(db_session, statements)
+
+
+def test_order_items_lookup_uses_index(db_session, order_history):
+    """Loading an order's items must use the order_id index."""
+    order = crud_order.get_orders(db_session, user_id=order_history.id)[0]
+    db_session.expire(order, ["items"])
+
+    with capture_selects() as statements:
+        assert len(order.items) == 1
+
+    assert_no_full_scans(db_session, statements)
+
+
+def test_order_items_by_product_uses_index(db_session, order_history, test_product):
+    """Looking up the orders that contain a product must use the product_id index."""
+    with capture_selects() as statements:
+        items = db_session.query(OrderItem).filter(
+            OrderItem.product_id == test_product.id
+        ).all()
+        assert len(items) == 3
+
+    assert_no_full_scans(db_session, statements)
+
+
+def test_active_product_listing_uses_partial_index(db_session, test_product):
+    """The catalog listing must walk the active-products partial index."""
+    db_session.add(Product(name="Retired", price=1.0, is_active=False))
+    db_session.commit()
+
+    with capture_selects() as statements:
+        products = crud_product.get_products(db_session)
+        assert [product.name for product in products] == ["Test Product"]
+
+    assert_no_full_scans(db_session, statements)
+
+
+def test_user_order_summary_uses_index(client, db_session, auth_headers, order_history):
+    """The raw SQL summary must filter a non-admin user's orders by index."""
+    with capture_selects() as statements:
+        response = client.get("/api/v1/orders/summary", headers=auth_headers)
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+
+    summary = [s for s in statements if "FROM orders o" in s[0]]
+    assert_no_full_scans(db_session, summary)
+
+
+def test_admin_status_filter_uses_index(db_session, order_history):
+    """Filtering all orders by status and date must not scan the orders table."""
+    from datetime import datetime
+    from app.models.order import OrderStatus
+
+    with capture_selects() as statements:
+        crud_order.get_orders(
+            db_session,
+            status=OrderStatus.PENDING,
+            created_from=datetime(2000, 1, 1)
+        )
+        crud_order.count_orders(db_session, status=OrderStatus.PENDING)
+
+    assert_no_full_scans(db_session, statements)
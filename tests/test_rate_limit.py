@@ -0,0 +1,152 @@
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import status
+
+from app.api.v1 import auth as auth_api
+from app.core.rate_limit import (
+    MemoryTokenBucketStore,
+    RateLimit,
+    RateLimitMiddleware,
+    SQLiteTokenBucketStore,
+    StoreUnavailable,
+    parse_rules,
+)
+
+
+def test_parse_limits():
+    """Limits accept named periods or seconds."""
+    assert RateLimit.parse("10/minute") == RateLimit(requests=10, period=60)
+    assert RateLimit.parse("5/30") == RateLimit(requests=5, period=30.0)
+
+    rule = parse_rules({"GET /api/v1/products*": "1/second"})[0]
+    assert rule.matches("GET", "/api/v1/products/42")
+    assert not rule.matches("POST", "/api/v1/products/")
+
+
+def test_token_bucket_allows_burst_then_refills():
+    """A full bucket allows a burst, then one request per refill interval."""
+    store = MemoryTokenBucketStore()
+    limit = RateLimit(requests=3, period=3)
+
+    results = [store.hit("k", limit, now=100.0) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[2].remaining == 0
+    assert results[3].retry_after == pytest.approx(1.0)
+
+    assert store.hit("k", limit, now=101.0).allowed
+    assert not store.hit("k", limit, now=101.0).allowed
+
+
+def test_idle_buckets_are_evicted():
+    """Buckets idle past the TTL are dropped as new keys arrive."""
+    store = MemoryTokenBucketStore(idle_seconds=60, max_keys=100)
+    limit = RateLimit(requests=1, period=1)
+    store.hit("old", limit, now=0.0)
+    store.hit("recent", limit, now=50.0)
+
+    store.hit("new", limit, now=100.0)
+    assert len(store) == 2
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    """Two stores on the same file (two workers) draw from one bucket."""
+    path = str(tmp_path / "limits.db")
+    worker_a = SQLiteTokenBucketStore(path)
+    worker_b = SQLiteTokenBucketStore(path)
+    limit = RateLimit(requests=2, period=60)
+
+    assert worker_a.hit("k", limit, now=10.0).allowed
+    assert worker_b.hit("k", limit, now=10.0).allowed
+    assert not worker_a.hit("k", limit, now=10.0).allowed
+
+
+def test_idle_buckets_are_evicted_by_the_scheduled_sweep(tmp_path):
+    limit = RateLimit(requests=1, period=1)
+    memory = MemoryTokenBucketStore(idle_seconds=60)
+    shared = SQLiteTokenBucketStore(str(tmp_path / "limits.db"), idle_seconds=60)
+    for store in (memory, shared):
+        store.hit("old", limit, now=0.0)
+        store.hit("recent", limit, now=50.0)
+        assert store.evict_idle(now=100.0) == 1
+        assert store.hit("recent", limit, now=100.0).allowed
+
+
+def test_buckets_still_refilling_are_not_evicted(tmp_path):
+    """An idle bucket of a long-period limit is kept until it is full again."""
+    limit = RateLimit(requests=10, period=3600)
+    memory = MemoryTokenBucketStore(idle_seconds=60)
+    shared = SQLiteTokenBucketStore(str(tmp_path / "limits.db"), idle_seconds=60)
+    for store in (memory, shared):
+        for _ in range(10):
+            store.hit("drained", limit, now=0.0)
+        assert store.evict_idle(now=600.0) == 0
+        # 600 s refilled 1.67 tokens, not a fresh bucket of 10
+        assert store.hit("drained", limit, now=600.0).remaining == 0
+        assert store.evict_idle(now=600.0 + 3600) == 1
+
+
+def test_locked_sqlite_store_fails_open(tmp_path):
+    """A lock held by another worker neither blocks the event loop for long nor fails the request."""
+    path = str(tmp_path / "limits.db")
+    store = SQLiteTokenBucketStore(path, busy_timeout=0.05)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(StoreUnavailable):
+            store.hit("k", RateLimit(requests=1, period=60))
+
+        sent = []
+
+        async def endpoint(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        async def send(message):
+            sent.append(message)
+
+        app = RateLimitMiddleware(endpoint, store, parse_rules({"GET /limited": "1/minute"}))
+        scope = {"type": "http", "method": "GET", "path": "/limited", "headers": [], "client": ("1.2.3.4", 1)}
+        asyncio.run(app(scope, None, send))
+        assert sent[0]["status"] == 200
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    # The store recovers once the lock is released
+    assert store.hit("k", RateLimit(requests=1, period=60)).allowed
+
+
+def test_login_is_limited_without_checking_passwords(client, test_user, monkeypatch):
+    """Rejected logins return 429 before any bcrypt work is done."""
+    verified = []
+    real_verify = auth_api.verify_password
+
+    def counting_verify(plain, hashed):
+        verified.append(plain)
+        return real_verify(plain, hashed)
+
+    monkeypatch.setattr(auth_api, "verify_password", counting_verify)
+
+    credentials = {"username": "testuser", "password": "wrong-password"}
+    for _ in range(10):
+        response = client.post("/api/v1/auth/login", data=credentials)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert "ratelimit-remaining" in response.headers
+
+    response = client.post("/api/v1/auth/login", data=credentials)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["ratelimit-limit"] == "10"
+    assert response.headers["ratelimit-remaining"] == "0"
+    assert int(response.headers["retry-after"]) >= 1
+    assert len(verified) == 10
+
+
+def test_authenticated_requests_are_limited_per_user(client, auth_headers, test_product):
+    """Catalog reads by a signed-in user are counted against that user."""
+    first = client.get("/api/v1/products/", headers=auth_headers)
+    second = client.get("/api/v1/products/", headers=auth_headers)
+    anonymous = client.get("/api/v1/products/")
+
+    assert int(second.headers["ratelimit-remaining"]) == int(first.headers["ratelimit-remaining"]) - 1
+    assert anonymous.headers["ratelimit-remaining"] == first.headers["ratelimit-remaining"]
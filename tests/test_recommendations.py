@@ -0,0 +1,91 @@
+import pytest
+from fastapi import status
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.services import recommendations
+from app.services.recommendations import CooccurrenceBuilder, build_recommendations, stream_order_items
+from tests.conftest import engine
+
+
+def baskets_to_arrays(baskets):
+    rows = [(order_id, product_id) for order_id, basket in baskets.items() for product_id in basket]
+    data = np.asarray(rows, dtype=np.int64)
+    return data[:, 0], data[:, 1]
+
+
+def test_builder_counts_pairs_and_keeps_top_k():
+    builder = CooccurrenceBuilder(max_basket_size=3)
+    builder.consume(*baskets_to_arrays({1: [1, 2, 3], 2: [1, 2, 2], 3: [1, 4]}))
+    builder.consume(*baskets_to_arrays({4: [1, 3], 5: [1, 2, 3, 4]}))  # 5 is too large
+
+    index = builder.index(top_k=2)
+    assert index.related(1) == [(2, 2), (3, 2)]
+    assert index.related(4) == [(1, 1)]
+    assert index.related(1, limit=1) == [(2, 2)]
+    assert index.related(99) == []
+    assert builder.orders == 4
+
+
+def test_stream_keeps_orders_whole_across_chunks(db_session, test_user):
+    products = [Product(name=f"P{i}", price=1.0, stock_quantity=10) for i in range(3)]
+    db_session.add_all(products)
+    db_session.flush()
+    for _ in range(4):
+        order = Order(user_id=test_user.id, total_amount=3.0)
+        order.items = [OrderItem(product_id=p.id, quantity=1, price_at_purchase=1.0) for p in products]
+        db_session.add(order)
+    db_session.commit()
+
+    chunks = list(stream_order_items(engine, 0, 10, chunk_size=2))
+
+    assert sum(len(order_ids) for order_ids, _ in chunks) == 12
+    for order_ids, _ in chunks:
+        assert np.bincount(order_ids)[np.unique(order_ids)].tolist() == [3] * len(np.unique(order_ids))
+
+
+def test_incremental_build_and_related_endpoint(client, auth_headers, db_session, test_user, tmp_path, monkeypatch):
+    """Later runs fold in only new orders; the endpoint serves the latest index."""
+    from app.core.config import get_settings
+
+    products = [Product(name=f"P{i}", price=1.0, stock_quantity=100) for i in range(3)]
+    db_session.add_all(products)
+    db_session.commit()
+    a, b, c = (p.id for p in products)
+
+    def order(*product_ids):
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"product_id": i, "quantity": 1} for i in product_ids]},
+            headers=auth_headers
+        )
+
+    order(a, b)
+    order(a, b)
+    order(a, c)
+    first = build_recommendations(engine, str(tmp_path), top_k=5, settle_seconds=0)
+    assert (first["orders"], first["products"]) == (3, 3)
+
+    order(a, c)
+    order(a, c)
+    second = build_recommendations(engine, str(tmp_path), top_k=5, settle_seconds=0)
+    assert second["orders"] == 2
+    assert len(list(tmp_path.glob("cooccurrence-*.npz"))) == 1
+
+    monkeypatch.setattr(get_settings(), "RECOMMENDATIONS_DIR", str(tmp_path))
+    monkeypatch.setattr(recommendations, "_index", None)
+    monkeypatch.setattr(recommendations, "_index_mtime", None)
+    response = client.get(f"/api/v1/products/{a}/related", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "product_id": a,
+        "related": [{"product_id": c, "orders": 3}, {"product_id": b, "orders": 2}],
+    }
+
+    full = build_recommendations(engine, str(tmp_path), top_k=5, settle_seconds=0, full=True)
+    assert full["orders"] == 5
+    recommendations.reload_related_index(str(tmp_path))
+    assert recommendations.get_related_index().related(a) == [(c, 3), (b, 2)]
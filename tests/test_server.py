@@ -0,0 +1,30 @@
+import pytest
+
+from app.core.warmup import warm_up
+from app.db import base
+from app.main import app
+from tests.conftest import engine
+
+
+def test_engine_is_created_lazily_per_process(monkeypatch):
+    """A forked worker gets its own engine instead of the parent's pool."""
+    monkeypatch.setattr(base, "_engine", None)
+    monkeypatch.setattr(base, "_engine_pid", None)
+
+    monkeypatch.setattr(base.os, "getpid", lambda: 1000)
+    parent_engine = base.get_engine()
+    assert base.get_engine() is parent_engine
+
+    monkeypatch.setattr(base.os, "getpid", lambda: 1001)
+    worker_engine = base.get_engine()
+    assert worker_engine is not parent_engine
+    assert base.get_engine() is worker_engine
+
+
+def test_warm_up_reports_timings_and_memory(db_session):
+    """Warm-up primes the pool, auth and OpenAPI schema and reports the cost."""
+    report = warm_up(app, engine=engine)
+
+    for key in ("db_pool_ms", "auth_ms", "openapi_ms", "peak_rss_mb"):
+        assert report[key] >= 0
+    assert app.openapi_schema is not None
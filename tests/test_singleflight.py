@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import status
+from sqlalchemy import event
+
+from app.core.singleflight import SingleFlight, SingleFlightTimeout
+from tests.conftest import engine
+
+
+def run_concurrently(count, func):
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(func) for _ in range(count)]
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_concurrent_calls_share_one_execution():
+    """Identical concurrent lookups run the loader once and share its result."""
+    flights = SingleFlight()
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"id": 1}
+
+    results = run_concurrently(20, lambda: flights.do("product", 1, load))
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.metrics()["shared"] == 19
+    assert flights.metrics()["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter():
+    flights = SingleFlight()
+
+    def load():
+        time.sleep(0.2)
+        raise ValueError("database unavailable")
+
+    results = run_concurrently(5, lambda: flights.do("product", 1, load))
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.metrics()["errors"] == 1
+
+
+def test_waiter_times_out_and_stuck_call_stops_accepting_waiters():
+    flights = SingleFlight(timeout=0.1)
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=("product", 1, lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.02)
+
+    with pytest.raises(SingleFlightTimeout):
+        flights.do("product", 1, lambda: "unused")
+    # The call is now older than the timeout, so a new caller runs its own query
+    assert flights.do("product", 1, lambda: "fresh") == "fresh"
+
+    release.set()
+    leader.join()
+    assert flights.metrics()["timeouts"] == 1
+
+
+def test_forget_detaches_in_flight_calls():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=("products", (0, 10), lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.02)
+
+    flights.forget("products")
+    assert flights.do("products", (0, 10), lambda: "after write") == "after write"
+    release.set()
+    leader.join()
+
+
+def test_product_reads_return_fresh_data_after_update(client, auth_headers, admin_auth_headers, test_product):
+    """Coalesced reads are plain data and never outlive a committed write."""
+    queries = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "products" in statement:
+            queries.append(statement)
+
+    response = client.get(f"/api/v1/products/{test_product.id}", headers=auth_headers)
+    assert response.json()["price"] == test_product.price
+
+    client.put(f"/api/v1/products/{test_product.id}", json={"price": 12.5}, headers=admin_auth_headers)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(f"/api/v1/products/{test_product.id}", headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["price"] == 12.5
+    assert len(queries) == 1
+
+    listing = client.get("/api/v1/products/", headers=auth_headers)
+    assert listing.json()[0]["price"] == 12.5
@@ -0,0 +1,68 @@
+import pytest
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.db import query_stats
+from app.db.slow_queries import SlowQueryLog, get_slow_query_log, normalize_statement, parameter_shape
+
+
+def test_statements_are_normalized_and_parameters_reduced_to_types():
+    assert normalize_statement(
+        "SELECT *\n  FROM products WHERE id IN (?, ?, ?) AND name = 'x''y' LIMIT 10"
+    ) == "SELECT * FROM products WHERE id IN (?, ...) AND name = ? LIMIT ?"
+    assert normalize_statement(
+        "SELECT * FROM order_items_2026_01 WHERE id = %(id_1)s"
+    ) == "SELECT * FROM order_items_2026_01 WHERE id = ?"
+
+    assert parameter_shape((1, 2, 3, "a")) == "(int*3, str)"
+    assert parameter_shape({"name": "a", "limit": 10}) == "(str, int)"
+    assert parameter_shape([(1, "a"), (2, "b")], executemany=True) == "2 x (int, str)"
+
+
+def test_failing_statements_raise_the_original_error(db_session):
+    query_stats.install()
+    with pytest.raises(DBAPIError):
+        db_session.execute(text("SELECT nosuchfunc()"))
+    db_session.rollback()
+    # The failed statement's start time was discarded, so timing stays paired
+    assert not db_session.connection().info.get("query_started")
+    assert db_session.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_slow_statements_are_recorded_with_their_plan(db_session):
+    log = SlowQueryLog(threshold_ms=0, explain_sample_rate=1.0)
+    query_stats.add_observer(log.observe)
+    try:
+        db_session.execute(text("SELECT id FROM products WHERE category = :category"), {"category": "Books"})
+        db_session.execute(text("SELECT id FROM products WHERE category = :category"), {"category": "Games"})
+    finally:
+        query_stats.remove_observer(log.observe)
+
+    first, second = log.entries()[-2:][::-1]
+    assert first["statement"] == "SELECT id FROM products WHERE category = ?"
+    assert first["parameters"] == "(str)"
+    assert first["route"] is None
+    assert first["plan"] and "products" in first["plan"][0]
+    # One plan per statement per interval
+    assert second["fingerprint"] == first["fingerprint"]
+    assert second["plan"] is None
+
+
+def test_admins_read_slow_queries_with_their_route(
+    client, auth_headers, admin_auth_headers, monkeypatch
+):
+    log = get_slow_query_log()
+    log.clear()
+    monkeypatch.setattr(log, "threshold_ms", 0)
+
+    client.get("/api/v1/products/", headers=auth_headers)
+    assert client.get("/api/v1/admin/slow-queries", headers=auth_headers).status_code == status.HTTP_403_FORBIDDEN
+
+    response = client.get("/api/v1/admin/slow-queries", params={"limit": 1000}, headers=admin_auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["buffered"] == len(body["queries"]) > 0
+    routes = {entry["route"] for entry in body["queries"]}
+    assert "GET /api/v1/products/" in routes
+    assert any("FROM products" in entry["statement"] for entry in body["queries"])
@@ -0,0 +1,136 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text, update
+
+from app.core.config import get_settings
+from app.core.security import get_password_hash
+from app.db import base
+from app.db.base import Base
+from app.db.sqlite import RoutingSession, create_sqlite_engines, is_write
+from app.models.product import Product
+
+
+@pytest.fixture
+def engines(tmp_path):
+    reader, writer = create_sqlite_engines(f"sqlite:///{tmp_path / 'shop.db'}", pool_size=4)
+    Base.metadata.create_all(bind=writer)
+    yield reader, writer
+    reader.dispose()
+    writer.dispose()
+
+
+def test_connections_are_tuned(engines):
+    reader, writer = engines
+    for engine in (reader, writer):
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+            assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -65536
+
+
+def test_in_memory_databases_have_no_separate_writer():
+    reader, writer = create_sqlite_engines("sqlite://")
+    assert writer is None
+    reader.dispose()
+
+
+def test_is_write():
+    assert is_write(update(Product).values(price=1))
+    assert is_write(text("WITH v (id) AS (VALUES (1)) UPDATE products SET price = 1 FROM v"))
+    assert not is_write(text("  select 1"))
+    assert not is_write(select(Product))
+
+
+def test_writes_and_later_reads_use_the_writer(engines):
+    reader, writer = engines
+    session = RoutingSession(reader, writer)
+    try:
+        assert session.get_bind(clause=select(Product)) is reader
+        session.add(Product(name="Lamp", price=20.0))
+        session.flush()
+        # The uncommitted row is only visible on the writer's connection
+        assert session.get_bind(clause=select(Product)) is writer
+        assert session.scalar(select(Product.name)) == "Lamp"
+        session.commit()
+        assert session.get_bind(clause=select(Product)) is reader
+        assert session.scalar(select(Product.name)) == "Lamp"
+    finally:
+        session.close()
+
+
+def test_concurrent_writers_share_one_connection(engines):
+    reader, writer = engines
+    errors = []
+
+    def write_products(worker):
+        session = RoutingSession(reader, writer)
+        try:
+            for i in range(20):
+                session.add(Product(name=f"p{worker}-{i}", price=1.0))
+                session.commit()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=write_products, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with reader.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM products").scalar() == 160
+
+
+def test_migrated_database_serves_the_app(tmp_path, monkeypatch):
+    """The documented SQLite setup: ``alembic upgrade head``, then the app as is."""
+    from app.main import app
+    from app.models.user import User
+
+    url = f"sqlite:///{tmp_path / 'shop.db'}"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=root,
+        env={**os.environ, "DATABASE_URL": url},
+        check=True,
+        capture_output=True,
+    )
+    monkeypatch.setattr(get_settings(), "DATABASE_URL", url)
+    monkeypatch.setattr(get_settings(), "CATALOG_SNAPSHOT_DIR", str(tmp_path / "catalog"))
+    monkeypatch.setattr(base, "_engine", None)
+    monkeypatch.setattr(base, "_writer_engine", None)
+    monkeypatch.setattr(base, "_engine_pid", None)
+    if app.state.rate_limit_store is not None:
+        app.state.rate_limit_store.clear()
+
+    db = base.SessionLocal()
+    try:
+        db.add(User(email="owner@example.com", username="owner", hashed_password=get_password_hash("secret123"), is_admin=True))
+        db.commit()
+        with TestClient(app) as client:
+            token = client.post(
+                "/api/v1/auth/login", data={"username": "owner", "password": "secret123"}
+            ).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            response = client.post("/api/v1/products/", json={"name": "Lamp", "price": 20.0, "stock_quantity": 3}, headers=headers)
+            assert response.status_code == status.HTTP_201_CREATED
+            assert response.json()["created_at"] is not None
+            response = client.post(
+                "/api/v1/orders/", json={"items": [{"product_id": response.json()["id"], "quantity": 1}]}, headers=headers
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+            assert client.get("/api/v1/orders/summary", headers=headers).json()[0]["item_count"] == 1
+    finally:
+        db.close()
+        base._engine.dispose()
+        base._writer_engine.dispose()
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+
+from app.models.activity import ProductViewCount, UserLastSeen
+from app.services.write_behind import (
+    WriteBehindBuffer,
+    flush_write_behind,
+    get_last_seen,
+    get_view_counts,
+)
+
+
+def test_buffer_merges_and_bounds_keys(db_session):
+    written = []
+    buffer = WriteBehindBuffer(
+        "test", merge=lambda a, b: a + b, write=lambda db, items: written.extend(items), max_keys=2, batch_size=1
+    )
+    for key in (3, 1, 3, 2, 3):
+        buffer.add(key, 1)
+
+    assert buffer.pending == 2
+    assert buffer.metrics()["dropped"] == 1
+    assert buffer.flush(db_session) == 2
+    # Sorted keys, one batch per row
+    assert written == [(1, 1), (3, 3)]
+    assert buffer.pending == 0
+    assert buffer.flush(db_session) == 0
+    assert buffer.metrics()["flushes"] == 1
+
+
+def test_failed_flush_keeps_values(db_session):
+    def fail(db, items):
+        raise RuntimeError("database unavailable")
+
+    buffer = WriteBehindBuffer("test", merge=lambda a, b: a + b, write=fail)
+    buffer.add(1, 2)
+    with pytest.raises(RuntimeError):
+        buffer.flush(db_session)
+    buffer.add(1, 3)
+
+    assert buffer.metrics()["failures"] == 1
+    written = []
+    buffer._write = lambda db, items: written.extend(items)
+    buffer.flush(db_session)
+    assert written == [(1, 5)]
+
+
+def test_views_and_last_seen_are_flushed_as_upserts(client, db_session, auth_headers, admin_auth_headers, test_product, test_user):
+    for _ in range(3):
+        assert client.get(f"/api/v1/products/{test_product.id}", headers=auth_headers).status_code == status.HTTP_200_OK
+    # Views are buffered; nothing is written per request
+    assert db_session.query(ProductViewCount).count() == 0
+    assert get_view_counts().pending == 1
+
+    flush_write_behind()
+    client.get(f"/api/v1/products/{test_product.id}?fields=name", headers=auth_headers)
+    flush_write_behind()
+
+    db_session.expire_all()
+    assert db_session.get(ProductViewCount, test_product.id).views == 4
+    assert db_session.get(UserLastSeen, test_user.id) is not None
+
+    metrics = client.get("/api/v1/admin/write-behind", headers=admin_auth_headers).json()
+    assert metrics["product_views"]["rows_written"] == 2
+    assert metrics["product_views"]["last_flush_ms"] is not None
+    assert metrics["user_last_seen"]["flushes"] == 2
+
+
+def test_last_seen_never_moves_backwards(client, db_session):
+    later = datetime(2026, 10, 19, 12, 0)
+    buffer = get_last_seen()
+    buffer.add(7, later)
+    buffer.flush(db_session)
+    buffer.add(7, later - timedelta(hours=1))
+    buffer.flush(db_session)
+
+    db_session.expire_all()
+    assert db_session.get(UserLastSeen, 7).last_seen_at == later